@@ -0,0 +1,376 @@
+"""In-memory appointment analytics for dashboards.
+
+``AppointmentCube`` loads every appointment once, with its caregiver's type,
+city and hourly rate, into NumPy columns with integer-coded enums. Counts and
+sums of hours and pay are also kept pre-aggregated in a dense
+(caregiving_type, city, month, status) cube. An aggregate slice therefore
+sums a few thousand cells, however many appointments there are. Percentiles
+filter the rows in an order sorted by the measure, cached until the next
+change.
+
+``refresh()`` appends appointments newer than the last one loaded and
+re-reads the caregiver table, so type, city and rate changes are picked up.
+Status changes and deletions of loaded appointments, and ids committed out
+of order, need a fresh ``load()``. Pay is ``hourly_rate * work_hours`` at the
+caregiver's current rate, as in reports.py.
+
+    python analytics.py caregiving_type month --where status=confirmed
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import Integer, case, func, select
+from sqlalchemy.orm import Session
+
+from schema import User, Caregiver, Appointment, caregiving_type_enum, appointment_status_enum, engine
+
+DIMENSIONS = ("caregiving_type", "city", "month", "status")
+MEASURES = ("count", "hours", "pay")
+CAREGIVING_TYPES = tuple(caregiving_type_enum.enums)
+STATUSES = tuple(appointment_status_enum.enums)
+
+LOAD_BATCH_SIZE = 100000
+
+COLUMN_TYPES = {
+    "caregiver_user_id": np.int32,
+    "month": np.int16,
+    "status": np.int8,
+    "work_hours": np.int32,
+    # Derived from the caregiver table.
+    "caregiving_type": np.int8,
+    "city": np.int16,
+    "pay": np.float64,
+}
+
+
+def month_code(year, month):
+    return year * 12 + month - 1
+
+
+def month_label(code):
+    return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+def _month_code(label):
+    try:
+        year, month = label.split("-")
+        return month_code(int(year), int(month))
+    except ValueError:
+        raise ValueError(f"month must look like YYYY-MM, not {label!r}")
+
+
+class AppointmentCube:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.cities = []
+        self._city_codes = {}
+        self._caregiver_ids = np.empty(0, np.int32)
+        self._caregiver_type = np.empty(0, np.int8)
+        self._caregiver_city = np.empty(0, np.int16)
+        self._caregiver_rate = np.empty(0, np.float64)
+        self._columns = {name: np.empty(0, dtype) for name, dtype in COLUMN_TYPES.items()}
+        self._size = 0
+        self._month0 = 0
+        # Axis 0 is the measure, then one axis per dimension.
+        self._cube = np.zeros((len(MEASURES), len(CAREGIVING_TYPES), 0, 0, len(STATUSES)))
+        # Row order by measure column for percentile(), until the next change.
+        self._orders = {}
+        self.last_id = 0
+        self.loaded_at = self.refreshed_at = time.monotonic()
+
+    def __len__(self):
+        return self._size
+
+    def _column(self, name):
+        return self._columns[name][:self._size]
+
+    def _city(self, city):
+        code = self._city_codes.get(city)
+        if code is None:
+            code = self._city_codes[city] = len(self.cities)
+            self.cities.append(city)
+        return code
+
+    def set_caregivers(self, ids, caregiving_types, cities, rates):
+        """Replace the caregiver table; loaded appointments are re-derived only if it changed."""
+        type_codes = {name: code for code, name in enumerate(CAREGIVING_TYPES)}
+        with self._lock:
+            ids = np.asarray(ids, np.int32)
+            order = np.argsort(ids, kind="stable")
+            ids = ids[order]
+            types = np.array([type_codes[t] for t in caregiving_types], np.int8)[order]
+            cities = np.array([self._city(c) for c in cities], np.int16)[order]
+            rates = np.asarray(rates, np.float64)[order]
+            unchanged = (
+                np.array_equal(ids, self._caregiver_ids) and np.array_equal(types, self._caregiver_type)
+                and np.array_equal(cities, self._caregiver_city) and np.array_equal(rates, self._caregiver_rate)
+            )
+            if unchanged:
+                return
+            self._orders.clear()
+            self._caregiver_ids, self._caregiver_type = ids, types
+            self._caregiver_city, self._caregiver_rate = cities, rates
+            if self._size:
+                kept = np.isin(self._column("caregiver_user_id"), ids)
+                if not kept.all():
+                    # Their appointments went with them (ON DELETE CASCADE).
+                    for name, column in self._columns.items():
+                        self._columns[name] = column[:self._size][kept]
+                    self._size = int(kept.sum())
+                self._derive(0, self._size)
+                self._rebuild()
+
+    def _derive(self, start, stop):
+        caregiver_ids = self._columns["caregiver_user_id"][start:stop]
+        rows = np.searchsorted(self._caregiver_ids, caregiver_ids)
+        rows = np.minimum(rows, len(self._caregiver_ids) - 1)
+        if len(rows) and (not len(self._caregiver_ids) or (self._caregiver_ids[rows] != caregiver_ids).any()):
+            raise ValueError("appointments reference caregivers that are not loaded")
+        self._columns["caregiving_type"][start:stop] = self._caregiver_type[rows]
+        self._columns["city"][start:stop] = self._caregiver_city[rows]
+        self._columns["pay"][start:stop] = self._caregiver_rate[rows] * self._columns["work_hours"][start:stop]
+
+    def append(self, appointment_ids, caregiver_ids, months, statuses, work_hours):
+        """Add appointments; ``months`` are month_code()s and ``statuses`` indexes into STATUSES."""
+        with self._lock:
+            n = len(appointment_ids)
+            if not n:
+                return
+            self._orders.clear()
+            start, stop = self._size, self._size + n
+            capacity = len(self._columns["month"])
+            if stop > capacity:
+                capacity = max(stop, capacity * 2)
+                for name, column in self._columns.items():
+                    grown = np.empty(capacity, column.dtype)
+                    grown[:start] = column[:start]
+                    self._columns[name] = grown
+            for name, values in [("caregiver_user_id", caregiver_ids), ("month", months),
+                                 ("status", statuses), ("work_hours", work_hours)]:
+                self._columns[name][start:stop] = values
+            self._size = stop
+            try:
+                self._derive(start, stop)
+            except ValueError:
+                self._size = start
+                raise
+            self.last_id = max(self.last_id, int(np.max(appointment_ids)))
+            self._accumulate(start, stop)
+
+    def _cells(self, start, stop, month0, shape):
+        column = lambda name: self._columns[name][start:stop].astype(np.intp)
+        return np.ravel_multi_index(
+            (column("caregiving_type"), column("city"), column("month") - month0, column("status")), shape,
+        )
+
+    def _add(self, start, stop):
+        shape = self._cube.shape[1:]
+        cells = self._cells(start, stop, self._month0, shape)
+        size = int(np.prod(shape))
+        self._cube[0] += np.bincount(cells, minlength=size).reshape(shape)
+        self._cube[1] += np.bincount(cells, self._columns["work_hours"][start:stop], minlength=size).reshape(shape)
+        self._cube[2] += np.bincount(cells, self._columns["pay"][start:stop], minlength=size).reshape(shape)
+
+    def _rebuild(self):
+        months = self._column("month")
+        self._month0 = int(months.min()) if self._size else 0
+        n_months = int(months.max()) - self._month0 + 1 if self._size else 0
+        self._cube = np.zeros((len(MEASURES), len(CAREGIVING_TYPES), len(self.cities), n_months, len(STATUSES)))
+        self._add(0, self._size)
+
+    def _accumulate(self, start, stop):
+        months = self._columns["month"][start:stop]
+        _, _, n_cities, n_months, _ = self._cube.shape
+        if (n_cities < len(self.cities) or months.min() < self._month0
+                or months.max() >= self._month0 + n_months or start == 0):
+            self._rebuild()
+        else:
+            self._add(start, stop)
+
+    def _labels(self, dim):
+        if dim == "caregiving_type":
+            return np.array(CAREGIVING_TYPES, object)
+        if dim == "city":
+            return np.array(self.cities, object)
+        if dim == "status":
+            return np.array(STATUSES, object)
+        return np.array([month_label(self._month0 + i) for i in range(self._cube.shape[3])], object)
+
+    def _codes(self, dim, values):
+        """Return the sorted axis positions for ``values`` (labels), skipping unknown ones."""
+        if isinstance(values, str):
+            values = [values]
+        if dim == "caregiving_type":
+            codes = [CAREGIVING_TYPES.index(v) for v in values if v in CAREGIVING_TYPES]
+        elif dim == "city":
+            codes = [self._city_codes[v] for v in values if v in self._city_codes]
+        elif dim == "status":
+            codes = [STATUSES.index(v) for v in values if v in STATUSES]
+        else:
+            n_months = self._cube.shape[3]
+            codes = [c - self._month0 for c in map(_month_code, values) if 0 <= c - self._month0 < n_months]
+        return np.unique(np.array(codes, np.intp))
+
+    @staticmethod
+    def _check(by, where):
+        unknown = [dim for dim in [*by, *where] if dim not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"unknown dimension {unknown[0]!r}; choose from: {', '.join(DIMENSIONS)}")
+        if len(set(by)) != len(by):
+            raise ValueError("a dimension appears twice in by")
+
+    def aggregate(self, by=(), **where):
+        """Return ``{column: ndarray}`` with one entry per non-empty group.
+
+        ``by`` names the grouping dimensions, in output order; keyword
+        arguments filter a dimension to a label or a list of labels. Columns
+        are the ``by`` labels, then count, hours, pay, mean_hours and mean_pay.
+        """
+        self._check(by, where)
+        with self._lock:
+            cube = self._cube
+            labels = [self._labels(dim) for dim in DIMENSIONS]
+        for axis, dim in enumerate(DIMENSIONS):
+            if dim in where:
+                codes = self._codes(dim, where[dim])
+                cube = cube.take(codes, axis=axis + 1)
+                labels[axis] = labels[axis][codes]
+        axes = [DIMENSIONS.index(dim) for dim in by]
+        summed = tuple(axis + 1 for axis in range(len(DIMENSIONS)) if axis not in axes)
+        cube = cube.sum(axis=summed)
+        # The remaining axes are in DIMENSIONS order; put them in ``by`` order.
+        cube = cube.transpose([0, *(1 + sorted(axes).index(axis) for axis in axes)])
+        cube = cube.reshape(len(MEASURES), -1)
+        groups = np.flatnonzero(cube[0])
+        data = {}
+        positions = np.unravel_index(groups, [len(labels[axis]) for axis in axes]) if by else ()
+        for dim, axis, position in zip(by, axes, positions):
+            data[dim] = labels[axis][position]
+        count, hours, pay = cube[:, groups]
+        data.update(count=count.astype(np.int64), hours=hours, pay=pay, mean_hours=hours / count, mean_pay=pay / count)
+        return data
+
+    def percentile(self, measure, q, by=(), **where):
+        """Return ``{column: ndarray}``: the ``by`` labels and the q-th percentile of ``measure``.
+
+        ``measure`` is "hours" or "pay"; percentiles interpolate linearly,
+        as numpy.percentile does.
+        """
+        self._check(by, where)
+        if measure not in ("hours", "pay"):
+            raise ValueError('measure must be "hours" or "pay"')
+        if not 0 <= q <= 100:
+            raise ValueError("q must be between 0 and 100")
+        column = "work_hours" if measure == "hours" else "pay"
+        with self._lock:
+            order = self._orders.get(column)
+            if order is None:
+                order = self._orders[column] = np.argsort(self._column(column), kind="stable")
+            mask = np.ones(self._size, bool)
+            for dim, wanted in where.items():
+                mask &= np.isin(self._column(dim), self._codes(dim, wanted) + (self._month0 if dim == "month" else 0))
+            rows = order[mask[order]]
+            values = self._column(column)[rows].astype(np.float64)
+            labels = {dim: self._labels(dim) for dim in by}
+            shape = [len(labels[dim]) for dim in by]
+            codes = [self._column(dim)[rows].astype(np.intp) - (self._month0 if dim == "month" else 0) for dim in by]
+        keys = np.ravel_multi_index(codes, shape) if by else np.zeros(len(rows), np.intp)
+        # ``rows`` is already in ascending order of the measure, so a stable
+        # sort by group keeps each group sorted; small keys sort by radix.
+        small = np.prod(shape) <= np.iinfo(np.int16).max
+        grouped = np.argsort(keys.astype(np.int16) if small else keys, kind="stable")
+        values, keys = values[grouped], keys[grouped]
+        groups, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        position = starts + (counts - 1) * (q / 100)
+        low = np.floor(position).astype(np.intp)
+        high = np.minimum(low + 1, starts + counts - 1)
+        result = values[low] + (values[high] - values[low]) * (position - low)
+        data = {}
+        for dim, position in zip(by, np.unravel_index(groups, shape) if by else ()):
+            data[dim] = labels[dim][position]
+        data[measure] = result
+        return data
+
+    @classmethod
+    def load(cls, session: Session, batch_size: int = LOAD_BATCH_SIZE):
+        cube = cls()
+        cube.refresh(session, batch_size)
+        cube.loaded_at = cube.refreshed_at
+        return cube
+
+    def refresh(self, session: Session, batch_size: int = LOAD_BATCH_SIZE) -> int:
+        """Re-read caregivers and append appointments newer than ``last_id``; return how many."""
+        # One snapshot for both tables, so every appointment's caregiver is loaded.
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        try:
+            caregivers = session.execute(
+                select(Caregiver.caregiver_user_id, Caregiver.caregiving_type, User.city, Caregiver.hourly_rate)
+                .join(User, User.user_id == Caregiver.caregiver_user_id)
+            ).all()
+            status = case({name: code for code, name in enumerate(STATUSES)}, value=Appointment.status)
+            month = (
+                func.extract("year", Appointment.appointment_date) * 12
+                + func.extract("month", Appointment.appointment_date) - 1
+            ).cast(Integer)
+            result = session.execute(
+                select(Appointment.appointment_id, Appointment.caregiver_user_id, month, status, Appointment.work_hours)
+                .where(Appointment.appointment_id > self.last_id),
+                execution_options={"yield_per": batch_size},
+            )
+            batches = [np.array(partition, np.int64).reshape(-1, 5) for partition in result.partitions()]
+        finally:
+            session.rollback()
+        rows = np.concatenate(batches) if batches else np.empty((0, 5), np.int64)
+        with self._lock:
+            ids, types, cities, rates = zip(*caregivers) if caregivers else ((), (), (), ())
+            self.set_caregivers(ids, types, cities, [float(rate) for rate in rates])
+            self.append(*rows.T)
+            self.refreshed_at = time.monotonic()
+        return len(rows)
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def get_cube(refresh_seconds: float, reload_seconds: float) -> AppointmentCube:
+    """Return the process-wide cube, refreshed after ``refresh_seconds`` and reloaded after ``reload_seconds``."""
+    global _cube
+    with _cube_lock:
+        now = time.monotonic()
+        if _cube is None or now - _cube.loaded_at > reload_seconds:
+            with Session(engine) as session:
+                _cube = AppointmentCube.load(session)
+        elif now - _cube.refreshed_at > refresh_seconds:
+            with Session(engine) as session:
+                _cube.refresh(session)
+        return _cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Slice appointments by dimension")
+    parser.add_argument("by", nargs="*", metavar="DIMENSION", help=", ".join(DIMENSIONS))
+    parser.add_argument("--where", action="append", default=[], metavar="DIMENSION=LABEL[,LABEL]")
+    args = parser.parse_args(argv)
+
+    where = {key: value.split(",") for key, value in (w.split("=", 1) for w in args.where)}
+    with Session(engine) as session:
+        start = time.perf_counter()
+        cube = AppointmentCube.load(session)
+        loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    try:
+        data = cube.aggregate(args.by, **where)
+    except ValueError as e:
+        parser.error(str(e))
+    sliced = time.perf_counter() - start
+    print("\t".join(data))
+    for row in zip(*data.values()):
+        print("\t".join(str(value) for value in row))
+    print(f"{len(cube)} appointments loaded in {loaded:.2f}s; slice took {sliced * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""Versioned JSON API over the seven models.
+
+    GET    /api/v1/<resource>/?fields=&include=&sort=&limit=&after=&before=
+    POST   /api/v1/<resource>/
+    GET    /api/v1/<resource>/<key>/?fields=&include=
+    PATCH  /api/v1/<resource>/<key>/
+    DELETE /api/v1/<resource>/<key>/
+    POST   /api/v1/batch/   {"operations": [{"op", "resource", "key", "data"}, ...]}
+    POST   /api/v1/bulk/<action>/   {"filters": {...}, "changes": {...}, "dry_run": false}
+    GET    /api/v1/changes/?after=&limit=&wait=   (or Accept: text/event-stream)
+
+Reads are built from ``.values()`` over one joined query, so ``include``d
+relations never cost extra queries. Collection and item views are async;
+writes run in a worker thread through ``sync_to_async``. Composite keys are joined with ``-``
+(job applications are ``<caregiver_user_id>-<job_id>``).
+"""
+import asyncio
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.middleware.http import ConditionalGetMiddleware
+from django.utils.decorators import decorator_from_middleware
+from django.views.decorators.csrf import csrf_exempt
+
+from . import bulk as bulk_actions, feed, filters, matching
+from .caching import invalidate
+from .credentials import CredentialsBusy, hash_password, hash_passwords
+from .importing import DEFAULTS
+from .models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+from .pagination import DEFAULT_LIMIT, MAX_LIMIT, akeyset_paginate
+
+VERSION = 'v1'
+MAX_BATCH_OPERATIONS = 1000
+FOREIGN_KEY_VIOLATION = '23503'
+
+conditional_get = decorator_from_middleware(ConditionalGetMiddleware)
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Resource:
+    def __init__(self, model, key, fields, writable, relations=None, filters=None, sorts=None):
+        self.model = model
+        self.key = key
+        self.fields = fields
+        self.writable = writable
+        # include name -> (ORM relation path, related resource name)
+        self.relations = relations or {}
+        self.filters = filters or {}
+        self.sorts = sorts or {'id': list(key)}
+
+    def lookup(self, raw):
+        parts = raw.split('-')
+        if len(parts) != len(self.key) or not all(p.isdigit() for p in parts):
+            raise ApiError(f'Invalid key {raw!r}', status=404)
+        return dict(zip(self.key, map(int, parts)))
+
+    def key_of(self, row):
+        return '-'.join(str(row[name]) for name in self.key)
+
+
+RESOURCES = {
+    'users': Resource(
+        User, ('user_id',),
+        ['user_id', 'email', 'given_name', 'surname', 'city', 'phone_number', 'profile_description'],
+        ['email', 'given_name', 'surname', 'city', 'phone_number', 'profile_description', 'password'],
+        filters=filters.USER_FILTERS, sorts=filters.USER_SORTS,
+    ),
+    'caregivers': Resource(
+        Caregiver, ('caregiver_user_id',),
+        ['caregiver_user_id', 'photo', 'gender', 'caregiving_type', 'hourly_rate'],
+        ['caregiver_user_id', 'photo', 'gender', 'caregiving_type', 'hourly_rate'],
+        relations={'user': ('caregiver_user', 'users')},
+        filters=filters.CAREGIVER_FILTERS, sorts=filters.CAREGIVER_SORTS,
+    ),
+    'members': Resource(
+        Member, ('member_user_id',),
+        ['member_user_id', 'house_rules', 'dependent_description'],
+        ['member_user_id', 'house_rules', 'dependent_description'],
+        relations={'user': ('member_user', 'users')},
+        filters=filters.MEMBER_FILTERS, sorts=filters.MEMBER_SORTS,
+    ),
+    'addresses': Resource(
+        Address, ('member_user_id',),
+        ['member_user_id', 'house_number', 'street', 'town'],
+        ['member_user_id', 'house_number', 'street', 'town'],
+        relations={'member': ('member_user', 'members')},
+        filters=filters.ADDRESS_FILTERS, sorts=filters.ADDRESS_SORTS,
+    ),
+    'jobs': Resource(
+        Job, ('job_id',),
+        ['job_id', 'member_user_id', 'required_caregiving_type', 'other_requirements', 'date_posted'],
+        ['member_user_id', 'required_caregiving_type', 'other_requirements', 'date_posted'],
+        relations={'member': ('member_user', 'members')},
+        filters=filters.JOB_FILTERS, sorts=filters.JOB_SORTS,
+    ),
+    'job-applications': Resource(
+        JobApplication, ('caregiver_user_id', 'job_id'),
+        ['caregiver_user_id', 'job_id', 'date_applied'],
+        ['caregiver_user_id', 'job_id', 'date_applied'],
+        relations={'caregiver': ('caregiver_user', 'caregivers'), 'job': ('job', 'jobs')},
+        filters=filters.JOBAPPLICATION_FILTERS, sorts=filters.JOBAPPLICATION_SORTS,
+    ),
+    'appointments': Resource(
+        Appointment, ('appointment_id',),
+        ['appointment_id', 'caregiver_user_id', 'member_user_id', 'appointment_date', 'appointment_time',
+         'work_hours', 'status'],
+        ['caregiver_user_id', 'member_user_id', 'appointment_date', 'appointment_time', 'work_hours', 'status'],
+        relations={'caregiver': ('caregiver_user', 'caregivers'), 'member': ('member_user', 'members')},
+        filters=filters.APPOINTMENT_FILTERS, sorts=filters.APPOINTMENT_SORTS,
+    ),
+}
+
+
+def _resource(name):
+    if name not in RESOURCES:
+        raise ApiError(f'Unknown resource {name!r}', status=404)
+    return RESOURCES[name]
+
+
+def _csv(params, name):
+    return [part for part in params.get(name, '').split(',') if part]
+
+
+def _selection(resource, params):
+    """Return ``(lookups, shape)`` for ``.values()`` from ``?fields=`` and ``?include=``.
+
+    ``shape`` maps each output name to its lookup, or to a nested
+    ``{name: lookup}`` for an included relation.
+    """
+    requested = _csv(params, 'fields')
+    includes = _csv(params, 'include')
+    for name in includes:
+        if name not in resource.relations:
+            raise ApiError(f'Unknown include {name!r}')
+    own = [f for f in requested if '.' not in f] or resource.fields
+    shape = {}
+    for name in own:
+        if name not in resource.fields:
+            raise ApiError(f'Unknown field {name!r}')
+        shape[name] = name
+    for include in includes:
+        path, related_name = resource.relations[include]
+        related = RESOURCES[related_name]
+        wanted = [f.split('.', 1)[1] for f in requested if f.startswith(include + '.')] or related.fields
+        nested = {}
+        for name in wanted:
+            if name not in related.fields:
+                raise ApiError(f'Unknown field {include}.{name}')
+            nested[name] = f'{path}__{name}'
+        shape[include] = nested
+    lookups = [lookup for value in shape.values() for lookup in (value.values() if isinstance(value, dict) else [value])]
+    return lookups, shape
+
+
+def _shape(row, shape):
+    return {
+        name: {k: row[v] for k, v in lookup.items()} if isinstance(lookup, dict) else row[lookup]
+        for name, lookup in shape.items()
+    }
+
+
+async def _read_one(resource, params, key):
+    lookups, shape = _selection(resource, params)
+    row = await resource.model.objects.filter(**key).values(*lookups).afirst()
+    if row is None:
+        raise ApiError('Not found', status=404)
+    return _shape(row, shape)
+
+
+async def _read_page(resource, request):
+    lookups, shape = _selection(resource, request.GET)
+    keys = filters.sort_keys(request.GET, resource.sorts)
+    queryset = filters.apply_filters(request.GET, resource.model.objects.all(), resource.filters)
+    extra = [k.lstrip('-') for k in keys if k.lstrip('-') not in lookups]
+    page = await akeyset_paginate(request, queryset.values(*lookups, *extra), keys)
+    return {
+        'data': [_shape(row, shape) for row in page],
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+    }
+
+
+def _parse_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError('Request body is not valid JSON')
+    if not isinstance(data, dict):
+        raise ApiError('Request body must be a JSON object')
+    return data
+
+
+def _clean(resource, instance, data, hashed=False, partial=False):
+    unknown = set(data) - set(resource.writable)
+    if unknown:
+        raise ApiError(f'Fields not writable: {", ".join(sorted(unknown))}')
+    if data.get('password') and not hashed:
+        data = {**data, 'password': _hash(data['password'])}
+    for name, value in data.items():
+        setattr(instance, name, value)
+    # Related rows are checked by the database's foreign keys rather than one
+    # query per field here, but the ids themselves still have to be ids. A
+    # partial update validates only the fields it writes.
+    for f in resource.model._meta.concrete_fields:
+        if f.is_relation and f.attname in data:
+            try:
+                setattr(instance, f.attname, f.to_python(data[f.attname]))
+            except ValidationError as e:
+                raise ApiError(f'{f.attname}: {" ".join(e.messages)}')
+    exclude = [
+        f.name for f in resource.model._meta.concrete_fields
+        if f.is_relation or (partial and f.attname not in data)
+    ]
+    instance.full_clean(exclude=exclude, validate_unique=False, validate_constraints=False)
+
+
+def _hash(raw):
+    try:
+        return hash_password(str(raw))
+    except CredentialsBusy as e:
+        raise ApiError(str(e), status=503)
+
+
+def create(resource, data, hashed=False):
+    data = dict(data)
+    for name, default in DEFAULTS.items():
+        if name in resource.writable and data.get(name) is None:
+            data[name] = default()
+    instance = resource.model()
+    _clean(resource, instance, data, hashed)
+    instance.save(force_insert=True)
+    return {name: getattr(instance, name) for name in resource.key}
+
+
+def update(resource, key, data, hashed=False):
+    # One UPDATE and no SELECT first; it sends no post_save, so the cache and
+    # the match index are told directly.
+    if set(data) & set(resource.key):
+        raise ApiError('Key fields cannot be changed')
+    instance = resource.model(**key)
+    _clean(resource, instance, data, hashed, partial=True)
+    rows = resource.model.objects.filter(**key)
+    if not (rows.update(**{name: getattr(instance, name) for name in data}) if data else rows.exists()):
+        raise ApiError('Not found', status=404)
+    if data:
+        invalidate(resource.model)
+        matching.rows_updated(resource.model, data)
+    return key
+
+
+def delete(resource, key):
+    deleted, _ = resource.model.objects.filter(**key).delete()
+    if not deleted:
+        raise ApiError('Not found', status=404)
+
+
+def _error_response(error, **extra):
+    if isinstance(error, ValidationError):
+        return JsonResponse({'errors': error.message_dict, **extra}, status=400)
+    if isinstance(error, IntegrityError):
+        # A missing referenced row is the client's mistake, as in the HTML views;
+        # other constraint violations conflict with existing rows.
+        if getattr(error.__cause__, 'pgcode', None) == FOREIGN_KEY_VIOLATION:
+            return JsonResponse({'error': 'A referenced record does not exist.', **extra}, status=400)
+        return JsonResponse({'error': str(error).splitlines()[0], **extra}, status=409)
+    return JsonResponse({'error': str(error), **extra}, status=error.status)
+
+
+@csrf_exempt
+@conditional_get
+async def collection(request, resource):
+    try:
+        spec = _resource(resource)
+        if request.method == 'GET':
+            return JsonResponse(await _read_page(spec, request))
+        if request.method == 'POST':
+            key = await sync_to_async(create)(spec, _parse_body(request))
+            return JsonResponse({'key': spec.key_of(key)}, status=201)
+        return HttpResponseNotAllowed(['GET', 'POST'])
+    except (ApiError, ValidationError, IntegrityError) as e:
+        return _error_response(e)
+
+
+@csrf_exempt
+@conditional_get
+async def item(request, resource, key):
+    try:
+        spec = _resource(resource)
+        lookup = spec.lookup(key)
+        if request.method == 'GET':
+            return JsonResponse({'data': await _read_one(spec, request.GET, lookup)})
+        if request.method == 'PATCH':
+            await sync_to_async(update)(spec, lookup, _parse_body(request))
+            return JsonResponse({'key': key})
+        if request.method == 'DELETE':
+            await sync_to_async(delete)(spec, lookup)
+            return HttpResponse(status=204)
+        return HttpResponseNotAllowed(['GET', 'PATCH', 'DELETE'])
+    except (ApiError, ValidationError, IntegrityError) as e:
+        return _error_response(e)
+
+
+def _hash_batch(operations):
+    """Hash every password in the batch up front, so no row locks are held while hashing."""
+    found = [
+        operation['data'] for operation in operations
+        if isinstance(operation, dict) and isinstance(operation.get('data'), dict) and operation['data'].get('password')
+    ]
+    try:
+        hashed = hash_passwords([str(data['password']) for data in found], block=False)
+    except CredentialsBusy as e:
+        raise ApiError(str(e), status=503)
+    for data, encoded in zip(found, hashed):
+        data['password'] = encoded
+
+
+def _apply(operation):
+    # Passwords were hashed by _hash_batch.
+    if not isinstance(operation, dict):
+        raise ApiError('Each operation must be a JSON object')
+    spec = _resource(operation.get('resource'))
+    op = operation.get('op')
+    data = operation.get('data') or {}
+    if not isinstance(data, dict):
+        raise ApiError('"data" must be a JSON object')
+    if op == 'create':
+        return {'key': spec.key_of(create(spec, data, hashed=True))}
+    if op in ('update', 'delete'):
+        key = spec.lookup(str(operation.get('key', '')))
+        if op == 'update':
+            update(spec, key, data, hashed=True)
+        else:
+            delete(spec, key)
+        return {'key': operation['key']}
+    raise ApiError(f'Unknown op {op!r}')
+
+
+@csrf_exempt
+def batch(request):
+    """Apply every operation in one transaction; the first failure rolls all back."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        operations = _parse_body(request).get('operations')
+        if not isinstance(operations, list) or not 0 < len(operations) <= MAX_BATCH_OPERATIONS:
+            raise ApiError(f'"operations" must be a list of 1 to {MAX_BATCH_OPERATIONS} operations')
+        _hash_batch(operations)
+    except ApiError as e:
+        return _error_response(e)
+    results = []
+    index = 0
+    try:
+        with transaction.atomic():
+            # Foreign keys are DEFERRABLE INITIALLY DEFERRED; checked at COMMIT,
+            # a violation would be reported against the last operation.
+            with connection.cursor() as cursor:
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            for index, operation in enumerate(operations):
+                results.append(_apply(operation))
+    except (ApiError, ValidationError, IntegrityError) as e:
+        return _error_response(e, index=index)
+    return JsonResponse({'results': results})
+
+
+@csrf_exempt
+def bulk(request, action):
+    """Run one of app/bulk.py's set-based actions; filters use the collection's query parameters."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        if action not in bulk_actions.BULK_ACTIONS:
+            raise ApiError(f'Unknown bulk action {action!r}', status=404)
+        body = _parse_body(request)
+        params, changes = body.get('filters') or {}, body.get('changes') or {}
+        if not isinstance(params, dict) or not isinstance(changes, dict):
+            raise ApiError('"filters" and "changes" must be JSON objects')
+        dry_run = bool(body.get('dry_run'))
+        count = bulk_actions.run(action, {k: str(v) for k, v in params.items()}, changes, dry_run=dry_run)
+    except bulk_actions.BulkActionError as e:
+        return _error_response(ApiError(str(e)))
+    except (ApiError, IntegrityError) as e:
+        return _error_response(e)
+    return JsonResponse({'action': action, 'dry_run': dry_run, 'count': count})
+
+
+def _feed_limit(params):
+    try:
+        return max(1, min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        raise ApiError('"limit" must be an integer')
+
+
+def _feed_wait(params):
+    try:
+        wait = float(params.get('wait', 0))
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait):
+        raise ApiError('"wait" must be a number of seconds')
+    return min(max(wait, 0), settings.CHANGE_FEED_MAX_WAIT)
+
+
+async def _event_stream(position, limit):
+    # Ends after CHANGE_FEED_STREAM_SECONDS; EventSource reconnects with Last-Event-ID.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.CHANGE_FEED_STREAM_SECONDS
+    yield f'id: {feed.format_position(position)}\nevent: position\ndata: {feed.format_position(position)}\n\n'
+    while (remaining := deadline - loop.time()) > 0:
+        try:
+            changes = await feed.wait_for_changes(position, limit, min(settings.CHANGE_FEED_MAX_WAIT, remaining))
+        except feed.FeedExpired as e:
+            yield f'event: expired\ndata: {json.dumps(str(e))}\n\n'
+            return
+        if not changes:
+            yield ': keepalive\n\n'
+        for change in changes:
+            yield f'id: {change["position"]}\nevent: change\ndata: {json.dumps(change)}\n\n'
+            position = feed.parse_position(change['position'])
+
+
+async def change_feed(request):
+    """Job and job application changes after ``?after=<position>``; see app/feed.py.
+
+    Without a position the response holds only the current one: take it
+    before a client's initial full load. ``?wait=<seconds>`` long-polls until
+    a change arrives. Under ASGI, ``Accept: text/event-stream`` streams
+    changes as Server-Sent Events, resuming from Last-Event-ID; a WSGI
+    server would buffer the stream whole, so there it gets the long-poll
+    response instead.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    stream = isinstance(request, ASGIRequest) and 'text/event-stream' in request.headers.get('Accept', '')
+    raw = (request.headers.get('Last-Event-ID') if stream else None) or request.GET.get('after')
+    try:
+        limit = _feed_limit(request.GET)
+        wait = _feed_wait(request.GET)
+        try:
+            position = feed.parse_position(raw) if raw else await sync_to_async(feed.current_position)()
+        except ValueError as e:
+            raise ApiError(str(e))
+        if stream:
+            response = StreamingHttpResponse(_event_stream(position, limit), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            return response
+        found = await feed.wait_for_changes(position, limit, wait) if raw else []
+    except feed.FeedExpired as e:
+        return _error_response(ApiError(str(e), status=410))
+    except ApiError as e:
+        return _error_response(e)
+    return JsonResponse({'changes': found, 'next': found[-1]['position'] if found else feed.format_position(position)})
@@ -0,0 +1,58 @@
+from django.db.models import Exists, F, OuterRef, Value
+
+from .expressions import Overlaps, PointRange, SlotRange
+from .models import Caregiver, Appointment
+
+
+def _occupying(caregiver):
+    # Written against the same expressions and predicate as the
+    # appointment_no_overlap constraint so its GiST index answers the probe
+    # instead of a scan of the caregiver's appointment history.
+    return Appointment.objects.exclude(status='declined').filter(
+        Overlaps(PointRange(F('caregiver_user')), PointRange(caregiver)),
+    )
+
+
+def conflicts(caregiver_id, date, time, hours, exclude=None):
+    """Non-declined appointments of ``caregiver_id`` overlapping the slot."""
+    queryset = _occupying(Value(caregiver_id)).filter(
+        Overlaps(
+            SlotRange(F('appointment_date'), F('appointment_time'), F('work_hours')),
+            SlotRange(Value(date), Value(time), Value(hours)),
+        ),
+    )
+    if exclude is not None:
+        queryset = queryset.exclude(pk=exclude)
+    return queryset
+
+
+def is_free(caregiver_id, date, time, hours, exclude=None):
+    return not conflicts(caregiver_id, date, time, hours, exclude).exists()
+
+
+def free_caregivers(date, time, hours, caregiving_type=None, city=None):
+    """Caregivers with no non-declined appointment overlapping the slot."""
+    busy = _occupying(OuterRef('caregiver_user')).filter(
+        Overlaps(
+            SlotRange(F('appointment_date'), F('appointment_time'), F('work_hours')),
+            SlotRange(Value(date), Value(time), Value(hours)),
+        ),
+    )
+    queryset = Caregiver.objects.filter(~Exists(busy))
+    if caregiving_type:
+        queryset = queryset.filter(caregiving_type=caregiving_type)
+    if city:
+        queryset = queryset.filter(caregiver_user__city=city)
+    return queryset
+
+
+def appointment_conflicts(appointment):
+    """``conflicts`` for an unsaved or edited appointment built from form input."""
+    values = {
+        name: Appointment._meta.get_field(name).to_python(getattr(appointment, name))
+        for name in ('appointment_date', 'appointment_time', 'work_hours')
+    }
+    return conflicts(
+        appointment.caregiver_user_id, values['appointment_date'], values['appointment_time'],
+        values['work_hours'], exclude=appointment.pk,
+    )
@@ -0,0 +1,158 @@
+"""Bulk actions over the rows matching a list page's filters.
+
+Each action runs as one set-based UPDATE or DELETE, plus an audit row in the
+same transaction. A dry run only counts the matching rows. Both the list
+pages and the API (``POST /api/v1/bulk/<action>/``) go through run().
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import DataError, connections, transaction
+from django.db.models import CASCADE, F
+from django.db.models.functions import Round
+
+from . import filters, matching
+from .caching import invalidate
+from .models import Caregiver, Job, JobApplication, Appointment, BulkAudit
+
+MAX_RATE = Decimal('999999.99')
+NUMERIC_VALUE_OUT_OF_RANGE = '22003'
+
+
+class BulkActionError(Exception):
+    pass
+
+
+def _appointment_status(changes):
+    status = changes.get('new_status')
+    if status not in dict(Appointment.STATUS_CHOICES):
+        raise BulkActionError(f'new_status must be one of: {", ".join(dict(Appointment.STATUS_CHOICES))}')
+    return {'new_status': status}
+
+
+def _set_appointment_status(queryset, changes):
+    return queryset.update(status=changes['new_status'])
+
+
+def _decimal(changes, name):
+    value = changes.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise BulkActionError(f'{name} must be a number')
+    if not value.is_finite():
+        raise BulkActionError(f'{name} must be a finite number')
+    return value
+
+
+def _caregiver_rates(changes):
+    rate = _decimal(changes, 'hourly_rate')
+    percent = _decimal(changes, 'rate_percent')
+    if (rate is None) == (percent is None):
+        raise BulkActionError('Give exactly one of hourly_rate or rate_percent')
+    if rate is not None:
+        if not 0 < rate <= MAX_RATE:
+            raise BulkActionError(f'hourly_rate must be between 0 and {MAX_RATE}')
+        return {'hourly_rate': str(rate)}
+    if percent <= -100:
+        raise BulkActionError('rate_percent must be greater than -100')
+    return {'rate_percent': str(percent)}
+
+
+def _set_caregiver_rates(queryset, changes):
+    if 'hourly_rate' in changes:
+        return queryset.update(hourly_rate=Decimal(changes['hourly_rate']))
+    factor = 1 + Decimal(changes['rate_percent']) / 100
+    # Whether some matched rate overflows numeric(8,2) is only known once the
+    # UPDATE computes it; the error aborts the statement and run()'s transaction.
+    try:
+        return queryset.update(hourly_rate=Round(F('hourly_rate') * factor, 2))
+    except DataError as e:
+        if getattr(e.__cause__, 'pgcode', None) != NUMERIC_VALUE_OUT_OF_RANGE:
+            raise
+        raise BulkActionError(f'rate_percent would raise a matched hourly_rate above {MAX_RATE}')
+
+
+def _no_changes(changes):
+    return {}
+
+
+def cascade_delete(queryset):
+    """Delete the matched rows and the rows that CASCADE from them in one statement.
+
+    QuerySet.delete() would load every row to send signals and delete the
+    dependents table by table; data-modifying CTEs do it all in one round
+    trip. Only one level of dependents is handled, which is all Job has.
+    """
+    meta = queryset.model._meta
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    select, params = queryset.values('pk').query.get_compiler(queryset.db).as_sql()
+    pk = qn(meta.pk.column)
+    parts = [f'matched AS (DELETE FROM {qn(meta.db_table)} WHERE {pk} IN ({select}) RETURNING {pk})']
+    for n, relation in enumerate(meta.related_objects):
+        related = relation.related_model._meta
+        if relation.on_delete is not CASCADE or related.related_objects:
+            raise BulkActionError(f'{related.label} cannot be deleted in the same statement')
+        parts.append(
+            f'dependent_{n} AS (DELETE FROM {qn(related.db_table)} '
+            f'WHERE {qn(relation.field.column)} IN (SELECT {pk} FROM matched))'
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(f'WITH {", ".join(parts)} SELECT count(*) FROM matched', params)
+        return cursor.fetchone()[0]
+
+
+def _delete_jobs(queryset, changes):
+    return cascade_delete(queryset)
+
+
+class BulkAction:
+    def __init__(self, model, filters, parse, apply, invalidates, resets_matching=False):
+        self.model = model
+        self.filters = filters
+        self.parse = parse
+        self.apply = apply
+        self.invalidates = invalidates
+        self.resets_matching = resets_matching
+
+
+BULK_ACTIONS = {
+    'appointment-status': BulkAction(
+        Appointment, filters.APPOINTMENT_FILTERS, _appointment_status, _set_appointment_status,
+        [Appointment], resets_matching=True,
+    ),
+    'caregiver-rates': BulkAction(
+        Caregiver, filters.CAREGIVER_FILTERS, _caregiver_rates, _set_caregiver_rates,
+        [Caregiver], resets_matching=True,
+    ),
+    'job-delete': BulkAction(
+        Job, filters.JOB_FILTERS, _no_changes, _delete_jobs,
+        [Job, JobApplication],
+    ),
+}
+
+
+def run(name, params, changes, dry_run=False):
+    """Return the number of rows the action touches (or would touch, for a dry run).
+
+    ``params`` are list-page filter parameters; at least one must apply, so
+    an empty or mistyped filter never reaches every row.
+    """
+    action = BULK_ACTIONS[name]
+    conditions = filters.conditions(params, action.filters)
+    if not conditions:
+        raise BulkActionError(f'At least one filter is required: {", ".join(action.filters)}')
+    changes = action.parse(changes)
+    queryset = action.model.objects.filter(**conditions)
+    if dry_run:
+        return queryset.count()
+    applied = {param: params[param] for param, (lookup, _) in action.filters.items() if lookup in conditions}
+    with transaction.atomic():
+        count = action.apply(queryset, changes)
+        BulkAudit.objects.create(action=name, filters=applied, changes=changes, row_count=count)
+    invalidate(*action.invalidates)
+    if action.resets_matching:
+        matching.reset_index()
+    return count
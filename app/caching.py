@@ -0,0 +1,105 @@
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+# Every cache key embeds the current version of each model it was built from.
+# Saving or deleting a row bumps that model's version, so exactly the entries
+# depending on it stop being reachable and age out through LRU/TTL eviction.
+# The bump waits for the write to commit: bumped earlier, a concurrent reader
+# could still see the old rows and store them under the new version.
+
+
+def _version_key(model):
+    return f'version:{model._meta.label_lower}'
+
+
+def versions(models):
+    keys = [_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Seed from the clock rather than 1 so a version that was evicted
+            # never comes back with a value older entries were keyed under.
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def invalidate(*models):
+    transaction.on_commit(lambda: _bump(models))
+
+
+def _bump(models):
+    for model in models:
+        try:
+            cache.incr(_version_key(model))
+        except ValueError:
+            cache.set(_version_key(model), time.time_ns(), timeout=None)
+
+
+def make_key(name, models, *parts):
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'{name}:{".".join(map(str, versions(models)))}:{digest}'
+
+
+def cached(name, models, build, *parts):
+    """Read-through cache for ``build()`` keyed on ``parts`` and the versions of ``models``."""
+    key = make_key(name, models, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.CACHE_TTL)
+    return value
+
+
+def cache_list_page(*models):
+    """Cache the rendered body and headers of a GET list view, per full path and query string.
+
+    Works for both sync and async views.
+    """
+    def decorator(view):
+        def lookup(request):
+            key = make_key(f'list-page:{view.__name__}', models, request.get_full_path())
+            return key, cache.get(key)
+
+        def store(key, response):
+            if response.status_code == 200:
+                cache.set(key, (response.content, dict(response.items())), settings.CACHE_TTL)
+
+        if iscoroutinefunction(view):
+            async def wrapper(request, *args, **kwargs):
+                if request.method != 'GET':
+                    return await view(request, *args, **kwargs)
+                key, entry = await sync_to_async(lookup)(request)
+                if entry is not None:
+                    return HttpResponse(entry[0], headers=entry[1])
+                response = await view(request, *args, **kwargs)
+                await sync_to_async(store)(key, response)
+                return response
+        else:
+            def wrapper(request, *args, **kwargs):
+                if request.method != 'GET':
+                    return view(request, *args, **kwargs)
+                key, entry = lookup(request)
+                if entry is not None:
+                    return HttpResponse(entry[0], headers=entry[1])
+                response = view(request, *args, **kwargs)
+                store(key, response)
+                return response
+        return functools.wraps(view)(wrapper)
+    return decorator
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def _model_changed(sender, **kwargs):
+    if sender._meta.app_label == 'app':
+        invalidate(sender)
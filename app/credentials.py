@@ -0,0 +1,109 @@
+"""Password hashing and verification on a bounded worker pool.
+
+Hashers come from PASSWORD_HASHERS (PBKDF2 by default; put Argon2 first
+once argon2-cffi is installed). A hash costs tens of milliseconds of CPU,
+so it runs on a thread pool: hashlib and argon2-cffi release the GIL while
+hashing, so the threads run in parallel without the pickling and start-up
+cost of processes. At most CREDENTIAL_MAX_PENDING hashes are queued or
+running at once; past that, callers wait up to CREDENTIAL_WAIT_SECONDS and
+then get CredentialsBusy. A signup burst is therefore turned away early
+instead of holding every request thread.
+"""
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.utils.crypto import constant_time_compare
+
+from .models import User
+
+
+class CredentialsBusy(Exception):
+    pass
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _slots = threading.BoundedSemaphore(settings.CREDENTIAL_MAX_PENDING)
+                _pool = ThreadPoolExecutor(settings.CREDENTIAL_WORKERS, thread_name_prefix='credentials')
+    return _pool, _slots
+
+
+def submit(fn, *args, block=False):
+    """Run ``fn(*args)`` on the pool and return its future, or raise CredentialsBusy.
+
+    With ``block`` the caller waits for a slot however long it takes.
+    """
+    pool, slots = _executor()
+    if not slots.acquire(timeout=None if block else settings.CREDENTIAL_WAIT_SECONDS):
+        raise CredentialsBusy('Too many password operations in progress; try again shortly.')
+    try:
+        future = pool.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def is_hashed(encoded):
+    try:
+        identify_hasher(encoded)
+    except ValueError:
+        return False
+    return True
+
+
+def hash_password(raw):
+    return submit(make_password, raw).result()
+
+
+def hash_passwords(raws, block=True):
+    """Hash many passwords in parallel, in order; used by imports, backfills and API batches.
+
+    At most CREDENTIAL_WORKERS are in flight at a time, so a long list
+    leaves the rest of the pending slots to other callers. Imports and
+    backfills wait for slots; pass ``block=False`` to get CredentialsBusy
+    instead.
+    """
+    hashed, futures = [], collections.deque()
+    for raw in raws:
+        if len(futures) >= settings.CREDENTIAL_WORKERS:
+            hashed.append(futures.popleft().result())
+        futures.append(submit(make_password, raw, block=block))
+    hashed.extend(future.result() for future in futures)
+    return hashed
+
+
+def _check(raw, encoded):
+    outdated = []
+    return check_password(raw, encoded, setter=outdated.append), bool(outdated)
+
+
+def verify_password(user, raw):
+    """Check ``raw`` against ``user.password`` and upgrade the stored hash if needed.
+
+    The hash is replaced when PASSWORD_HASHERS names a different preferred
+    hasher or a higher work factor than the one it was made with, and for
+    rows still holding plaintext from before passwords were hashed.
+    """
+    encoded = user.password
+    if is_hashed(encoded):
+        valid, outdated = submit(_check, raw, encoded).result()
+    else:
+        valid = outdated = constant_time_compare(raw, encoded)
+    if valid and outdated:
+        user.password = hash_password(raw)
+        # Only replace the value that was checked, never a newer one.
+        User.objects.filter(pk=user.pk, password=encoded).update(password=user.password)
+    return valid
@@ -0,0 +1,146 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import filters
+from .models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+
+CHUNK_SIZE = 2000
+LINES_PER_BLOCK = 500
+
+# kind -> (model, [(header, lookup)], filters, sort keys)
+EXPORTS = {
+    'users': (User, [
+        ('user_id', 'user_id'),
+        ('email', 'email'),
+        ('given_name', 'given_name'),
+        ('surname', 'surname'),
+        ('city', 'city'),
+        ('phone_number', 'phone_number'),
+    ], filters.USER_FILTERS, ['user_id']),
+    'caregivers': (Caregiver, [
+        ('caregiver_user_id', 'caregiver_user_id'),
+        ('given_name', 'caregiver_user__given_name'),
+        ('surname', 'caregiver_user__surname'),
+        ('city', 'caregiver_user__city'),
+        ('gender', 'gender'),
+        ('caregiving_type', 'caregiving_type'),
+        ('hourly_rate', 'hourly_rate'),
+    ], filters.CAREGIVER_FILTERS, ['caregiver_user_id']),
+    'members': (Member, [
+        ('member_user_id', 'member_user_id'),
+        ('given_name', 'member_user__given_name'),
+        ('surname', 'member_user__surname'),
+        ('city', 'member_user__city'),
+        ('house_rules', 'house_rules'),
+        ('dependent_description', 'dependent_description'),
+    ], filters.MEMBER_FILTERS, ['member_user_id']),
+    'addresses': (Address, [
+        ('member_user_id', 'member_user_id'),
+        ('house_number', 'house_number'),
+        ('street', 'street'),
+        ('town', 'town'),
+    ], filters.ADDRESS_FILTERS, ['member_user_id']),
+    'jobs': (Job, [
+        ('job_id', 'job_id'),
+        ('member_user_id', 'member_user_id'),
+        ('required_caregiving_type', 'required_caregiving_type'),
+        ('other_requirements', 'other_requirements'),
+        ('date_posted', 'date_posted'),
+    ], filters.JOB_FILTERS, ['job_id']),
+    'job_applications': (JobApplication, [
+        ('caregiver_user_id', 'caregiver_user_id'),
+        ('job_id', 'job_id'),
+        ('date_applied', 'date_applied'),
+    ], filters.JOBAPPLICATION_FILTERS, ['caregiver_user_id', 'job_id']),
+    'appointments': (Appointment, [
+        ('appointment_id', 'appointment_id'),
+        ('caregiver_user_id', 'caregiver_user_id'),
+        ('member_user_id', 'member_user_id'),
+        ('appointment_date', 'appointment_date'),
+        ('appointment_time', 'appointment_time'),
+        ('work_hours', 'work_hours'),
+        ('status', 'status'),
+        ('hourly_rate', 'caregiver_user__hourly_rate'),
+    ], filters.APPOINTMENT_FILTERS, ['appointment_id']),
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _queryset(kind, params):
+    model, columns, kind_filters, order = EXPORTS[kind]
+    queryset = filters.apply_filters(params, model.objects.all(), kind_filters)
+    return queryset.order_by(*order), [lookup for _, lookup in columns]
+
+
+def export_rows(kind, params):
+    """Return an iterator of value tuples for ``kind``, read through a server-side cursor."""
+    queryset, lookups = _queryset(kind, params)
+    return queryset.values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+
+
+async def aexport_rows(kind, params):
+    queryset, lookups = _queryset(kind, params)
+    # values_list().aiterator() runs its query on the event loop; values() does not.
+    async for row in queryset.values(*lookups).aiterator(chunk_size=CHUNK_SIZE):
+        yield tuple(row[lookup] for lookup in lookups)
+
+
+def _format(kind, fmt):
+    """Return ``(header, encode, footer)``: the text before the rows, one row's line, and the text after."""
+    headers = [header for header, _ in EXPORTS[kind][1]]
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        return writer.writerow(headers), writer.writerow, ''
+    if fmt == 'jsonl':
+        return '', lambda row: json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + '\n', ''
+    separator = ['\n']
+
+    def encode(row):
+        line = separator[0] + json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder)
+        separator[0] = ',\n'
+        return line
+    return '[', encode, '\n]\n'
+
+
+def render_export(kind, params, fmt):
+    """Yield the export as text blocks of ``LINES_PER_BLOCK`` rows.
+
+    Rows come from a server-side cursor, so memory use does not grow with the
+    size of the table.
+    """
+    header, encode, footer = _format(kind, fmt)
+    block = [header]
+    for row in export_rows(kind, params):
+        block.append(encode(row))
+        if len(block) >= LINES_PER_BLOCK:
+            yield ''.join(block)
+            block = []
+    block.append(footer)
+    if ''.join(block):
+        yield ''.join(block)
+
+
+async def arender_export(kind, params, fmt):
+    """render_export() for ASGI, which would otherwise read a sync iterator whole before sending it."""
+    header, encode, footer = _format(kind, fmt)
+    block = [header]
+    async for row in aexport_rows(kind, params):
+        block.append(encode(row))
+        if len(block) >= LINES_PER_BLOCK:
+            yield ''.join(block)
+            block = []
+    block.append(footer)
+    if ''.join(block):
+        yield ''.join(block)
@@ -0,0 +1,42 @@
+from django.db import models
+from django.db.models import Func
+
+
+class SlotRange(Func):
+    """``tsrange`` covering ``hours`` from ``date + time_of_day``, half-open."""
+
+    arity = 3
+    output_field = models.Field()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (date, date_params), (time, time_params), (hours, hours_params) = (
+            compiler.compile(arg) for arg in self.get_source_expressions()
+        )
+        start = f'({date} + {time})'
+        params = (*date_params, *time_params)
+        return (
+            f'tsrange({start}, {start} + make_interval(hours => {hours}))',
+            (*params, *params, *hours_params),
+        )
+
+
+class PointRange(Func):
+    """``int4range`` holding the single value ``expression``.
+
+    Lets an integer column share a GiST exclusion constraint or index with a
+    range column without the btree_gist extension.
+    """
+
+    arity = 1
+    output_field = models.Field()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.get_source_expressions()[0])
+        return f"int4range({sql}, {sql}, '[]')", (*params, *params)
+
+
+class Overlaps(Func):
+    arity = 2
+    arg_joiner = ' && '
+    template = '(%(expressions)s)'
+    output_field = models.BooleanField()
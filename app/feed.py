@@ -0,0 +1,243 @@
+"""Change feed of jobs and job applications for polling clients.
+
+Triggers on job and job_application (migration 0009) append one change_log
+row per inserted, updated or deleted row, holding the row as JSON, and
+NOTIFY change_log. Every write path is covered: the ORM, bulk actions and
+the SQLAlchemy scripts.
+
+A position is ``<xid>-<seq>``. Changes are served in (xid, seq) order, and
+only once every transaction with a smaller xid has finished. A transaction
+that commits late therefore never lands behind a cursor a client already
+holds. The cost is that a long-running transaction holds the feed back
+until it ends.
+
+Each process runs one Watcher thread. It LISTENs on its own connection and
+reads new changes once per notification, or every CHANGE_FEED_POLL_SECONDS.
+It keeps the last CHANGE_FEED_BUFFER changes in memory and wakes waiting
+clients. Clients whose cursor is inside the buffer are answered without a
+query. Older cursors read change_log. Cursors from before the last
+prune_changes run raise FeedExpired.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import select
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import ChangeLog
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = {'job': 'jobs', 'job_application': 'job-applications'}
+PRUNED = 'pruned'
+
+_XMIN = 'pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+
+
+class FeedExpired(Exception):
+    pass
+
+
+def parse_position(raw):
+    try:
+        xid, seq = map(int, raw.split('-'))
+    except (AttributeError, ValueError):
+        raise ValueError(f'Invalid position {raw!r}')
+    return xid, seq
+
+
+def format_position(position):
+    return f'{position[0]}-{position[1]}'
+
+
+def _change(xid, seq, table_name, op, data):
+    return {'position': format_position((xid, seq)), 'resource': RESOURCES[table_name], 'op': op, 'data': data}
+
+
+def current_position():
+    """Return the position of the newest change every client can already see."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT xid, seq FROM change_log WHERE xid < {_XMIN} ORDER BY xid DESC, seq DESC LIMIT 1'
+        )
+        row = cursor.fetchone()
+    return tuple(row) if row else (0, 0)
+
+
+def changes_since(position, limit):
+    """Return up to ``limit`` changes after ``position``, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT xid, seq, op FROM change_log ORDER BY xid, seq LIMIT 1')
+        first = cursor.fetchone()
+        if first and first[2] == PRUNED and position < tuple(first[:2]):
+            raise FeedExpired('Changes after this position have been pruned; reload and start from a new position.')
+        cursor.execute(
+            f'SELECT xid, seq, table_name, op, data::text FROM change_log '
+            f'WHERE (xid, seq) > (%s, %s) AND xid < {_XMIN} ORDER BY xid, seq LIMIT %s',
+            [*position, limit],
+        )
+        rows = cursor.fetchall()
+    return [(xid, seq, (table_name, op, json.loads(data))) for xid, seq, table_name, op, data in rows]
+
+
+def prune(before):
+    """Delete changes made before ``before``; return how many went.
+
+    A marker row keeps the newest deleted position so that cursors from
+    before it get FeedExpired instead of silently skipping changes.
+    """
+    with transaction.atomic():
+        last = (
+            ChangeLog.objects.filter(changed_at__lt=before)
+            .order_by('-xid', '-seq').values_list('xid', 'seq').first()
+        )
+        if last is None:
+            return 0
+        xid, seq = last
+        deleted, _ = ChangeLog.objects.filter(xid__lte=xid).exclude(xid=xid, seq__gt=seq).delete()
+        ChangeLog.objects.create(seq=seq, xid=xid, table_name='', op=PRUNED, data={}, changed_at=before)
+    return deleted
+
+
+class Watcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._positions = []
+        self._changes = []
+        self._waiters = []
+        self._start = self.head = None
+        self.ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception('Change feed watcher failed; reconnecting')
+                time.sleep(settings.CHANGE_FEED_POLL_SECONDS)
+            finally:
+                connection.close()
+
+    def _listen(self):
+        with connection.cursor() as cursor:
+            cursor.execute('LISTEN change_log')
+        conn = connection.connection
+        with self._lock:
+            if self.head is None:
+                self._start = self.head = current_position()
+        self.ready.set()
+        while not self._stop.is_set():
+            self._read()
+            select.select([conn], [], [], settings.CHANGE_FEED_POLL_SECONDS)
+            conn.poll()
+            conn.notifies.clear()
+
+    def _read(self):
+        while True:
+            try:
+                rows = changes_since(self.head, settings.CHANGE_FEED_BUFFER)
+            except FeedExpired:
+                # Pruned past an idle watcher: start over from now.
+                with self._lock:
+                    self._positions.clear()
+                    self._changes.clear()
+                    self._start = self.head = current_position()
+                continue
+            with self._lock:
+                for xid, seq, row in rows:
+                    if row[1] != PRUNED:
+                        self._positions.append((xid, seq))
+                        self._changes.append(_change(xid, seq, *row))
+                excess = len(self._changes) - settings.CHANGE_FEED_BUFFER
+                if excess > 0:
+                    self._start = self._positions[excess - 1]
+                    del self._positions[:excess], self._changes[:excess]
+                if rows:
+                    self.head = rows[-1][:2]
+                    waiters, self._waiters = self._waiters, []
+                    for loop, future in waiters:
+                        loop.call_soon_threadsafe(_wake, future)
+            if len(rows) < settings.CHANGE_FEED_BUFFER:
+                return
+
+    def buffered(self, position, limit, waiter=None):
+        """Return buffered changes after ``position``, or None if it is older than the buffer.
+
+        With nothing to return, ``waiter`` (a ``(loop, future)`` pair) is
+        woken by the next read that finds changes.
+        """
+        with self._lock:
+            if self._start is None or position < self._start:
+                return None
+            index = bisect.bisect_right(self._positions, position)
+            changes = self._changes[index:index + limit]
+            if not changes and waiter is not None:
+                self._waiters.append(waiter)
+            return changes
+
+    def discard(self, waiter):
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_watcher():
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = Watcher()
+        return _watcher
+
+
+def stop_watcher():
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            _watcher.stop()
+            _watcher = None
+
+
+async def wait_for_changes(position, limit, timeout):
+    """Return up to ``limit`` changes after ``position``, waiting up to ``timeout`` seconds for one."""
+    watcher = get_watcher()
+    if not watcher.ready.is_set():
+        await asyncio.to_thread(watcher.ready.wait, timeout)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        waiter = (loop, loop.create_future())
+        changes = watcher.buffered(position, limit, waiter if timeout > 0 else None)
+        if changes is None:
+            rows = await sync_to_async(changes_since)(position, limit)
+            return [_change(xid, seq, *row) for xid, seq, row in rows if row[1] != PRUNED]
+        remaining = deadline - loop.time()
+        if changes or remaining <= 0:
+            watcher.discard(waiter)
+            return changes
+        try:
+            await asyncio.wait_for(waiter[1], remaining)
+        except asyncio.TimeoutError:
+            watcher.discard(waiter)
+            return []
@@ -0,0 +1,157 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+
+def _text(value):
+    return value.strip() or None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _decimal(value):
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        return None
+    # NaN and Infinity parse, but cannot be compared or stored.
+    return value if value.is_finite() else None
+
+
+def _date(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def _time(value):
+    try:
+        return parse_time(value)
+    except ValueError:
+        return None
+
+
+def _day_start(value):
+    day = _date(value)
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _next_day_start(value):
+    day = _date(value)
+    if day is None:
+        return None
+    return _day_start((day + datetime.timedelta(days=1)).isoformat())
+
+
+# Each filter maps a query-string parameter to (ORM lookup, converter).
+# Values the converter rejects are ignored rather than reaching the database.
+USER_FILTERS = {
+    'city': ('city', _text),
+    'surname': ('surname', _text),
+}
+
+CAREGIVER_FILTERS = {
+    'caregiving_type': ('caregiving_type', _text),
+    'gender': ('gender', _text),
+    'city': ('caregiver_user__city', _text),
+    'min_rate': ('hourly_rate__gte', _decimal),
+    'max_rate': ('hourly_rate__lte', _decimal),
+}
+
+MEMBER_FILTERS = {
+    'city': ('member_user__city', _text),
+}
+
+ADDRESS_FILTERS = {
+    'town': ('town', _text),
+    'street': ('street', _text),
+}
+
+JOB_FILTERS = {
+    'required_caregiving_type': ('required_caregiving_type', _text),
+    'member_user': ('member_user_id', _int),
+    'posted_from': ('date_posted__gte', _day_start),
+    'posted_to': ('date_posted__lt', _next_day_start),
+}
+
+JOBAPPLICATION_FILTERS = {
+    'caregiver_user': ('caregiver_user_id', _int),
+    'job': ('job_id', _int),
+    'applied_from': ('date_applied__gte', _day_start),
+    'applied_to': ('date_applied__lt', _next_day_start),
+}
+
+APPOINTMENT_FILTERS = {
+    'caregiver_user': ('caregiver_user_id', _int),
+    'member_user': ('member_user_id', _int),
+    'status': ('status', _text),
+    'date_from': ('appointment_date__gte', _date),
+    'date_to': ('appointment_date__lte', _date),
+}
+
+# Sort options map a ?sort= value to keyset keys; the first entry is the
+# default and every key list ends with the primary key as a tie-breaker.
+USER_SORTS = {
+    'id': ['user_id'],
+    'surname': ['surname', 'user_id'],
+}
+
+CAREGIVER_SORTS = {
+    'id': ['caregiver_user_id'],
+    'rate': ['hourly_rate', 'caregiver_user_id'],
+    '-rate': ['-hourly_rate', '-caregiver_user_id'],
+}
+
+MEMBER_SORTS = {
+    'id': ['member_user_id'],
+}
+
+ADDRESS_SORTS = {
+    'id': ['member_user_id'],
+}
+
+JOB_SORTS = {
+    'id': ['job_id'],
+    '-date_posted': ['-date_posted', '-job_id'],
+    'date_posted': ['date_posted', 'job_id'],
+}
+
+JOBAPPLICATION_SORTS = {
+    'id': ['caregiver_user_id', 'job_id'],
+}
+
+APPOINTMENT_SORTS = {
+    'id': ['appointment_id'],
+    'date': ['appointment_date', 'appointment_time', 'appointment_id'],
+    '-date': ['-appointment_date', '-appointment_time', '-appointment_id'],
+}
+
+
+def conditions(params, filters):
+    result = {}
+    for param, (lookup, convert) in filters.items():
+        raw = params.get(param)
+        if not raw:
+            continue
+        value = convert(raw)
+        if value is not None:
+            result[lookup] = value
+    return result
+
+
+def apply_filters(params, queryset, filters):
+    return queryset.filter(**conditions(params, filters))
+
+
+def sort_keys(params, sorts):
+    return sorts.get(params.get('sort'), next(iter(sorts.values())))
@@ -0,0 +1,209 @@
+import datetime
+import functools
+import random
+
+from django.contrib.auth.hashers import make_password
+
+from .importing import Importer
+from .models import Job
+
+SCALES = {
+    'small': 10_000,
+    'medium': 100_000,
+    'large': 1_000_000,
+}
+
+# Load order; each kind only references kinds loaded before it.
+KINDS = ['users', 'caregivers', 'members', 'addresses', 'jobs', 'job_applications', 'appointments']
+
+GIVEN_NAMES = [
+    'Arman', 'Amina', 'Aigerim', 'Dana', 'Erlan', 'Bota', 'Nurlan', 'Aruzhan', 'Timur', 'Madina',
+    'Daniyar', 'Aliya', 'Askar', 'Zhanna', 'Yerlan', 'Saule', 'Bekzat', 'Gulnara', 'Marat', 'Asel',
+]
+SURNAMES = [
+    'Armanov', 'Aminova', 'Nurlanov', 'Serikova', 'Bekov', 'Tokayeva', 'Akhmetov', 'Zhakenova',
+    'Omarov', 'Kassymova', 'Ibrayev', 'Suleimenova', 'Abenov', 'Mukanova', 'Karimov', 'Sadykova',
+]
+# (city, weight): a few large cities and a long tail.
+CITIES = [
+    ('Astana', 30), ('Almaty', 30), ('Shymkent', 12), ('Karaganda', 8), ('Aktobe', 6),
+    ('Taraz', 4), ('Pavlodar', 4), ('Oskemen', 3), ('Semey', 2), ('Atyrau', 1),
+]
+STREETS = ['Kabanbay Batyr', 'Abay', 'Turan', 'Mangilik El', 'Dostyk', 'Satpayev', 'Tole Bi', 'Respublika']
+CAREGIVING_TYPES = [('babysitter', 45), ('elderly_caregiver', 35), ('playmate', 20)]
+# Median hourly rate per type; rates are log-normal around it.
+BASE_RATES = {'babysitter': 9.0, 'elderly_caregiver': 12.0, 'playmate': 7.0}
+STATUSES = [('confirmed', 60), ('pending', 25), ('declined', 15)]
+HOUSE_RULES = [
+    'No pets.', 'No smoking.', 'Shoes off inside.', 'Quiet hours after 9pm.', 'No screen time.',
+    'Vegetarian meals only.', 'Please be punctual.',
+]
+REQUIREMENTS = [
+    'soft-spoken', 'first aid certified', 'speaks Kazakh and Russian', 'experience with toddlers',
+    'can cook simple meals', 'has a driving licence', 'comfortable with pets', 'patient and calm',
+]
+PROFILE_PHRASES = [
+    'Caring and patient.', 'Loves outdoor activities.', 'Ten years of experience.', 'Trained nurse.',
+    'Enjoys reading aloud.', 'Fluent in English.', 'Non-smoker.', 'Available on weekends.',
+]
+EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _weighted(pairs):
+    values, weights = zip(*pairs)
+    return list(values), list(weights)
+
+
+class DataGenerator:
+    """Deterministic synthetic rows for every table, in the importer's row format.
+
+    Roughly half the users are caregivers and half members. Each kind draws
+    from its own seeded stream, so the same seed and size always give the
+    same rows, whichever kinds are generated.
+    """
+
+    def __init__(self, users, seed=0):
+        self.size = users
+        self.seed = seed
+        rng = self._rng('roles')
+        self.is_caregiver = bytearray(rng.random() < 0.5 for _ in range(users))
+        caregiver_ids = [i for i in range(users) if self.is_caregiver[i]]
+        types, weights = _weighted(CAREGIVING_TYPES)
+        self.caregiver_types = dict(zip(caregiver_ids, rng.choices(types, weights, k=len(caregiver_ids))))
+        cities, weights = _weighted(CITIES)
+        self.cities = rng.choices(cities, weights, k=users)
+
+    def _rng(self, kind):
+        return random.Random(f'{self.seed}:{kind}')
+
+    @staticmethod
+    @functools.cache
+    def password_hash():
+        # Every generated user's password is "password"; hash it once rather
+        # than once per row.
+        return make_password('password')
+
+    @staticmethod
+    def email(i):
+        return f'user{i}@example.com'
+
+    def caregivers_of_type(self):
+        by_type = {}
+        for i, t in self.caregiver_types.items():
+            by_type.setdefault(t, []).append(i)
+        return by_type
+
+    def users(self):
+        rng = self._rng('users')
+        for i in range(self.size):
+            given_name, surname = rng.choice(GIVEN_NAMES), rng.choice(SURNAMES)
+            # queries.py updates "Arman Armanov" to one phone number, so only user 0 has that name.
+            while i and (given_name, surname) == ('Arman', 'Armanov'):
+                surname = rng.choice(SURNAMES)
+            yield {
+                'email': self.email(i),
+                'given_name': 'Arman' if i == 0 else given_name,
+                'surname': 'Armanov' if i == 0 else surname,
+                'city': self.cities[i],
+                'phone_number': f'+7700{i:07d}',
+                'profile_description': ' '.join(rng.sample(PROFILE_PHRASES, rng.randint(1, 3))),
+                'password': self.password_hash(),
+            }
+
+    def caregivers(self):
+        rng = self._rng('caregivers')
+        for i, caregiving_type in self.caregiver_types.items():
+            rate = BASE_RATES[caregiving_type] * rng.lognormvariate(0, 0.3)
+            yield {
+                'email': self.email(i),
+                'gender': rng.choice(['male', 'female']),
+                'caregiving_type': caregiving_type,
+                'hourly_rate': f'{rate:.2f}',
+            }
+
+    def members(self):
+        rng = self._rng('members')
+        for i in range(self.size):
+            if not self.is_caregiver[i]:
+                yield {
+                    'email': self.email(i),
+                    'house_rules': ' '.join(rng.sample(HOUSE_RULES, rng.randint(1, 3))),
+                    'dependent_description': rng.choice([
+                        'A {}-year-old child.', 'My {}-year-old grandmother.', 'Twins, aged {}.',
+                    ]).format(rng.randint(2, 90)),
+                }
+
+    def addresses(self):
+        rng = self._rng('addresses')
+        for i in range(self.size):
+            if not self.is_caregiver[i]:
+                yield {
+                    'member_email': self.email(i),
+                    'house_number': str(rng.randint(1, 200)),
+                    'street': rng.choice(STREETS),
+                    'town': self.cities[i],
+                }
+
+    def jobs(self):
+        rng = self._rng('jobs')
+        types, weights = _weighted(CAREGIVING_TYPES)
+        for i in range(self.size):
+            if self.is_caregiver[i]:
+                continue
+            # Geometric: most members post zero to two jobs, a few post many.
+            while rng.random() < 0.6:
+                yield {
+                    'member_email': self.email(i),
+                    'required_caregiving_type': rng.choices(types, weights)[0],
+                    'other_requirements': ', '.join(rng.sample(REQUIREMENTS, rng.randint(0, 3))),
+                    'date_posted': (EPOCH - datetime.timedelta(minutes=rng.randrange(365 * 24 * 60))).isoformat(),
+                }
+
+    def job_applications(self, jobs):
+        """``jobs`` is ``(job_id, required_caregiving_type)`` pairs of the loaded jobs."""
+        rng = self._rng('job_applications')
+        by_type = self.caregivers_of_type()
+        for job_id, caregiving_type in jobs:
+            candidates = by_type.get(caregiving_type, [])
+            count = min(len(candidates), int(rng.expovariate(1 / 3)))
+            for i in sorted(rng.sample(candidates, count)):
+                yield {
+                    'caregiver_email': self.email(i),
+                    'job_id': job_id,
+                    'date_applied': (EPOCH - datetime.timedelta(minutes=rng.randrange(30 * 24 * 60))).isoformat(),
+                }
+
+    def appointments(self):
+        rng = self._rng('appointments')
+        members = [i for i in range(self.size) if not self.is_caregiver[i]]
+        if not members:
+            return
+        statuses, weights = _weighted(STATUSES)
+        for i in self.caregiver_types:
+            # One appointment per day at most, so no caregiver is double-booked.
+            for day in sorted(rng.sample(range(365), min(365, int(rng.expovariate(1 / 3))))):
+                yield {
+                    'caregiver_email': self.email(i),
+                    'member_email': self.email(rng.choice(members)),
+                    'appointment_date': (EPOCH.date() - datetime.timedelta(days=day)).isoformat(),
+                    'appointment_time': f'{rng.randint(7, 18):02d}:{rng.choice(["00", "30"])}',
+                    'work_hours': rng.randint(1, 5),
+                    'status': rng.choices(statuses, weights)[0],
+                }
+
+    def rows(self, kind):
+        if kind == 'job_applications':
+            jobs = Job.objects.order_by('job_id').values_list('job_id', 'required_caregiving_type')
+            return self.job_applications(jobs.iterator(chunk_size=20000))
+        return getattr(self, kind)()
+
+
+def generate(users, seed=0, kinds=KINDS, batch_size=5000, progress=None):
+    """Load generated rows through COPY; returns ``{kind: ImportResult}``."""
+    generator = DataGenerator(users, seed)
+    results = {}
+    for kind in kinds:
+        importer = Importer(kind, batch_size=batch_size, method='copy')
+        numbered = ((n, row) for n, row in enumerate(generator.rows(kind), start=1))
+        results[kind] = importer.run(numbered, progress=progress and (lambda r, kind=kind: progress(kind, r)))
+    return results
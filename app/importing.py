@@ -0,0 +1,234 @@
+import csv
+import datetime
+import io
+import itertools
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .caching import invalidate
+from .credentials import hash_passwords, is_hashed
+from .models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+
+# kind -> (model, {foreign key attname: (natural-key column, id-set name)})
+IMPORT_SPECS = {
+    'users': (User, {}),
+    'caregivers': (Caregiver, {'caregiver_user_id': ('email', 'users')}),
+    'members': (Member, {'member_user_id': ('email', 'users')}),
+    'addresses': (Address, {'member_user_id': ('member_email', 'members')}),
+    'jobs': (Job, {'member_user_id': ('member_email', 'members')}),
+    'job_applications': (JobApplication, {
+        'caregiver_user_id': ('caregiver_email', 'caregivers'),
+        'job_id': (None, 'jobs'),
+    }),
+    'appointments': (Appointment, {
+        'caregiver_user_id': ('caregiver_email', 'caregivers'),
+        'member_user_id': ('member_email', 'members'),
+    }),
+}
+
+ID_SETS = {
+    'users': lambda: User.objects.values_list('user_id', flat=True),
+    'caregivers': lambda: Caregiver.objects.values_list('caregiver_user_id', flat=True),
+    'members': lambda: Member.objects.values_list('member_user_id', flat=True),
+    'jobs': lambda: Job.objects.values_list('job_id', flat=True),
+}
+
+# Filled in when a row omits them.
+DEFAULTS = {
+    'date_posted': timezone.now,
+    'date_applied': timezone.now,
+}
+
+
+class RowError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows_read = 0
+        self.inserted = 0
+        # (line_number, message, original row)
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(path, fmt=None):
+    """Yield ``(line_number, dict)`` from a CSV or JSON Lines file, lazily.
+
+    A JSON Lines line that does not hold an object is yielded as its text, so
+    the importer rejects that row alone.
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError:
+                        yield line_number, line.rstrip('\n')
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class Importer:
+    """Validate and load rows of one model in fixed-size chunks.
+
+    Foreign keys may be given either as ids or as the referenced user's email;
+    both are resolved against maps loaded once per run, so a chunk costs one
+    INSERT (or COPY) rather than a lookup per row. Rows that fail validation
+    are reported and skipped; if the database rejects a chunk, that chunk is
+    retried row by row so only the offending rows are lost.
+    """
+
+    def __init__(self, kind, batch_size=5000, method='bulk'):
+        self.model, self.foreign_keys = IMPORT_SPECS[kind]
+        self.batch_size = batch_size
+        self.method = method
+        self.fields = [
+            f for f in self.model._meta.concrete_fields
+            if not f.generated and not (f.primary_key and f.get_internal_type() == 'AutoField')
+        ]
+        self._id_sets = {}
+        self._emails = None
+
+    def _ids(self, name):
+        if name not in self._id_sets:
+            self._id_sets[name] = set(ID_SETS[name]().iterator(chunk_size=20000))
+        return self._id_sets[name]
+
+    def _user_id_for_email(self, email):
+        if self._emails is None:
+            self._emails = dict(User.objects.values_list('email', 'user_id').iterator(chunk_size=20000))
+        return self._emails.get(email)
+
+    def _resolve_fk(self, row, attname):
+        email_column, id_set = self.foreign_keys[attname]
+        raw = row.get(attname) or row.get(attname[:-3])
+        if raw in (None, '') and email_column and row.get(email_column):
+            value = self._user_id_for_email(row[email_column])
+            if value is None:
+                raise RowError(f'no user with email {row[email_column]!r}')
+        elif raw in (None, ''):
+            raise RowError(f'{attname} is required')
+        else:
+            try:
+                value = int(raw)
+            except (TypeError, ValueError):
+                raise RowError(f'{attname} must be an integer, got {raw!r}')
+        if value not in self._ids(id_set):
+            raise RowError(f'{attname}={value} does not reference an existing {id_set[:-1]}')
+        return value
+
+    def build(self, row):
+        if not isinstance(row, dict):
+            raise RowError('not a JSON object')
+        values = {}
+        for field in self.fields:
+            if field.attname in self.foreign_keys:
+                values[field.attname] = self._resolve_fk(row, field.attname)
+                continue
+            raw = row.get(field.name)
+            if raw in (None, '') and field.name in DEFAULTS:
+                values[field.attname] = DEFAULTS[field.name]()
+                continue
+            if raw == '' and (field.null or field.has_default()):
+                raw = None
+            if raw is None and field.has_default():
+                raw = field.get_default()
+            try:
+                value = field.clean(raw, None)
+            except ValidationError as e:
+                raise RowError(f"{field.name}: {'; '.join(e.messages)}")
+            if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            values[field.attname] = value
+        return self.model(**values)
+
+    @staticmethod
+    def _hash_passwords(users):
+        # Already-hashed values (e.g. from an export) are loaded as they are.
+        plaintext = [user for user in users if not is_hashed(user.password)]
+        for user, encoded in zip(plaintext, hash_passwords([user.password for user in plaintext])):
+            user.password = encoded
+
+    def _insert_bulk(self, objs):
+        with transaction.atomic():
+            self.model.objects.bulk_create(objs)
+
+    def _insert_copy(self, objs):
+        columns = [f.column for f in self.fields]
+        buffer = io.StringIO()
+        for obj in objs:
+            buffer.write('\t'.join(
+                _copy_value(f.get_db_prep_save(getattr(obj, f.attname), connection)) for f in self.fields
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        column_sql = ', '.join(connection.ops.quote_name(c) for c in columns)
+        with transaction.atomic(), connection.cursor() as cursor, connection.wrap_database_errors:
+            cursor.copy_expert(f'COPY {table} ({column_sql}) FROM STDIN', buffer)
+
+    def _insert_one_by_one(self, batch, result):
+        for line_number, row, obj in batch:
+            try:
+                with transaction.atomic():
+                    obj.save(force_insert=True)
+                result.inserted += 1
+            except DatabaseError as e:
+                result.errors.append((line_number, str(e).strip().splitlines()[0], row))
+
+    def load_chunk(self, chunk, result):
+        batch = []
+        for line_number, row in chunk:
+            result.rows_read += 1
+            try:
+                batch.append((line_number, row, self.build(row)))
+            except RowError as e:
+                result.errors.append((line_number, str(e), row))
+        if not batch:
+            return
+        if self.model is User:
+            self._hash_passwords([obj for _, _, obj in batch])
+        insert = self._insert_copy if self.method == 'copy' else self._insert_bulk
+        try:
+            insert([obj for _, _, obj in batch])
+            result.inserted += len(batch)
+        except DatabaseError:
+            self._insert_one_by_one(batch, result)
+
+    def run(self, rows, progress=None):
+        result = ImportResult()
+        start = time.perf_counter()
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, self.batch_size))
+            if not chunk:
+                break
+            self.load_chunk(chunk, result)
+            result.elapsed = time.perf_counter() - start
+            if progress:
+                progress(result)
+        # bulk_create and COPY send no post_save signals.
+        invalidate(self.model)
+        result.elapsed = time.perf_counter() - start
+        return result
@@ -0,0 +1,97 @@
+from django.db.models import Q
+
+from .caching import cached
+from .models import User, Caregiver, Member, Job
+
+MIN_QUERY_LENGTH = 2
+MAX_RESULTS = 20
+
+
+def _person_filter(q, prefix=''):
+    # istartswith compiles to UPPER(col) LIKE 'Q%', which the UPPER(...)
+    # text_pattern_ops indexes on "user" can serve; phone numbers use the
+    # varchar_pattern_ops index Django creates for the unique column.
+    return (
+        Q(**{f'{prefix}given_name__istartswith': q})
+        | Q(**{f'{prefix}surname__istartswith': q})
+        | Q(**{f'{prefix}email__istartswith': q})
+        | Q(**{f'{prefix}phone_number__startswith': q})
+    )
+
+
+def _person_label(row, prefix=''):
+    return f"{row[prefix + 'given_name']} {row[prefix + 'surname']} ({row[prefix + 'email']})"
+
+
+def lookup_users(q):
+    rows = (
+        User.objects.filter(_person_filter(q))
+        .values('user_id', 'given_name', 'surname', 'email')[:MAX_RESULTS]
+    )
+    return [{'id': row['user_id'], 'label': _person_label(row)} for row in rows]
+
+
+def lookup_caregivers(q):
+    prefix = 'caregiver_user__'
+    rows = (
+        Caregiver.objects.filter(_person_filter(q, prefix))
+        .values('caregiver_user_id', 'caregiving_type', f'{prefix}given_name', f'{prefix}surname', f'{prefix}email')
+        [:MAX_RESULTS]
+    )
+    return [
+        {'id': row['caregiver_user_id'], 'label': f"{_person_label(row, prefix)} - {row['caregiving_type']}"}
+        for row in rows
+    ]
+
+
+def lookup_members(q):
+    prefix = 'member_user__'
+    rows = (
+        Member.objects.filter(_person_filter(q, prefix))
+        .values('member_user_id', f'{prefix}given_name', f'{prefix}surname', f'{prefix}email')
+        [:MAX_RESULTS]
+    )
+    return [{'id': row['member_user_id'], 'label': _person_label(row, prefix)} for row in rows]
+
+
+def lookup_jobs(q):
+    prefix = 'member_user__member_user__'
+    if q.isdigit():
+        condition = Q(job_id=int(q))
+    else:
+        condition = Q(**{f'{prefix}given_name__istartswith': q}) | Q(**{f'{prefix}surname__istartswith': q})
+    rows = (
+        Job.objects.filter(condition)
+        .values('job_id', 'required_caregiving_type', f'{prefix}given_name', f'{prefix}surname')
+        [:MAX_RESULTS]
+    )
+    return [
+        {
+            'id': row['job_id'],
+            'label': f"Job #{row['job_id']}: {row['required_caregiving_type']} for "
+                     f"{row[prefix + 'given_name']} {row[prefix + 'surname']}",
+        }
+        for row in rows
+    ]
+
+
+LOOKUPS = {
+    'users': lookup_users,
+    'caregivers': lookup_caregivers,
+    'members': lookup_members,
+    'jobs': lookup_jobs,
+}
+
+LOOKUP_MODELS = {
+    'users': [User],
+    'caregivers': [Caregiver, User],
+    'members': [Member, User],
+    'jobs': [Job, Member, User],
+}
+
+
+def run_lookup(kind, q):
+    q = q.strip()
+    if len(q) < MIN_QUERY_LENGTH and not q.isdigit():
+        return []
+    return cached(f'lookup:{kind}', LOOKUP_MODELS[kind], lambda: LOOKUPS[kind](q), q)
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.exporting import CONTENT_TYPES, EXPORTS, render_export
+
+
+class Command(BaseCommand):
+    help = 'Stream a table to CSV/JSON/JSONL using the same filters as the list pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(CONTENT_TYPES), default='csv')
+        parser.add_argument('--output', help='defaults to stdout')
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help='list-page filter, e.g. --filter status=confirmed')
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'--filter expects NAME=VALUE, got {item!r}')
+            params[name] = value
+
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for block in render_export(options['kind'], params, options['format']):
+                out.write(block)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.generating import KINDS, SCALES, generate
+from app.models import User
+
+
+class Command(BaseCommand):
+    help = 'Fill an empty database with deterministic synthetic data for all seven tables'
+
+    def add_arguments(self, parser):
+        size = parser.add_mutually_exclusive_group(required=True)
+        size.add_argument('--scale', choices=sorted(SCALES, key=SCALES.get),
+                          help=', '.join(f'{name}={users:,} users' for name, users in SCALES.items()))
+        size.add_argument('--users', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip', nargs='*', choices=KINDS, default=[], help='tables to leave empty')
+
+    def handle(self, *args, **options):
+        users = options['users'] or SCALES[options['scale']]
+        if User.objects.exists():
+            raise CommandError('The database already has users; generate into an empty database.')
+
+        def progress(kind, result):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{kind}: {result.inserted} rows ({result.rows_per_second:.0f} rows/s)')
+
+        kinds = [kind for kind in KINDS if kind not in options['skip']]
+        results = generate(users, seed=options['seed'], kinds=kinds, batch_size=options['batch_size'],
+                           progress=progress)
+        for kind, result in results.items():
+            for line_number, message, _ in result.errors[:5]:
+                self.stderr.write(f'{kind} row {line_number}: {message}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{kind}: {result.inserted} rows in {result.elapsed:.1f}s, {len(result.errors)} rejected'
+            ))
@@ -0,0 +1,30 @@
+import itertools
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.caching import invalidate
+from app.credentials import hash_passwords, is_hashed
+from app.models import User
+
+
+class Command(BaseCommand):
+    help = 'Hash the passwords still stored as plaintext (they are otherwise upgraded on the next verification)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rows = User.objects.order_by('user_id').values_list('user_id', 'password').iterator(chunk_size=20000)
+        plaintext = ((user_id, password) for user_id, password in rows if not is_hashed(password))
+        total = 0
+        while batch := list(itertools.islice(plaintext, options['batch_size'])):
+            hashed = hash_passwords([password for _, password in batch])
+            users = [User(user_id=user_id, password=encoded) for (user_id, _), encoded in zip(batch, hashed)]
+            with transaction.atomic():
+                User.objects.bulk_update(users, ['password'])
+            total += len(users)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{total} passwords hashed')
+        invalidate(User)
+        self.stdout.write(self.style.SUCCESS(f'Hashed {total} plaintext passwords'))
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from app.importing import IMPORT_SPECS, Importer, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load users, caregivers, members, addresses, jobs, job applications or appointments from CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORT_SPECS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--method', choices=['bulk', 'copy'], default='bulk',
+                            help="'copy' streams each chunk through PostgreSQL COPY")
+        parser.add_argument('--errors', help='write rejected rows, with their line number and error, to this JSONL file')
+
+    def handle(self, *args, **options):
+        importer = Importer(options['kind'], batch_size=options['batch_size'], method=options['method'])
+
+        def progress(result):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{result.rows_read} rows, {result.inserted} inserted, {len(result.errors)} rejected '
+                    f'({result.rows_per_second:.0f} rows/s)'
+                )
+
+        result = importer.run(read_rows(options['path'], options['format']), progress=progress)
+
+        if options['errors'] and result.errors:
+            with open(options['errors'], 'w') as f:
+                for line_number, message, row in result.errors:
+                    f.write(json.dumps({'line': line_number, 'error': message, 'row': row}, default=str) + '\n')
+        for line_number, message, _ in result.errors[:20]:
+            self.stderr.write(f'line {line_number}: {message}')
+        if len(result.errors) > 20:
+            self.stderr.write(f'... and {len(result.errors) - 20} more')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.inserted} of {result.rows_read} {options['kind']} rows in "
+            f'{result.elapsed:.1f}s ({result.rows_per_second:.0f} rows/s), {len(result.errors)} rejected'
+        ))
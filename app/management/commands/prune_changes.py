@@ -0,0 +1,18 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.feed import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed rows older than the retention period; clients behind it must reload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=settings.CHANGE_FEED_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = prune(timezone.now() - datetime.timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} changes'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+REBUILD_SQL = """
+LOCK TABLE appointment IN SHARE MODE;
+DELETE FROM caregiver_earnings;
+INSERT INTO caregiver_earnings (caregiver_user_id, appointment_count, total_hours)
+SELECT caregiver_user_id, count(*), sum(work_hours)
+FROM appointment
+WHERE status = 'confirmed'
+GROUP BY caregiver_user_id;
+"""
+
+
+class Command(BaseCommand):
+    help = 'Recompute caregiver_earnings from the appointment table (the triggers keep it current otherwise)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(REBUILD_SQL)
+            cursor.execute('SELECT count(*) FROM caregiver_earnings')
+            count = cursor.fetchone()[0]
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt earnings for {count} caregivers'))
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.profiling import load_profiles
+
+SORT_KEYS = {
+    'mean': lambda stats: stats['total_time'] / stats['requests'],
+    'total': lambda stats: stats['total_time'],
+    'max': lambda stats: stats['max_time'],
+    'queries': lambda stats: stats['queries'] / stats['requests'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Show the slowest endpoints recorded by QueryProfileMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='mean')
+        parser.add_argument('--dir', default=str(settings.SQL_PROFILING_DIR))
+        parser.add_argument('--statements', action='store_true', help='also print each endpoint\'s slowest SQL')
+
+    def handle(self, *args, **options):
+        endpoints = load_profiles(options['dir'], settings.SQL_PROFILING_SLOW_STATEMENTS)
+        if not endpoints:
+            self.stdout.write(f"No profiles found in {options['dir']}")
+            return
+
+        ranked = sorted(endpoints.items(), key=lambda item: SORT_KEYS[options['sort']](item[1]), reverse=True)
+        self.stdout.write(f"{'view':<30} {'reqs':>7} {'mean ms':>9} {'max ms':>9} {'sql/req':>8} {'db ms/req':>10} {'tpl ms/req':>11} {'dups':>6}")
+        for view, stats in ranked[:options['top']]:
+            n = stats['requests']
+            self.stdout.write(
+                f"{view:<30} {n:>7} {stats['total_time'] / n * 1000:>9.1f} {stats['max_time'] * 1000:>9.1f} "
+                f"{stats['queries'] / n:>8.1f} {stats['db_time'] / n * 1000:>10.1f} "
+                f"{stats['template_time'] / n * 1000:>11.1f} {stats['duplicate_queries']:>6}"
+            )
+            if options['statements']:
+                for duration, sql in stats['slowest']:
+                    self.stdout.write(f"    {duration * 1000:8.1f} ms  {sql}")
@@ -0,0 +1,243 @@
+import bisect
+import itertools
+import threading
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import User, Caregiver, Appointment
+
+DEFAULT_K = 10
+MAX_K = 100
+
+
+class MatchIndex:
+    """In-memory candidate buckets for ranking caregivers against a job.
+
+    Caregivers are bucketed by (caregiving_type, city); each bucket is a list
+    of (hourly_rate, caregiver_id) kept sorted, so a rate band is a bisect
+    away. Confirmed appointment counts per member -> caregiver rank repeat
+    caregivers first. Every mutation is incremental; nothing rescans.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = defaultdict(list)
+        self._caregivers = {}
+        self._history = defaultdict(Counter)
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._caregivers)
+
+    def put_caregiver(self, caregiver_id, caregiving_type, city, hourly_rate):
+        with self._lock:
+            self._discard(caregiver_id)
+            key = (caregiving_type, city)
+            self._caregivers[caregiver_id] = (key, hourly_rate)
+            bisect.insort(self._buckets[key], (hourly_rate, caregiver_id))
+
+    def remove_caregiver(self, caregiver_id):
+        with self._lock:
+            self._discard(caregiver_id)
+
+    def _discard(self, caregiver_id):
+        entry = self._caregivers.pop(caregiver_id, None)
+        if entry is None:
+            return
+        key, rate = entry
+        bucket = self._buckets[key]
+        del bucket[bisect.bisect_left(bucket, (rate, caregiver_id))]
+
+    def city_of(self, caregiver_id):
+        entry = self._caregivers.get(caregiver_id)
+        return None if entry is None else entry[0][1]
+
+    def set_city(self, caregiver_id, city):
+        entry = self._caregivers.get(caregiver_id)
+        if entry is not None and entry[0][1] != city:
+            (caregiving_type, _), rate = entry
+            self.put_caregiver(caregiver_id, caregiving_type, city, rate)
+
+    def set_history(self, member_id, counts):
+        with self._lock:
+            if counts:
+                self._history[member_id] = Counter(counts)
+            else:
+                self._history.pop(member_id, None)
+
+    def match(self, caregiving_type, city, member_id=None, min_rate=None, max_rate=None, k=DEFAULT_K):
+        """Return up to ``k`` (caregiver_id, hourly_rate, past_appointments) tuples.
+
+        Caregivers the member has confirmed appointments with come first (most
+        appointments first), then the rest of the bucket by ascending rate.
+        """
+        key = (caregiving_type, city)
+        with self._lock:
+            bucket = self._buckets.get(key, [])
+            lo = 0 if min_rate is None else bisect.bisect_left(bucket, (min_rate,))
+            hi = len(bucket) if max_rate is None else bisect.bisect_right(bucket, (max_rate, float('inf')))
+            history = self._history.get(member_id, {})
+            repeat = []
+            for caregiver_id, n in history.items():
+                entry = self._caregivers.get(caregiver_id)
+                if entry is None or entry[0] != key:
+                    continue
+                rate = entry[1]
+                if (min_rate is None or rate >= min_rate) and (max_rate is None or rate <= max_rate):
+                    repeat.append((caregiver_id, rate, n))
+            repeat.sort(key=lambda r: (-r[2], r[1], r[0]))
+            results = repeat[:k]
+            seen = {r[0] for r in results}
+            rest = (
+                (caregiver_id, rate, 0)
+                for rate, caregiver_id in itertools.islice(bucket, lo, hi)
+                if caregiver_id not in seen
+            )
+            results.extend(itertools.islice(rest, k - len(results)))
+        return results
+
+
+def load_index():
+    index = MatchIndex()
+    rows = Caregiver.objects.values_list(
+        'caregiver_user_id', 'caregiving_type', 'caregiver_user__city', 'hourly_rate',
+    )
+    for row in rows.iterator(chunk_size=10000):
+        index.put_caregiver(*row)
+    history = defaultdict(dict)
+    counts = (
+        Appointment.objects.filter(status='confirmed')
+        .values_list('member_user_id', 'caregiver_user_id')
+        .annotate(n=Count('*'))
+    )
+    for member_id, caregiver_id, n in counts.iterator(chunk_size=10000):
+        history[member_id][caregiver_id] = n
+    for member_id, member_counts in history.items():
+        index.set_history(member_id, member_counts)
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide index, rebuilding it after MATCHING_REFRESH_SECONDS.
+
+    Signals keep it current for ORM writes made in this process; the periodic
+    rebuild picks up writes from other processes and the SQLAlchemy scripts.
+    Bulk actions call reset_index().
+    """
+    global _index
+    index = _index
+    if index is None or time.monotonic() - index.built_at > settings.MATCHING_REFRESH_SECONDS:
+        with _index_lock:
+            if _index is index:
+                _index = load_index()
+            index = _index
+    return index
+
+
+def reset_index():
+    """Drop the index so the next match rebuilds it, after writes that bypass signals."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+# Columns the index is built from. A set-based UPDATE of any of them sends
+# no post_save, so it drops the index instead.
+INDEXED_FIELDS = {
+    Caregiver: {'caregiving_type', 'hourly_rate'},
+    User: {'city'},
+    Appointment: {'caregiver_user_id', 'member_user_id', 'status'},
+}
+
+
+def rows_updated(model, fields):
+    if INDEXED_FIELDS.get(model, set()) & set(fields):
+        transaction.on_commit(reset_index)
+
+
+def match_job(job, min_rate=None, max_rate=None, k=DEFAULT_K):
+    return get_index().match(
+        job.required_caregiving_type, job.member_user.member_user.city, job.member_user_id,
+        min_rate=min_rate, max_rate=max_rate, k=k,
+    )
+
+
+def _member_history(member_id):
+    return dict(
+        Appointment.objects.filter(member_user_id=member_id, status='confirmed')
+        .values_list('caregiver_user_id')
+        .annotate(n=Count('*'))
+    )
+
+
+def _on_commit(apply):
+    # Only committed writes reach the index; a rolled-back one never does.
+    def run():
+        if _index is not None:
+            apply(_index)
+    if _index is not None:
+        transaction.on_commit(run)
+
+
+@receiver(post_save, sender=Caregiver)
+def _caregiver_saved(sender, instance, **kwargs):
+    caregiver_id, caregiving_type = instance.caregiver_user_id, instance.caregiving_type
+    # Views assign the posted string; the buckets compare Decimals.
+    rate = Decimal(instance.hourly_rate)
+    user = instance.caregiver_user if Caregiver.caregiver_user.is_cached(instance) else None
+
+    def apply(index):
+        # An update keeps the indexed city (User saves move it); only a new
+        # caregiver whose user was not loaded needs to look it up.
+        city = user.city if user is not None else index.city_of(caregiver_id)
+        if city is None:
+            city = User.objects.filter(pk=caregiver_id).values_list('city', flat=True).first()
+        index.put_caregiver(caregiver_id, caregiving_type, city, rate)
+    _on_commit(apply)
+
+
+@receiver(post_delete, sender=Caregiver)
+def _caregiver_deleted(sender, instance, **kwargs):
+    caregiver_id = instance.caregiver_user_id
+    _on_commit(lambda index: index.remove_caregiver(caregiver_id))
+
+
+@receiver(post_save, sender=User)
+def _user_saved(sender, instance, **kwargs):
+    user_id, city = instance.user_id, instance.city
+    _on_commit(lambda index: index.set_city(user_id, city))
+
+
+@receiver(pre_save, sender=Appointment)
+def _appointment_saving(sender, instance, update_fields=None, **kwargs):
+    # An update may move the appointment to another member, whose history
+    # then loses it. The views update without reading the row first, so the
+    # stored member is looked up here, and only while an index is loaded.
+    instance._previous_member_user_id = None
+    if _index is None or instance.pk is None or (update_fields is not None and 'member_user' not in update_fields):
+        return
+    instance._previous_member_user_id = (
+        Appointment.objects.filter(pk=instance.pk).values_list('member_user_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def _appointment_changed(sender, instance, **kwargs):
+    member_ids = {instance.member_user_id, getattr(instance, '_previous_member_user_id', None)} - {None}
+
+    def apply(index):
+        for member_id in member_ids:
+            index.set_history(member_id, _member_history(member_id))
+    _on_commit(apply)
@@ -0,0 +1,59 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['town'], name='address_town_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['street'], name='address_street_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['caregiver_user', 'status'], name='appointment_cg_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['member_user', 'status'], name='appointment_mb_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'appointment_date'], name='appointment_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'appointment_id'], name='appointment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caregiver',
+            index=models.Index(fields=['caregiving_type', 'hourly_rate'], name='caregiver_type_rate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caregiver',
+            index=models.Index(fields=['hourly_rate', 'caregiver_user'], name='caregiver_rate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['required_caregiving_type', 'date_posted'], name='job_type_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['date_posted', 'job_id'], name='job_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['city'], name='user_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['surname', 'user_id'], name='user_surname_idx'),
+        ),
+    ]
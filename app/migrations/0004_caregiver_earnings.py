@@ -0,0 +1,105 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Statement-level triggers with transition tables: one aggregated upsert per
+# statement, so bulk loads and set-based updates stay cheap.
+TRIGGERS_SQL = """
+CREATE FUNCTION caregiver_earnings_on_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO caregiver_earnings AS e (caregiver_user_id, appointment_count, total_hours)
+    SELECT caregiver_user_id, count(*), sum(work_hours)
+    FROM new_rows
+    WHERE status = 'confirmed'
+    GROUP BY caregiver_user_id
+    ORDER BY caregiver_user_id
+    ON CONFLICT (caregiver_user_id) DO UPDATE
+    SET appointment_count = e.appointment_count + EXCLUDED.appointment_count,
+        total_hours = e.total_hours + EXCLUDED.total_hours;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION caregiver_earnings_on_update() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO caregiver_earnings AS e (caregiver_user_id, appointment_count, total_hours)
+    SELECT caregiver_user_id, sum(delta_count), sum(delta_hours)
+    FROM (
+        SELECT caregiver_user_id, 1 AS delta_count, work_hours AS delta_hours
+        FROM new_rows WHERE status = 'confirmed'
+        UNION ALL
+        SELECT caregiver_user_id, -1, -work_hours
+        FROM old_rows WHERE status = 'confirmed'
+    ) changes
+    GROUP BY caregiver_user_id
+    HAVING sum(delta_count) <> 0 OR sum(delta_hours) <> 0
+    ORDER BY caregiver_user_id
+    ON CONFLICT (caregiver_user_id) DO UPDATE
+    SET appointment_count = e.appointment_count + EXCLUDED.appointment_count,
+        total_hours = e.total_hours + EXCLUDED.total_hours;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION caregiver_earnings_on_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE caregiver_earnings AS e
+    SET appointment_count = e.appointment_count - d.delta_count,
+        total_hours = e.total_hours - d.delta_hours
+    FROM (
+        SELECT caregiver_user_id, count(*) AS delta_count, sum(work_hours) AS delta_hours
+        FROM old_rows
+        WHERE status = 'confirmed'
+        GROUP BY caregiver_user_id
+    ) d
+    WHERE e.caregiver_user_id = d.caregiver_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER caregiver_earnings_insert AFTER INSERT ON appointment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_on_insert();
+CREATE TRIGGER caregiver_earnings_update AFTER UPDATE ON appointment
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_on_update();
+CREATE TRIGGER caregiver_earnings_delete AFTER DELETE ON appointment
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_on_delete();
+
+INSERT INTO caregiver_earnings (caregiver_user_id, appointment_count, total_hours)
+SELECT caregiver_user_id, count(*), sum(work_hours)
+FROM appointment
+WHERE status = 'confirmed'
+GROUP BY caregiver_user_id;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER caregiver_earnings_insert ON appointment;
+DROP TRIGGER caregiver_earnings_update ON appointment;
+DROP TRIGGER caregiver_earnings_delete ON appointment;
+DROP FUNCTION caregiver_earnings_on_insert();
+DROP FUNCTION caregiver_earnings_on_update();
+DROP FUNCTION caregiver_earnings_on_delete();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_lookup_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaregiverEarnings',
+            fields=[
+                ('caregiver_user', models.OneToOneField(db_column='caregiver_user_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='app.caregiver')),
+                ('appointment_count', models.IntegerField(default=0)),
+                ('total_hours', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'caregiver_earnings',
+            },
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,17 @@
+import app.expressions
+import django.contrib.postgres.constraints
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_full_text_search'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status', 'declined'), _negated=True), expressions=[(app.expressions.PointRange(models.F('caregiver_user')), '&&'), (app.expressions.SlotRange(models.F('appointment_date'), models.F('appointment_time'), models.F('work_hours')), '&&')], name='appointment_no_overlap', violation_error_message='The caregiver already has an appointment in this time slot.'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_appointment_overlap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkAudit',
+            fields=[
+                ('audit_id', models.AutoField(primary_key=True, serialize=False)),
+                ('action', models.CharField(max_length=50)),
+                ('filters', models.JSONField()),
+                ('changes', models.JSONField()),
+                ('row_count', models.IntegerField()),
+                ('performed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'bulk_audit',
+                'indexes': [models.Index(fields=['performed_at'], name='bulk_audit_performed_idx')],
+            },
+        ),
+    ]
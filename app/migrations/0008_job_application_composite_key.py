@@ -0,0 +1,89 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# job_application used to be unmanaged (created by schema.py), with
+# caregiver_user as the model's only primary key column. Create the table
+# where it is missing. Where it already exists, make sure its primary key is
+# (caregiver_user_id, job_id) and give its foreign keys and job_id index the
+# names Django would have generated, so later schema changes find them.
+PRIMARY_KEY_SQL = """
+DO $$
+DECLARE
+    pk_name text;
+    pk_columns text[];
+BEGIN
+    SELECT c.conname, array_agg(a.attname::text ORDER BY k.ord)
+    INTO pk_name, pk_columns
+    FROM pg_constraint c
+    CROSS JOIN unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+    WHERE c.conrelid = 'job_application'::regclass AND c.contype = 'p'
+    GROUP BY c.conname;
+    IF pk_columns IS DISTINCT FROM ARRAY['caregiver_user_id', 'job_id'] THEN
+        IF pk_name IS NOT NULL THEN
+            EXECUTE format('ALTER TABLE job_application DROP CONSTRAINT %I', pk_name);
+        END IF;
+        ALTER TABLE job_application ADD PRIMARY KEY (caregiver_user_id, job_id);
+    END IF;
+END
+$$;
+"""
+
+
+def create_or_adopt_table(apps, schema_editor):
+    model = apps.get_model('app', 'JobApplication')
+    table = model._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        exists = table in schema_editor.connection.introspection.table_names(cursor)
+    if not exists:
+        schema_editor.create_model(model)
+        return
+    schema_editor.execute(PRIMARY_KEY_SQL, None)
+    # Renamed rather than recreated: schema.py's ON DELETE CASCADE stays.
+    for name in ['caregiver_user', 'job']:
+        field = model._meta.get_field(name)
+        found = schema_editor._constraint_names(model, [field.column], foreign_key=True)
+        if found:
+            schema_editor.execute(
+                f'ALTER TABLE {schema_editor.quote_name(table)} RENAME CONSTRAINT '
+                f'{schema_editor.quote_name(found[0])} TO {schema_editor._fk_constraint_name(model, field, "_fk_%(to_table)s_%(to_column)s")}'
+            )
+        else:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+    job = model._meta.get_field('job')
+    found = schema_editor._constraint_names(model, [job.column], index=True, unique=False, primary_key=False)
+    if found:
+        schema_editor.execute(
+            f'ALTER INDEX {schema_editor.quote_name(found[0])} '
+            f'RENAME TO {schema_editor.quote_name(schema_editor._create_index_name(table, [job.column]))}'
+        )
+    else:
+        schema_editor.execute(schema_editor._create_index_sql(model, fields=[job]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_bulk_audit'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.DeleteModel(name='JobApplication'),
+                migrations.CreateModel(
+                    name='JobApplication',
+                    fields=[
+                        ('pk', models.CompositePrimaryKey('caregiver_user', 'job', blank=True, editable=False, primary_key=True, serialize=False)),
+                        ('caregiver_user', models.ForeignKey(db_column='caregiver_user_id', db_index=False, on_delete=django.db.models.deletion.CASCADE, to='app.caregiver')),
+                        ('job', models.ForeignKey(db_column='job_id', on_delete=django.db.models.deletion.CASCADE, to='app.job')),
+                        ('date_applied', models.DateTimeField()),
+                    ],
+                    options={
+                        'db_table': 'job_application',
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_or_adopt_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+# Statement-level triggers with transition tables, like caregiver_earnings:
+# one INSERT ... SELECT per statement however many rows it touched. The
+# NOTIFY payload is constant, so PostgreSQL sends one per transaction.
+TRIGGERS_SQL = """
+CREATE FUNCTION change_log_on_write() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO change_log (xid, table_name, op, data, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_TABLE_NAME, 'delete', to_jsonb(r) - 'search_vector', now()
+        FROM old_rows r;
+    ELSE
+        INSERT INTO change_log (xid, table_name, op, data, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_TABLE_NAME, lower(TG_OP), to_jsonb(r) - 'search_vector', now()
+        FROM new_rows r;
+    END IF;
+    IF FOUND THEN
+        PERFORM pg_notify('change_log', '');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+""" + "".join(f"""
+CREATE TRIGGER {table}_change_log_insert AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_log_on_write();
+CREATE TRIGGER {table}_change_log_update AFTER UPDATE ON {table}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_log_on_write();
+CREATE TRIGGER {table}_change_log_delete AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_log_on_write();
+""" for table in ('job', 'job_application'))
+
+DROP_TRIGGERS_SQL = "".join(f"""
+DROP TRIGGER {table}_change_log_insert ON {table};
+DROP TRIGGER {table}_change_log_update ON {table};
+DROP TRIGGER {table}_change_log_delete ON {table};
+""" for table in ('job', 'job_application')) + "DROP FUNCTION change_log_on_write();"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_job_application_composite_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('xid', models.BigIntegerField()),
+                ('table_name', models.CharField(max_length=50)),
+                ('op', models.CharField(max_length=10)),
+                ('data', models.JSONField()),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'change_log',
+                'indexes': [models.Index(fields=['xid', 'seq'], name='change_log_position_idx'), models.Index(fields=['changed_at'], name='change_log_changed_idx')],
+            },
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,21 @@
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='work_hours',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.CheckConstraint(condition=models.Q(('work_hours__gt', 0)), name='appointment_work_hours_positive'),
+        ),
+    ]
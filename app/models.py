@@ -1,4 +1,14 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import RangeOperators
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .expressions import PointRange, SlotRange
 
 
 class User(models.Model):
@@ -10,9 +20,22 @@ class User(models.Model):
     phone_number = models.CharField(unique=True, max_length=30)
     profile_description = models.TextField(blank=True, null=True)
     password = models.CharField(max_length=255)
+    search_vector = models.GeneratedField(
+        expression=SearchVector('profile_description', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'user'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='user_search_idx'),
+            models.Index(fields=['city'], name='user_city_idx'),
+            models.Index(fields=['surname', 'user_id'], name='user_surname_idx'),
+            models.Index(OpClass(Upper('given_name'), name='text_pattern_ops'), name='user_given_name_prefix_idx'),
+            models.Index(OpClass(Upper('surname'), name='text_pattern_ops'), name='user_surname_prefix_idx'),
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='user_email_prefix_idx'),
+        ]
 
 
 class Caregiver(models.Model):
@@ -35,15 +58,30 @@ class Caregiver(models.Model):
 
     class Meta:
         db_table = 'caregiver'
+        indexes = [
+            models.Index(fields=['caregiving_type', 'hourly_rate'], name='caregiver_type_rate_idx'),
+            models.Index(fields=['hourly_rate', 'caregiver_user'], name='caregiver_rate_idx'),
+        ]
 
 
 class Member(models.Model):
     member_user = models.OneToOneField('User', models.CASCADE, primary_key=True, db_column='member_user_id')
     house_rules = models.TextField(blank=True, null=True)
     dependent_description = models.TextField(blank=True, null=True)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('house_rules', config='english', weight='A')
+            + SearchVector('dependent_description', config='english', weight='B')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'member'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='member_search_idx'),
+        ]
 
 
 class Address(models.Model):
@@ -54,6 +92,10 @@ class Address(models.Model):
 
     class Meta:
         db_table = 'address'
+        indexes = [
+            models.Index(fields=['town'], name='address_town_idx'),
+            models.Index(fields=['street'], name='address_street_idx'),
+        ]
 
 
 class Job(models.Model):
@@ -68,20 +110,30 @@ class Job(models.Model):
     required_caregiving_type = models.CharField(max_length=20, choices=CAREGIVING_TYPE_CHOICES)
     other_requirements = models.TextField(blank=True, null=True)
     date_posted = models.DateTimeField()
+    search_vector = models.GeneratedField(
+        expression=SearchVector('other_requirements', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'job'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='job_search_idx'),
+            models.Index(fields=['required_caregiving_type', 'date_posted'], name='job_type_posted_idx'),
+            models.Index(fields=['date_posted', 'job_id'], name='job_posted_idx'),
+        ]
 
 
 class JobApplication(models.Model):
-    caregiver_user = models.ForeignKey('Caregiver', models.CASCADE, db_column='caregiver_user_id', primary_key=True)
+    pk = models.CompositePrimaryKey('caregiver_user', 'job')
+    # The primary key index leads with caregiver_user_id, so it needs none of its own.
+    caregiver_user = models.ForeignKey('Caregiver', models.CASCADE, db_column='caregiver_user_id', db_index=False)
     job = models.ForeignKey('Job', models.CASCADE, db_column='job_id')
     date_applied = models.DateTimeField()
 
     class Meta:
-        managed = False
         db_table = 'job_application'
-        unique_together = (('caregiver_user', 'job'),)
 
 
 class Appointment(models.Model):
@@ -96,8 +148,80 @@ class Appointment(models.Model):
     member_user = models.ForeignKey('Member', models.CASCADE, db_column='member_user_id')
     appointment_date = models.DateField()
     appointment_time = models.TimeField()
-    work_hours = models.IntegerField()
+    work_hours = models.IntegerField(validators=[MinValueValidator(1)])
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
     class Meta:
         db_table = 'appointment'
+        indexes = [
+            models.Index(fields=['caregiver_user', 'status'], name='appointment_cg_status_idx'),
+            models.Index(fields=['member_user', 'status'], name='appointment_mb_status_idx'),
+            models.Index(fields=['status', 'appointment_date'], name='appointment_status_date_idx'),
+            models.Index(fields=['appointment_date', 'appointment_time', 'appointment_id'], name='appointment_date_idx'),
+        ]
+        constraints = [
+            # An empty or negative slot is not a range PostgreSQL can build.
+            models.CheckConstraint(condition=Q(work_hours__gt=0), name='appointment_work_hours_positive'),
+            # A caregiver cannot hold two non-declined appointments whose time
+            # slots overlap. The GiST index behind this also serves the
+            # availability queries in app/availability.py.
+            ExclusionConstraint(
+                name='appointment_no_overlap',
+                expressions=[
+                    (PointRange(F('caregiver_user')), RangeOperators.OVERLAPS),
+                    (SlotRange(F('appointment_date'), F('appointment_time'), F('work_hours')), RangeOperators.OVERLAPS),
+                ],
+                condition=~Q(status='declined'),
+                violation_error_message='The caregiver already has an appointment in this time slot.',
+            ),
+        ]
+
+
+class CaregiverEarnings(models.Model):
+    """Per-caregiver totals over confirmed appointments.
+
+    Maintained by statement-level triggers on ``appointment`` (migration
+    0004), so it stays current for writes from Django, SQLAlchemy and bulk
+    loads alike. Pay is ``hourly_rate * total_hours`` at read time, which
+    keeps rate changes free of any refresh work.
+    """
+    caregiver_user = models.OneToOneField('Caregiver', models.CASCADE, primary_key=True, db_column='caregiver_user_id')
+    appointment_count = models.IntegerField(default=0)
+    total_hours = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'caregiver_earnings'
+
+
+class BulkAudit(models.Model):
+    """One row per executed bulk action (see app/bulk.py)."""
+    audit_id = models.AutoField(primary_key=True)
+    action = models.CharField(max_length=50)
+    filters = models.JSONField()
+    changes = models.JSONField()
+    row_count = models.IntegerField()
+    performed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'bulk_audit'
+        indexes = [
+            models.Index(fields=['performed_at'], name='bulk_audit_performed_idx'),
+        ]
+
+
+class ChangeLog(models.Model):
+    """One row per inserted, updated or deleted job or job application, written by triggers (see app/feed.py)."""
+    seq = models.BigAutoField(primary_key=True)
+    # The writing transaction's 64-bit id; the feed is ordered by (xid, seq).
+    xid = models.BigIntegerField()
+    table_name = models.CharField(max_length=50)
+    op = models.CharField(max_length=10)
+    data = models.JSONField()
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'change_log'
+        indexes = [
+            models.Index(fields=['xid', 'seq'], name='change_log_position_idx'),
+            models.Index(fields=['changed_at'], name='change_log_changed_idx'),
+        ]
@@ -0,0 +1,139 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class Page:
+    def __init__(self, items, limit, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values):
+    raw = json.dumps([_cursor_value(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """Return the cursor's values converted for ``fields``, or None if it is not a valid cursor for them."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, ValueError, TypeError):
+        return None
+    if None in values:
+        return None
+    return values
+
+
+def _cursor_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, str)) or value is None:
+        return value
+    return str(value)
+
+
+def _parse_limit(raw):
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _keyset_filter(keys, values, forward):
+    """Build ``(k1, k2, ...) > (v1, v2, ...)`` honouring per-key direction."""
+    condition = Q()
+    for i in range(len(keys) - 1, -1, -1):
+        name = keys[i].lstrip('-')
+        descending = keys[i].startswith('-')
+        op = 'lt' if descending == forward else 'gt'
+        step = Q(**{f'{name}__{op}': values[i]})
+        if i < len(keys) - 1:
+            step |= Q(**{name: values[i]}) & condition
+        condition = step
+    return condition
+
+
+def _reverse(keys):
+    return [k[1:] if k.startswith('-') else f'-{k}' for k in keys]
+
+
+def _plan(request, queryset, keys):
+    limit = _parse_limit(request.GET.get('limit'))
+    fields = [queryset.model._meta.get_field(k.lstrip('-')) for k in keys]
+    after = decode_cursor(request.GET.get('after', ''), fields)
+    before = decode_cursor(request.GET.get('before', ''), fields) if after is None else None
+    if before is not None:
+        qs = queryset.filter(_keyset_filter(keys, before, forward=False)).order_by(*_reverse(keys))
+    else:
+        qs = queryset
+        if after is not None:
+            qs = qs.filter(_keyset_filter(keys, after, forward=True))
+        qs = qs.order_by(*keys)
+    return qs[:limit + 1], limit, after, before
+
+
+def _page(rows, keys, limit, after, before):
+    names = [k.lstrip('-') for k in keys]
+    if before is not None:
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = after is not None
+
+    def cursor_for(row):
+        if isinstance(row, dict):
+            return encode_cursor([row[n] for n in names])
+        return encode_cursor([getattr(row, n) for n in names])
+
+    next_cursor = cursor_for(rows[-1]) if rows and has_next else None
+    prev_cursor = cursor_for(rows[0]) if rows and has_prev else None
+    return Page(rows, limit, next_cursor, prev_cursor)
+
+
+def keyset_paginate(request, queryset, keys):
+    """Slice ``queryset`` by the ``after``/``before`` cursors in the query string.
+
+    ``keys`` is the sort order; its last entry must be unique (usually the
+    primary key) so every row has a stable position.
+    """
+    qs, limit, after, before = _plan(request, queryset, keys)
+    return _page(list(qs), keys, limit, after, before)
+
+
+async def akeyset_paginate(request, queryset, keys):
+    """Async ``keyset_paginate`` for async views; rows are fetched with ``async for``."""
+    qs, limit, after, before = _plan(request, queryset, keys)
+    return _page([row async for row in qs], keys, limit, after, before)
@@ -0,0 +1,206 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('sql_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self, slow_limit):
+        self.slow_limit = slow_limit
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+        self.slowest = []
+
+    def record_query(self, sql, duration):
+        self.query_count += 1
+        self.db_time += duration
+        self.statements[sql] += 1
+        self.slowest.append((duration, sql))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[self.slow_limit:]
+
+    def duplicates(self, threshold):
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+class ProfileStore:
+    """Per-process aggregates keyed by view name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.requests_since_flush = 0
+
+    def add(self, view, duration, profile, duplicates):
+        with self.lock:
+            stats = self.endpoints.setdefault(view, {
+                'requests': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                'queries': 0,
+                'db_time': 0.0,
+                'template_time': 0.0,
+                'duplicate_queries': 0,
+                'slowest': [],
+            })
+            stats['requests'] += 1
+            stats['total_time'] += duration
+            stats['max_time'] = max(stats['max_time'], duration)
+            stats['queries'] += profile.query_count
+            stats['db_time'] += profile.db_time
+            stats['template_time'] += profile.template_time
+            stats['duplicate_queries'] += sum(duplicates.values())
+            slowest = stats['slowest'] + [[d, sql] for d, sql in profile.slowest]
+            slowest.sort(key=lambda item: item[0], reverse=True)
+            stats['slowest'] = slowest[:profile.slow_limit]
+            self.requests_since_flush += 1
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.endpoints))
+
+    def flush(self, directory):
+        with self.lock:
+            self.requests_since_flush = 0
+            data = json.dumps(self.endpoints)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'profile-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+
+store = ProfileStore()
+
+
+def load_profiles(directory, slow_limit=5):
+    """Merge the per-process snapshots written by ``ProfileStore.flush``."""
+    merged = {}
+    if not os.path.isdir(directory):
+        return merged
+    for name in os.listdir(directory):
+        if not (name.startswith('profile-') and name.endswith('.json')):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            endpoints = json.load(f)
+        for view, stats in endpoints.items():
+            if view not in merged:
+                merged[view] = stats
+                continue
+            target = merged[view]
+            for key in ('requests', 'total_time', 'queries', 'db_time', 'template_time', 'duplicate_queries'):
+                target[key] += stats[key]
+            target['max_time'] = max(target['max_time'], stats['max_time'])
+            target['slowest'] = sorted(target['slowest'] + stats['slowest'], reverse=True)[:slow_limit]
+    return merged
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_time += time.perf_counter() - start
+    wrapper.profiled = True
+    return wrapper
+
+
+def _install_template_timer():
+    if not getattr(Template.render, 'profiled', False):
+        Template.render = _timed_render(Template.render)
+
+
+class QueryProfileMiddleware:
+    """Record SQL count, DB time, template time and slow statements per request.
+
+    Enabled with ``SQL_PROFILING = True``; aggregates are served by the
+    ``metrics`` view and periodically written to ``SQL_PROFILING_DIR`` for the
+    ``sql_profile`` management command.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_limit = getattr(settings, 'SQL_PROFILING_SLOW_STATEMENTS', 5)
+        self.duplicate_threshold = getattr(settings, 'SQL_PROFILING_DUPLICATE_THRESHOLD', 3)
+        self.flush_every = getattr(settings, 'SQL_PROFILING_FLUSH_EVERY', 50)
+        self.directory = getattr(settings, 'SQL_PROFILING_DIR', None)
+        _install_template_timer()
+
+    def __call__(self, request):
+        profile = RequestProfile(self.slow_limit)
+
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                profile.record_query(sql, time.perf_counter() - start)
+
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        duplicates = profile.duplicates(self.duplicate_threshold)
+        if duplicates:
+            worst = max(duplicates, key=duplicates.get)
+            logger.warning('%s ran %d repeated statements, e.g. %dx: %s',
+                           view, sum(duplicates.values()), duplicates[worst], worst)
+        store.add(view, duration, profile, duplicates)
+        if self.directory and store.requests_since_flush >= self.flush_every:
+            store.flush(self.directory)
+
+        response['Server-Timing'] = (
+            f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} queries", '
+            f'tpl;dur={profile.template_time * 1000:.1f}, total;dur={duration * 1000:.1f}'
+        )
+        return response
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(endpoints):
+    metrics = [
+        ('app_requests_total', 'counter', 'Requests handled', 'requests'),
+        ('app_request_seconds_total', 'counter', 'Wall time spent in requests', 'total_time'),
+        ('app_request_seconds_max', 'gauge', 'Slowest request seen', 'max_time'),
+        ('app_sql_queries_total', 'counter', 'SQL statements executed', 'queries'),
+        ('app_sql_seconds_total', 'counter', 'Time spent waiting on the database', 'db_time'),
+        ('app_template_seconds_total', 'counter', 'Time spent rendering templates', 'template_time'),
+        ('app_sql_duplicate_queries_total', 'counter', 'Statements repeated within one request', 'duplicate_queries'),
+    ]
+    lines = []
+    for name, kind, help_text, key in metrics:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for view, stats in sorted(endpoints.items()):
+            lines.append(f'{name}{{view="{_label(view)}"}} {stats[key]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,81 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+from .models import User, Member, Job
+
+MAX_RESULTS = 50
+
+
+def _ranked(queryset, q):
+    # The @@ match is served by the GIN index on the generated search_vector
+    # column; only the matching rows are ranked.
+    query = SearchQuery(q, config='english', search_type='websearch')
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank')
+    )
+
+
+def search_jobs(q):
+    prefix = 'member_user__member_user__'
+    rows = _ranked(Job.objects.all(), q).values(
+        'job_id', 'required_caregiving_type', 'other_requirements', 'rank',
+        f'{prefix}given_name', f'{prefix}surname',
+    )[:MAX_RESULTS]
+    return [
+        {
+            'id': row['job_id'],
+            'label': f"Job #{row['job_id']}: {row['required_caregiving_type']} for "
+                     f"{row[prefix + 'given_name']} {row[prefix + 'surname']}",
+            'text': row['other_requirements'],
+            'rank': row['rank'],
+        }
+        for row in rows
+    ]
+
+
+def search_members(q):
+    prefix = 'member_user__'
+    rows = _ranked(Member.objects.all(), q).values(
+        'member_user_id', 'house_rules', 'dependent_description', 'rank',
+        f'{prefix}given_name', f'{prefix}surname',
+    )[:MAX_RESULTS]
+    return [
+        {
+            'id': row['member_user_id'],
+            'label': f"{row[prefix + 'given_name']} {row[prefix + 'surname']}",
+            'text': ' / '.join(filter(None, [row['house_rules'], row['dependent_description']])),
+            'rank': row['rank'],
+        }
+        for row in rows
+    ]
+
+
+def search_users(q):
+    rows = _ranked(User.objects.all(), q).values(
+        'user_id', 'given_name', 'surname', 'profile_description', 'rank',
+    )[:MAX_RESULTS]
+    return [
+        {
+            'id': row['user_id'],
+            'label': f"{row['given_name']} {row['surname']}",
+            'text': row['profile_description'],
+            'rank': row['rank'],
+        }
+        for row in rows
+    ]
+
+
+SEARCHES = {
+    'jobs': search_jobs,
+    'members': search_members,
+    'users': search_users,
+}
+
+
+def run_search(kind, q):
+    q = q.strip()
+    if not q:
+        return []
+    return SEARCHES[kind](q)
@@ -1 +1,930 @@
-from django.test import TestCase
+import datetime
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+import numpy
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+import analytics
+import queries
+import reports
+from .models import User, Caregiver, Member, Address, Job, JobApplication, Appointment, BulkAudit, CaregiverEarnings
+from . import bulk, credentials, exporting, feed, importing, matching
+from .caching import cache_list_page
+from .generating import KINDS, DataGenerator, generate
+from .pagination import encode_cursor
+from .search import run_search
+
+
+def make_user(n):
+    return User.objects.create(
+        email=f'user{n}@example.com',
+        given_name=f'Given{n}',
+        surname=f'Surname{n}',
+        city='Astana',
+        phone_number=f'+7700000{n:04d}',
+        password='secret',
+    )
+
+
+def make_caregiver(n):
+    return Caregiver.objects.create(
+        caregiver_user=make_user(n), gender='female', caregiving_type='babysitter', hourly_rate=10,
+    )
+
+
+def make_member(n):
+    member = Member.objects.create(member_user=make_user(n), house_rules='No pets.')
+    Address.objects.create(member_user=member, street='Kabanbay Batyr', town='Astana')
+    return member
+
+
+class ListQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_rows(self, start, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(start, start + count):
+                caregiver = make_caregiver(2 * n)
+                member = make_member(2 * n + 1)
+                job = Job.objects.create(
+                    member_user=member, required_caregiving_type='babysitter', date_posted=timezone.now(),
+                )
+                JobApplication.objects.create(caregiver_user=caregiver, job=job, date_applied=timezone.now())
+                Appointment.objects.create(
+                    caregiver_user=caregiver, member_user=member,
+                    appointment_date=datetime.date(2025, 1, 1), appointment_time=datetime.time(9), work_hours=3,
+                )
+
+    def assert_constant_queries(self, url_name):
+        self.add_rows(0, 2)
+        with self.assertNumQueries(1):
+            self.client.get(reverse(url_name))
+        self.add_rows(2, 10)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse(url_name))
+        return response
+
+    def test_appointment_list(self):
+        response = self.assert_constant_queries('appointment_list')
+        self.assertContains(response, 'Given22 Surname22')
+        self.assertContains(response, 'Given23 Surname23')
+
+    def test_caregiver_list(self):
+        self.assert_constant_queries('caregiver_list')
+
+    def test_member_list(self):
+        self.assert_constant_queries('member_list')
+
+    def test_address_list(self):
+        self.assert_constant_queries('address_list')
+
+    def test_job_list(self):
+        response = self.assert_constant_queries('job_list')
+        self.assertContains(response, 'Given23 Surname23')
+
+    def test_user_list(self):
+        response = self.assert_constant_queries('user_list')
+        self.assertContains(response, 'Surname23')
+
+    def test_jobapplication_list(self):
+        response = self.assert_constant_queries('jobapplication_list')
+        self.assertContains(response, 'Given22 Surname22')
+
+
+class CaregiverEarningsTests(TestCase):
+    def setUp(self):
+        self.caregivers = [make_caregiver(1), make_caregiver(2)]
+        self.member = make_member(3)
+        self.days = itertools.count()
+
+    def book(self, caregiver, hours, status='confirmed'):
+        return Appointment.objects.create(
+            caregiver_user=caregiver, member_user=self.member,
+            appointment_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=next(self.days)),
+            appointment_time=datetime.time(9),
+            work_hours=hours, status=status,
+        )
+
+    def assert_matches_appointments(self):
+        expected = {
+            row['caregiver_user_id']: (row['n'], row['hours'])
+            for row in Appointment.objects.filter(status='confirmed')
+            .values('caregiver_user_id').annotate(n=Count('*'), hours=Sum('work_hours'))
+        }
+        actual = {
+            e.caregiver_user_id: (e.appointment_count, e.total_hours)
+            for e in CaregiverEarnings.objects.exclude(appointment_count=0)
+        }
+        self.assertEqual(actual, expected)
+
+    def test_tracks_inserts_updates_and_deletes(self):
+        first, second = self.caregivers
+        a = self.book(first, 3)
+        b = self.book(first, 4, status='pending')
+        self.book(second, 5)
+        self.assert_matches_appointments()
+
+        b.status = 'confirmed'
+        b.save()
+        a.work_hours = 6
+        a.caregiver_user = second
+        a.save()
+        self.assert_matches_appointments()
+
+        Appointment.objects.filter(caregiver_user=second).update(status='declined')
+        self.assert_matches_appointments()
+
+        b.delete()
+        self.assert_matches_appointments()
+        self.assertEqual(CaregiverEarnings.objects.get(pk=first.pk).total_hours, 0)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        member = make_member(1)
+        Job.objects.create(
+            member_user=member, required_caregiving_type='babysitter', date_posted=timezone.now(),
+            other_requirements='Looking for a soft-spoken sitter who loves reading.',
+        )
+        Job.objects.create(
+            member_user=member, required_caregiving_type='playmate', date_posted=timezone.now(),
+            other_requirements='Energetic and outdoorsy.',
+        )
+
+    def test_search_vector_follows_writes(self):
+        self.assertEqual(len(run_search('jobs', 'soft-spoken')), 1)
+        Job.objects.update(other_requirements='Must read bedtime stories.')
+        self.assertEqual(run_search('jobs', 'soft-spoken'), [])
+        self.assertEqual(len(run_search('jobs', 'reading')), 2)
+
+    def test_search_view(self):
+        response = self.client.get(reverse('search'), {'q': 'pets', 'kind': 'members'})
+        self.assertContains(response, 'Given1 Surname1')
+        response = self.client.get(reverse('search'), {'q': 'outdoorsy'})
+        self.assertContains(response, 'Energetic and outdoorsy.')
+        self.assertNotContains(response, 'loves reading')
+
+
+class MatchingTests(TestCase):
+    def setUp(self):
+        matching._index = None
+        self.member = make_member(1)
+        self.job = Job.objects.create(
+            member_user=self.member, required_caregiving_type='babysitter', date_posted=timezone.now(),
+        )
+        self.caregivers = [make_caregiver(n) for n in range(2, 6)]
+        for caregiver, rate in zip(self.caregivers, [30, 12, 20, 8]):
+            caregiver.hourly_rate = rate
+            caregiver.save()
+
+    def match_ids(self, **params):
+        response = self.client.get(reverse('job_matches', args=[self.job.job_id]), params)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_ranks_and_updates_incrementally(self):
+        ids = [c.caregiver_user_id for c in self.caregivers]
+        self.assertEqual(self.match_ids(), [ids[3], ids[1], ids[2], ids[0]])
+        self.assertEqual(self.match_ids(min_rate='10', max_rate='25'), [ids[1], ids[2]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                caregiver_user=self.caregivers[0], member_user=self.member, status='confirmed',
+                appointment_date=datetime.date(2025, 1, 1), appointment_time=datetime.time(9), work_hours=2,
+            )
+            self.caregivers[3].caregiver_user.city = 'Almaty'
+            self.caregivers[3].caregiver_user.save()
+        caregiver = Caregiver.objects.get(pk=ids[2])
+        caregiver.caregiving_type = 'playmate'
+        # The indexed city is kept: no User lookup after the UPDATE.
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            caregiver.save(update_fields=['caregiving_type'])
+        self.assertEqual(self.match_ids(), [ids[0], ids[1]])
+        self.assertEqual(self.match_ids(k=1), [ids[0]])
+
+    def test_moving_an_appointment_refreshes_both_members(self):
+        ids = [c.caregiver_user_id for c in self.caregivers]
+        self.match_ids()
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(
+                caregiver_user=self.caregivers[0], member_user=self.member, status='confirmed',
+                appointment_date=datetime.date(2025, 1, 1), appointment_time=datetime.time(9), work_hours=2,
+            )
+        self.assertEqual(self.match_ids()[0], ids[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('appointment_update', args=[appointment.pk]), {
+                'caregiver_user': ids[0], 'member_user': make_member(9).pk, 'appointment_date': '2025-01-01',
+                'appointment_time': '09:00', 'work_hours': 2, 'status': 'confirmed',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.match_ids(), [ids[3], ids[1], ids[2], ids[0]])
+
+    def test_non_finite_rates_are_ignored(self):
+        for value in ['NaN', 'sNaN', 'Infinity', '-inf']:
+            self.assertEqual(len(self.match_ids(min_rate=value, max_rate=value)), 4)
+
+    def test_rolled_back_writes_leave_the_index_alone(self):
+        self.match_ids()
+        size = len(matching._index)
+        user = make_user(9)
+        data = {'caregiver_user': user.user_id + 1, 'gender': 'female', 'caregiving_type': 'babysitter',
+                'hourly_rate': '5'}
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(reverse('caregiver_create'), data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(matching._index), size)
+
+
+class AppointmentConflictTests(TestCase):
+    def setUp(self):
+        self.caregiver = make_caregiver(1)
+        self.other = make_caregiver(2)
+        self.member = make_member(3)
+        self.booked = Appointment.objects.create(
+            caregiver_user=self.caregiver, member_user=self.member,
+            appointment_date=datetime.date(2025, 1, 1), appointment_time=datetime.time(9), work_hours=3,
+        )
+
+    def post(self, time, hours, status='pending', url=None):
+        return self.client.post(url or reverse('appointment_create'), {
+            'caregiver_user': self.caregiver.pk, 'member_user': self.member.pk,
+            'appointment_date': '2025-01-01', 'appointment_time': time, 'work_hours': hours, 'status': status,
+        })
+
+    def test_overlapping_booking_is_rejected(self):
+        response = self.post('11:00', 2)
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, f'#{self.booked.pk}', status_code=409)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+        self.assertEqual(self.post('12:00', 2).status_code, 302)
+        self.assertEqual(self.post('10:00', 1, status='declined').status_code, 302)
+        self.assertEqual(Appointment.objects.count(), 3)
+
+    def test_update_does_not_conflict_with_itself(self):
+        url = reverse('appointment_update', args=[self.booked.pk])
+        self.assertEqual(self.post('10:00', 2, url=url).status_code, 302)
+
+    def test_available_caregivers(self):
+        response = self.client.get(reverse('available_caregivers'), {'date': '2025-01-01', 'time': '10:30', 'hours': 1})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.other.pk])
+        response = self.client.get(reverse('available_caregivers'), {'date': '2025-01-01', 'time': '12:00', 'hours': 1})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertEqual(self.client.get(reverse('available_caregivers')).status_code, 400)
+
+
+class CacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.caregiver = make_caregiver(1)
+        self.member = make_member(2)
+
+    def test_list_page_keeps_its_headers(self):
+        @cache_list_page(User)
+        def view(request):
+            return HttpResponse('[]', content_type='application/json', headers={'Vary': 'Accept'})
+
+        request = RequestFactory().get('/users/')
+        first, cached = view(request), view(request)
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(dict(cached.items()), dict(first.items()))
+        self.assertEqual(cached['Vary'], 'Accept')
+
+    def test_list_page_cached_until_a_dependency_changes(self):
+        url = reverse('caregiver_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(member_user=self.member, required_caregiving_type='playmate', date_posted=timezone.now())
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        user = self.caregiver.caregiver_user
+        user.surname = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, 'Renamed')
+
+    def test_lookup_results_cached_until_a_dependency_changes(self):
+        url = reverse('lookup', args=['caregivers'])
+        self.client.get(url, {'q': 'Given'})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'q': 'Given'})
+        self.assertEqual(len(response.json()['results']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_caregiver(3)
+        response = self.client.get(url, {'q': 'Given'})
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class CacheCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        make_caregiver(1)
+
+    def test_version_bumped_only_after_commit(self):
+        url = reverse('caregiver_list')
+        self.client.get(url)
+
+        def concurrent_read():
+            self.client.get(url)
+            connection.close()
+
+        with transaction.atomic():
+            make_caregiver(2)
+            # Another connection cannot see the uncommitted caregiver yet.
+            reader = threading.Thread(target=concurrent_read)
+            reader.start()
+            reader.join()
+        self.assertContains(self.client.get(url), 'Given2 ')
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.caregivers = [make_caregiver(n) for n in range(1, 4)]
+        self.member = make_member(4)
+
+    def url(self, resource, key=None):
+        if key is None:
+            return reverse('api_collection', args=[resource])
+        return reverse('api_item', args=[resource, key])
+
+    def test_list_with_sparse_fields_embedded_relation_and_cursor(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url('caregivers'), {
+                'fields': 'hourly_rate,user.surname', 'include': 'user', 'limit': 2,
+            })
+        body = response.json()
+        self.assertEqual(body['data'][0], {'hourly_rate': '10.00', 'user': {'surname': 'Surname1'}})
+        response = self.client.get(self.url('caregivers'), {'fields': 'caregiver_user_id', 'after': body['next']})
+        self.assertEqual(
+            [row['caregiver_user_id'] for row in response.json()['data']], [self.caregivers[2].pk],
+        )
+        self.assertEqual(self.client.get(self.url('caregivers'), {'fields': 'password'}).status_code, 400)
+
+    def test_wrong_type_cursor_reads_the_first_page(self):
+        first = self.client.get(self.url('caregivers'), {'sort': 'rate'}).json()['data']
+        for values in [['abc', 1], [10, [1]], [None, 1]]:
+            response = self.client.get(self.url('caregivers'), {'sort': 'rate', 'after': encode_cursor(values)})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['data'], first)
+        response = self.client.get(reverse('job_list'), {'after': encode_cursor(['abc'])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get(self):
+        url = self.url('users', self.member.pk)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        User.objects.filter(pk=self.member.pk).update(city='Almaty')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_create_update_delete(self):
+        response = self.client.post(self.url('appointments'), {
+            'caregiver_user_id': self.caregivers[0].pk, 'member_user_id': self.member.pk,
+            'appointment_date': '2025-01-01', 'appointment_time': '09:00', 'work_hours': 2,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        key = response.json()['key']
+        response = self.client.patch(self.url('appointments', key), {'status': 'confirmed'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Appointment.objects.get(pk=key).status, 'confirmed')
+        caregiver = self.caregivers[0].pk
+        matching.get_index()
+        self.addCleanup(matching.reset_index)
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url('caregivers', caregiver), {'hourly_rate': '15.25'},
+                                         content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(matching._index)
+        self.assertEqual(Caregiver.objects.get(pk=caregiver).hourly_rate, Decimal('15.25'))
+        response = self.client.patch(self.url('caregivers', 999), {'hourly_rate': '15'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        for data in [{'status': 'maybe'}, {'work_hours': 0}, {'member_user_id': 'abc'}]:
+            response = self.client.patch(self.url('appointments', key), data, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.delete(self.url('appointments', key)).status_code, 204)
+        self.assertEqual(self.client.get(self.url('appointments', key)).status_code, 404)
+
+    def test_batch_is_atomic(self):
+        operations = [
+            {'op': 'create', 'resource': 'jobs',
+             'data': {'member_user_id': self.member.pk, 'required_caregiving_type': 'babysitter'}},
+            {'op': 'update', 'resource': 'caregivers', 'key': str(self.caregivers[0].pk),
+             'data': {'hourly_rate': '12.50'}},
+        ]
+        response = self.client.post(reverse('api_batch'), {'operations': operations},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Job.objects.count(), 1)
+
+        operations.append({'op': 'delete', 'resource': 'appointments', 'key': '999'})
+        response = self.client.post(reverse('api_batch'), {'operations': operations},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['index'], 2)
+        self.assertEqual(Job.objects.count(), 1)
+
+        operations[1:] = [
+            {'op': 'create', 'resource': 'jobs', 'data': {'member_user_id': 999, 'required_caregiving_type': 'babysitter'}},
+            operations[1],
+        ]
+        response = self.client.post(reverse('api_batch'), {'operations': operations},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['index'], 1)
+        self.assertEqual(Job.objects.count(), 1)
+
+
+class JobApplicationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.caregiver = make_caregiver(1)
+        member = make_member(2)
+        self.jobs = [
+            Job.objects.create(member_user=member, required_caregiving_type='babysitter', date_posted=timezone.now())
+            for _ in range(3)
+        ]
+        for job in self.jobs[:2]:
+            JobApplication.objects.create(caregiver_user=self.caregiver, job=job, date_applied=timezone.now())
+
+    def applied_jobs(self):
+        return list(JobApplication.objects.order_by('job_id').values_list('job_id', flat=True))
+
+    def test_writes_touch_one_row(self):
+        first, second, third = (job.pk for job in self.jobs)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('jobapplication_update', args=[self.caregiver.pk, second]))
+        response = self.client.post(reverse('jobapplication_update', args=[self.caregiver.pk, second]), {
+            'caregiver_user': self.caregiver.pk, 'job': third,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.applied_jobs(), [first, third])
+
+        self.client.post(reverse('jobapplication_delete', args=[self.caregiver.pk, first]))
+        self.assertEqual(self.applied_jobs(), [third])
+        response = self.client.delete(reverse('api_item', args=['job-applications', f'{self.caregiver.pk}-{third}']))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.applied_jobs(), [])
+
+    def test_bulk_job_delete_cascades_in_one_statement(self):
+        member_id = self.jobs[0].member_user_id
+        with self.assertNumQueries(4):
+            self.assertEqual(bulk.run('job-delete', {'member_user': str(member_id)}, {}), 3)
+        self.assertFalse(JobApplication.objects.exists())
+
+
+class WriteViewTests(TestCase):
+    def setUp(self):
+        matching._index = None
+        self.caregiver = make_caregiver(1)
+        self.member = make_member(2)
+
+    def appointment(self, **overrides):
+        return {
+            'caregiver_user': self.caregiver.pk, 'member_user': self.member.pk, 'appointment_date': '2025-01-01',
+            'appointment_time': '09:00', 'work_hours': 2, 'status': 'pending', **overrides,
+        }
+
+    def test_writes_skip_existence_lookups(self):
+        # Savepoint, INSERT or UPDATE, SET CONSTRAINTS, release.
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('appointment_create'), self.appointment())
+        self.assertEqual(response.status_code, 302)
+        appointment = Appointment.objects.get()
+        with self.assertNumQueries(4):
+            self.client.post(reverse('appointment_update', args=[appointment.pk]), self.appointment(work_hours=3))
+        with self.assertNumQueries(4):
+            self.client.post(reverse('caregiver_update', args=[self.caregiver.pk]), {
+                'gender': 'male', 'caregiving_type': 'playmate', 'hourly_rate': '12.50',
+            })
+        self.assertEqual(Appointment.objects.get().work_hours, 3)
+        self.assertEqual(Caregiver.objects.get().hourly_rate, Decimal('12.50'))
+
+    def test_constraint_violations_are_client_errors(self):
+        response = self.client.post(reverse('appointment_create'), self.appointment(member_user=999))
+        self.assertContains(response, 'A referenced record does not exist.', status_code=400)
+        response = self.client.post(reverse('caregiver_create'), {
+            'caregiver_user': self.caregiver.pk, 'gender': 'male', 'caregiving_type': 'playmate', 'hourly_rate': 9,
+        })
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(reverse('job_update', args=[999]), {
+            'member_user': self.member.pk, 'required_caregiving_type': 'playmate',
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_malformed_appointment_values_are_form_errors(self):
+        for overrides in [{'work_hours': 0}, {'work_hours': 'two'}, {'caregiver_user': 'abc'}]:
+            response = self.client.post(reverse('appointment_create'), self.appointment(**overrides))
+            self.assertEqual(response.status_code, 400)
+            self.assertContains(response, next(iter(overrides)), status_code=400)
+        self.assertFalse(Appointment.objects.exists())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Appointment.objects.create(
+                caregiver_user=self.caregiver, member_user=self.member,
+                appointment_date=datetime.date(2025, 1, 1), appointment_time=datetime.time(9), work_hours=0,
+            )
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.caregivers = [make_caregiver(n) for n in range(1, 4)]
+        self.member = make_member(4)
+        for day in range(1, 4):
+            Appointment.objects.create(
+                caregiver_user=self.caregivers[0], member_user=self.member,
+                appointment_date=datetime.date(2025, 1, day), appointment_time=datetime.time(9), work_hours=2,
+            )
+
+    def test_preview_then_apply(self):
+        url = reverse('bulk_action', args=['appointment-status'])
+        params = {'caregiver_user': self.caregivers[0].pk, 'new_status': 'confirmed'}
+        self.assertContains(self.client.get(url, params), '<strong>3</strong> rows')
+        self.assertFalse(Appointment.objects.filter(status='confirmed').exists())
+
+        response = self.client.post(url, params)
+        self.assertRedirects(response, f"{reverse('appointment_list')}?caregiver_user={self.caregivers[0].pk}")
+        self.assertEqual(Appointment.objects.filter(status='confirmed').count(), 3)
+        self.assertEqual(CaregiverEarnings.objects.get(pk=self.caregivers[0].pk).total_hours, 6)
+        audit = BulkAudit.objects.get()
+        self.assertEqual((audit.action, audit.row_count), ('appointment-status', 3))
+        self.assertEqual(audit.filters, {'caregiver_user': str(self.caregivers[0].pk)})
+
+    def test_single_statement_update(self):
+        # Savepoint, UPDATE, audit INSERT, release.
+        with self.assertNumQueries(4):
+            count = bulk.run('caregiver-rates', {'max_rate': '10'}, {'rate_percent': '15'})
+        self.assertEqual(count, 3)
+        self.assertEqual(set(Caregiver.objects.values_list('hourly_rate', flat=True)), {Decimal('11.50')})
+        with self.assertRaisesMessage(bulk.BulkActionError, str(bulk.MAX_RATE)):
+            bulk.run('caregiver-rates', {'max_rate': '20'}, {'rate_percent': '1e7'})
+        self.assertEqual(BulkAudit.objects.count(), 1)
+
+    def test_api_dry_run_and_validation(self):
+        url = reverse('api_bulk', args=['job-delete'])
+        Job.objects.create(member_user=self.member, required_caregiving_type='playmate', date_posted=timezone.now())
+        response = self.client.post(url, {'filters': {'member_user': self.member.pk}, 'dry_run': True},
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'action': 'job-delete', 'dry_run': True, 'count': 1})
+        response = self.client.post(url, {'filters': {'member_user': 'x'}}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('api_bulk', args=['caregiver-rates']), {
+            'filters': {'city': 'Astana'}, 'changes': {'hourly_rate': '-1'},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        for changes in [{'hourly_rate': 'NaN'}, {'rate_percent': 'sNaN'}, {'rate_percent': 'Infinity'}]:
+            with self.assertRaises(bulk.BulkActionError):
+                bulk.run('caregiver-rates', {'city': 'Astana'}, changes)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertFalse(BulkAudit.objects.exists())
+
+
+class AsyncViewTests(TestCase):
+    async def test_async_list_and_api_views(self):
+        await cache.aclear()
+        caregiver = await sync_to_async(make_caregiver)(1)
+        member = await sync_to_async(make_member)(2)
+        response = await self.async_client.get(reverse('caregiver_list'))
+        self.assertContains(response, 'Given1 Surname1')
+        response = await self.async_client.get(
+            reverse('api_item', args=['members', member.pk]), {'include': 'user', 'fields': 'member_user_id,user.email'},
+        )
+        self.assertEqual(response.json(), {'data': {'member_user_id': member.pk, 'user': {'email': 'user2@example.com'}}})
+
+        response = await self.async_client.post(reverse('appointment_create'), {
+            'caregiver_user': caregiver.pk, 'member_user': member.pk,
+            'appointment_date': '2025-01-01', 'appointment_time': '09:00', 'work_hours': 2, 'status': 'pending',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(await Appointment.objects.acount(), 1)
+
+    def sync_export(self, fmt):
+        response = self.client.get(reverse('export', args=['users']), {'format': fmt})
+        self.assertFalse(response.is_async)
+        return b''.join(response.streaming_content)
+
+    @mock.patch.object(exporting, 'LINES_PER_BLOCK', 2)
+    async def test_export_streams_asynchronously(self):
+        users = [await sync_to_async(make_user)(n) for n in range(3)]
+        for fmt in ['csv', 'json']:
+            response = await self.async_client.get(reverse('export', args=['users']), {'format': fmt})
+            self.assertTrue(response.is_async)
+            blocks = [block async for block in response.streaming_content]
+            self.assertEqual(b''.join(blocks), await sync_to_async(self.sync_export)(fmt))
+            self.assertGreater(len(blocks), 1)
+        self.assertEqual([row['user_id'] for row in json.loads(b''.join(blocks))], [u.pk for u in users])
+
+
+class DataGeneratorTests(TestCase):
+    def test_deterministic_and_loadable(self):
+        first, second = DataGenerator(60, seed=7), DataGenerator(60, seed=7)
+        for kind in KINDS:
+            if kind != 'job_applications':
+                self.assertEqual(list(first.rows(kind)), list(second.rows(kind)))
+        self.assertNotEqual(list(DataGenerator(60, seed=8).users()), list(first.users()))
+
+        results = generate(60, seed=7)
+        self.assertEqual({kind: r.errors for kind, r in results.items()}, {kind: [] for kind in KINDS})
+        self.assertEqual(JobApplication.objects.count(), results['job_applications'].inserted)
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Caregiver.objects.count() + Member.objects.count(), 60)
+        self.assertEqual(Appointment.objects.count(), results['appointments'].inserted)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportTests(TestCase):
+    def test_bad_lines_are_rejected_alone_and_written_out(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path, errors = os.path.join(directory, 'users.jsonl'), os.path.join(directory, 'errors.jsonl')
+        user = {'email': 'a@example.com', 'given_name': 'A', 'surname': 'B', 'city': 'Astana',
+                'phone_number': '+77000000001', 'password': 'secret'}
+        with open(path, 'w') as f:
+            f.write(json.dumps(user) + '\n{"email": \n' + json.dumps({**user, 'email': 'not an email'}) + '\n')
+        call_command('import_data', 'users', path, errors=errors, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertTrue(User.objects.filter(email='a@example.com').exists())
+        with open(errors) as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual([(r['line'], r['row']) for r in rejected], [(2, '{"email": '), (3, {**user, 'email': 'not an email'})])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CredentialTests(TestCase):
+    def setUp(self):
+        credentials._pool = None
+        self.addCleanup(setattr, credentials, '_pool', None)
+
+    def test_create_hashes_and_verify_upgrades_plaintext(self):
+        response = self.client.post(reverse('user_create'), {
+            'email': 'new@example.com', 'given_name': 'New', 'surname': 'User', 'city': 'Astana',
+            'phone_number': '+77009999999', 'password': 'hunter2',
+        })
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(email='new@example.com')
+        self.assertTrue(user.password.startswith('md5$'))
+        self.assertTrue(credentials.verify_password(user, 'hunter2'))
+        self.assertFalse(credentials.verify_password(user, 'wrong'))
+
+        legacy = make_user(1)
+        self.assertFalse(credentials.verify_password(legacy, 'wrong'))
+        self.assertEqual(User.objects.get(pk=legacy.pk).password, 'secret')
+        self.assertTrue(credentials.verify_password(legacy, 'secret'))
+        self.assertTrue(credentials.is_hashed(User.objects.get(pk=legacy.pk).password))
+
+        response = self.client.post(reverse('user_update', args=[legacy.pk]), {
+            'email': legacy.email, 'given_name': 'Renamed', 'surname': legacy.surname, 'city': 'Astana',
+            'phone_number': legacy.phone_number, 'password': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(credentials.verify_password(User.objects.get(pk=legacy.pk), 'secret'))
+
+    @override_settings(CREDENTIAL_MAX_PENDING=1, CREDENTIAL_WAIT_SECONDS=0)
+    def test_full_pool_turns_signups_away(self):
+        release = threading.Event()
+        held = credentials.submit(release.wait)
+        try:
+            response = self.client.post(reverse('api_collection', args=['users']), {
+                'email': 'new@example.com', 'given_name': 'New', 'surname': 'User', 'city': 'Astana',
+                'phone_number': '+77009999999', 'password': 'hunter2',
+            }, content_type='application/json')
+        finally:
+            release.set()
+            held.result()
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(User.objects.exists())
+        self.assertTrue(credentials.hash_password('hunter2').startswith('md5$'))
+
+    @override_settings(CREDENTIAL_MAX_PENDING=1, CREDENTIAL_WAIT_SECONDS=0, CREDENTIAL_WORKERS=1)
+    def test_imports_wait_for_the_pool_and_batches_do_not(self):
+        release = threading.Event()
+        held = credentials.submit(release.wait)
+        user = {'given_name': 'New', 'surname': 'User', 'city': 'Astana', 'password': 'hunter2'}
+        operation = {'resource': 'users', 'op': 'create', 'data': {
+            **user, 'email': 'api@example.com', 'phone_number': '+77009999990',
+        }}
+        response = self.client.post(reverse('api_batch'), {'operations': [operation]}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+
+        threading.Timer(0.1, release.set).start()
+        rows = [(n, {**user, 'email': f'new{n}@example.com', 'phone_number': f'+7700999999{n}'}) for n in range(5)]
+        result = importing.Importer('users').run(rows)
+        held.result()
+        self.assertEqual((result.inserted, result.errors), (5, []))
+        self.assertTrue(all(p.startswith('md5$') for p in User.objects.values_list('password', flat=True)))
+
+
+class AnalyticsCubeTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.caregivers = {1: ['babysitter', 'Astana', 10.0], 2: ['playmate', 'Almaty', 20.0], 3: ['babysitter', 'Taraz', 5.0]}
+        self.rows = [
+            (i, rng.choice([1, 2, 3]), analytics.month_code(2025, rng.randrange(1, 13)), rng.randrange(3), rng.randrange(1, 9))
+            for i in range(1, 401)
+        ]
+        self.cube = analytics.AppointmentCube()
+        self.set_caregivers()
+        self.cube.append(*zip(*self.rows[:300]))
+        # New months and rows past the first batch take the incremental path.
+        self.rows.append((401, 1, analytics.month_code(2026, 2), 1, 3))
+        self.cube.append(*zip(*self.rows[300:]))
+
+    def set_caregivers(self):
+        self.cube.set_caregivers(list(self.caregivers), *zip(*self.caregivers.values()))
+
+    def expected(self, by, status):
+        groups = {}
+        for _, caregiver, month, code, hours in self.rows:
+            caregiving_type, city, rate = self.caregivers[caregiver]
+            if analytics.STATUSES[code] == status:
+                labels = {'caregiving_type': caregiving_type, 'city': city, 'month': analytics.month_label(month)}
+                groups.setdefault(tuple(labels[dim] for dim in by), []).append((hours, rate * hours))
+        return groups
+
+    def assertMatches(self, by, status='confirmed'):
+        data = self.cube.aggregate(by, status=status)
+        got = {
+            tuple(data[dim][i] for dim in by): (data['count'][i], data['hours'][i], round(data['pay'][i], 6))
+            for i in range(len(data['count']))
+        }
+        self.assertEqual(got, {
+            key: (len(values), sum(h for h, _ in values), round(sum(p for _, p in values), 6))
+            for key, values in self.expected(by, status).items()
+        })
+        percentiles = self.cube.percentile('pay', 90, by, status=status)
+        for i, key in enumerate(zip(*(percentiles[dim] for dim in by))):
+            self.assertAlmostEqual(percentiles['pay'][i], numpy.percentile([p for _, p in self.expected(by, status)[key]], 90))
+
+    def test_slices_match_a_scan(self):
+        self.assertMatches(('caregiving_type', 'month'))
+        self.assertMatches(('city',), status='pending')
+        self.assertMatches(())
+        data = self.cube.aggregate(('month',), caregiving_type='playmate', month=['2025-03', '2026-02', '1999-01'])
+        self.assertEqual(list(data['month']), ['2025-03'])
+        with self.assertRaises(ValueError):
+            self.cube.aggregate(('colour',))
+
+    def test_caregiver_changes_rederive_loaded_rows(self):
+        self.caregivers[1] = ['playmate', 'Oskemen', 12.5]
+        del self.caregivers[3]
+        self.set_caregivers()
+        self.rows = [row for row in self.rows if row[1] != 3]
+        self.assertEqual(len(self.cube), len(self.rows))
+        self.assertMatches(('caregiving_type', 'city'))
+        with self.assertRaises(ValueError):
+            self.cube.append([500], [3], [analytics.month_code(2025, 1)], [0], [2])
+        self.assertEqual(len(self.cube), len(self.rows))
+
+
+class ChangeFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(feed.stop_watcher)
+        self.member = make_member(1)
+
+    def feed(self, **params):
+        return self.client.get(reverse('api_changes'), params).json()
+
+    def make_job(self):
+        return Job.objects.create(member_user=self.member, required_caregiving_type='playmate', date_posted=timezone.now())
+
+    def test_changes_after_position(self):
+        start = self.feed()['next']
+        job = self.make_job()
+        Job.objects.filter(pk=job.pk).update(other_requirements='Quiet')
+        bulk.run('job-delete', {'member_user': str(self.member.pk)}, {})
+        page = self.feed(after=start)
+        self.assertEqual(
+            [(c['resource'], c['op'], c['data']['job_id'], c['data']['other_requirements']) for c in page['changes']],
+            [('jobs', 'insert', job.pk, None), ('jobs', 'update', job.pk, 'Quiet'), ('jobs', 'delete', job.pk, 'Quiet')],
+        )
+        self.assertEqual(self.feed(after=page['next']), {'changes': [], 'next': page['next']})
+        self.assertEqual(len(self.feed(after=start, limit=2)['changes']), 2)
+        self.assertEqual(self.client.get(reverse('api_changes'), {'after': 'latest'}).status_code, 400)
+        for wait in ['nan', 'inf', 'soon']:
+            self.assertEqual(self.client.get(reverse('api_changes'), {'after': start, 'wait': wait}).status_code, 400)
+
+        self.assertEqual(feed.prune(timezone.now() + datetime.timedelta(days=1)), 3)
+        self.assertEqual(self.client.get(reverse('api_changes'), {'after': start}).status_code, 410)
+        self.assertEqual(self.feed(after=page['next'])['changes'], [])
+
+    def test_long_poll_wakes_on_commit(self):
+        start = self.feed()['next']
+        def write():
+            self.make_job()
+            connection.close()
+
+        writer = threading.Timer(0.2, write)
+        writer.start()
+        began = time.monotonic()
+        page = self.feed(after=start, wait=10)
+        writer.join()
+        self.assertLess(time.monotonic() - began, 5)
+        self.assertEqual([c['op'] for c in page['changes']], ['insert'])
+
+    @override_settings(CHANGE_FEED_STREAM_SECONDS=0.3)
+    async def test_event_stream_only_under_asgi_and_ends(self):
+        start = (await self.async_client.get(reverse('api_changes'))).json()['next']
+        response = await sync_to_async(self.client.get)(reverse('api_changes'), HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        await sync_to_async(self.make_job)()
+        response = await self.async_client.get(
+            reverse('api_changes'), headers={'Accept': 'text/event-stream', 'Last-Event-ID': start},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        began = time.monotonic()
+        events = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertLess(time.monotonic() - began, 5)
+        self.assertEqual(events.count('event: change'), 1)
+
+
+class TaskRunnerTests(SimpleTestCase):
+    def register(self, name, reads=(), writes=(), seconds=0.0, fails=False):
+        def fn(session, out=None):
+            time.sleep(seconds)
+            if fails:
+                raise RuntimeError('boom')
+            print(name, file=out)
+        queries.TASKS[name] = queries.Task(fn, frozenset(reads), frozenset(writes))
+
+    def test_independent_reads_overlap_and_output_keeps_task_order(self):
+        with mock.patch.dict(queries.TASKS, clear=True):
+            self.register('task_1_write', writes={'job'}, seconds=0.05)
+            self.register('task_2_1_slow', reads={'job'}, seconds=0.3)
+            self.register('task_2_2_fast', reads={'job'})
+            self.register('task_2_3_other', reads={'user'}, seconds=0.3)
+            self.assertEqual(queries.dependencies(list(queries.TASKS)), {
+                'task_1_write': set(), 'task_2_1_slow': {'task_1_write'},
+                'task_2_2_fast': {'task_1_write'}, 'task_2_3_other': set(),
+            })
+            self.assertEqual(queries.select_tasks(['2', 'task_1_write']), list(queries.TASKS))
+            self.assertEqual(queries.select_tasks(['2_2_fast']), ['task_2_2_fast'])
+            out = io.StringIO()
+            began = time.perf_counter()
+            results = queries.run(list(queries.TASKS), jobs=4, out=out)
+            self.assertLess(time.perf_counter() - began, 0.6)
+        self.assertEqual(out.getvalue().split(), ['task_1_write', 'task_2_1_slow', 'task_2_2_fast', 'task_2_3_other'])
+        self.assertEqual({r.status for r in results}, {'ok'})
+        by_name = {r.name: r for r in results}
+        self.assertGreaterEqual(by_name['task_2_2_fast'].started, by_name['task_1_write'].elapsed)
+        self.assertLess(by_name['task_2_3_other'].started, by_name['task_1_write'].elapsed)
+
+    def test_failure_skips_dependents_only(self):
+        with mock.patch.dict(queries.TASKS, clear=True):
+            self.register('task_1_write', writes={'job'}, fails=True)
+            self.register('task_2_read', reads={'job'})
+            self.register('task_3_other', reads={'user'})
+            results = queries.run(list(queries.TASKS), out=io.StringIO())
+        self.assertEqual([r.status for r in results], ['failed', 'skipped', 'ok'])
+        self.assertEqual(results[0].error, 'RuntimeError: boom')
+
+
+class ReportStatementTests(SimpleTestCase):
+    def test_statement_is_built_once_per_shape(self):
+        pending, values = reports.statement('appointment_names', {'status': 'pending'})
+        confirmed, defaults = reports.statement('appointment_names', {})
+        self.assertIs(pending, confirmed)
+        self.assertEqual((values, defaults), ({'status': 'pending'}, {'status': 'confirmed'}))
+        earnings, _ = reports.statement('total_hours_per_caregiver', {})
+        appointments, values = reports.statement('total_hours_per_caregiver', {'status': 'pending'})
+        self.assertIsNot(earnings, appointments)
+        self.assertIn('caregiver_earnings', earnings.sql)
+        self.assertEqual(values, {})
+
+    def test_parameters_are_bound_in_position_order(self):
+        cached, values = reports.statement('jobs_with_requirement', {'phrase': "50% o'clock"})
+        self.assertNotIn("o'clock", cached.sql)
+        self.assertIn('$1', cached.sql)
+        args = [{**cached.literals, **values}[key] for key in cached.positions]
+        self.assertEqual(args.count("50% o'clock"), cached.positions.count('phrase'))
+        self.assertIn('english', args)
+        with self.assertRaises(TypeError):
+            reports.statement('jobs_with_requirement', {'phrase': 'x', 'limit': 5})
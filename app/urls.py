@@ -1,8 +1,21 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('lookup/<str:kind>/', views.lookup, name='lookup'),
+    path('search/', views.search, name='search'),
+    path('export/<str:kind>/', views.export, name='export'),
+    path('reports/<str:name>/', views.report_data, name='report_data'),
+    path('analytics/', views.analytics_data, name='analytics_data'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('bulk/<str:name>/', views.bulk_action, name='bulk_action'),
+
+    path(f'api/{api.VERSION}/batch/', api.batch, name='api_batch'),
+    path(f'api/{api.VERSION}/bulk/<str:action>/', api.bulk, name='api_bulk'),
+    path(f'api/{api.VERSION}/changes/', api.change_feed, name='api_changes'),
+    path(f'api/{api.VERSION}/<str:resource>/', api.collection, name='api_collection'),
+    path(f'api/{api.VERSION}/<str:resource>/<str:key>/', api.item, name='api_item'),
     
     path('users/', views.user_list, name='user_list'),
     path('users/create/', views.user_create, name='user_create'),
@@ -10,6 +23,7 @@ urlpatterns = [
     path('users/<int:pk>/delete/', views.user_delete, name='user_delete'),
     
     path('caregivers/', views.caregiver_list, name='caregiver_list'),
+    path('caregivers/available/', views.available_caregivers, name='available_caregivers'),
     path('caregivers/create/', views.caregiver_create, name='caregiver_create'),
     path('caregivers/<int:pk>/update/', views.caregiver_update, name='caregiver_update'),
     path('caregivers/<int:pk>/delete/', views.caregiver_delete, name='caregiver_delete'),
@@ -28,6 +42,7 @@ urlpatterns = [
     path('jobs/create/', views.job_create, name='job_create'),
     path('jobs/<int:pk>/update/', views.job_update, name='job_update'),
     path('jobs/<int:pk>/delete/', views.job_delete, name='job_delete'),
+    path('jobs/<int:pk>/matches/', views.job_matches, name='job_matches'),
     
     path('job-applications/', views.jobapplication_list, name='jobapplication_list'),
     path('job-applications/create/', views.jobapplication_create, name='jobapplication_create'),
@@ -1,6 +1,28 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse, Http404
+from django.urls import reverse
+from sqlalchemy.orm import Session
+
+import analytics
+import reports
+import schema
 from .models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+from . import availability, bulk, filters
+from .credentials import CredentialsBusy, hash_password
+from .caching import cache_list_page, invalidate
+from .exporting import CONTENT_TYPES, EXPORTS, arender_export, render_export
+from .lookups import LOOKUPS, run_lookup
+from .matching import DEFAULT_K, MAX_K, match_job
+from .pagination import akeyset_paginate
+from .profiling import prometheus_text, store
+from .search import SEARCHES, run_search
 from django.utils import timezone
 
 
@@ -8,38 +30,213 @@ def index(request):
     return render(request, 'app/index.html')
 
 
-def user_list(request):
-    users = User.objects.all()
+def lookup(request, kind):
+    if kind not in LOOKUPS:
+        raise Http404
+    return JsonResponse({'results': run_lookup(kind, request.GET.get('q', ''))})
+
+
+def job_matches(request, pk):
+    job = get_object_or_404(Job.objects.select_related('member_user__member_user'), pk=pk)
+    k = min(filters._int(request.GET.get('k', '')) or DEFAULT_K, MAX_K)
+    min_rate = filters._decimal(request.GET.get('min_rate', ''))
+    max_rate = filters._decimal(request.GET.get('max_rate', ''))
+    matches = match_job(job, min_rate=min_rate, max_rate=max_rate, k=k)
+    names = User.objects.in_bulk([caregiver_id for caregiver_id, _, _ in matches])
+    return JsonResponse({
+        'job': job.job_id,
+        'results': [
+            {
+                'id': caregiver_id,
+                'label': f'{names[caregiver_id].given_name} {names[caregiver_id].surname}',
+                'hourly_rate': rate,
+                'past_appointments': n,
+            }
+            for caregiver_id, rate, n in matches
+            if caregiver_id in names
+        ],
+    })
+
+
+def search(request):
+    q = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind')
+    if kind not in SEARCHES:
+        kind = 'jobs'
+    return render(request, 'app/search.html', {'q': q, 'kind': kind, 'results': run_search(kind, q)})
+
+
+def export(request, kind):
+    fmt = request.GET.get('format', 'csv')
+    if kind not in EXPORTS or fmt not in CONTENT_TYPES:
+        raise Http404
+    # Under ASGI a sync iterator would be read whole before the first byte is sent.
+    render = arender_export if isinstance(request, ASGIRequest) else render_export
+    response = StreamingHttpResponse(render(kind, request.GET, fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
+def report_data(request, name):
+    if name not in reports.REPORTS:
+        raise Http404
+    try:
+        params = reports.coerce_params(name, request.GET.dict())
+        with Session(schema.engine) as session:
+            data = reports.columns(session, name, prepared=True, **params)
+    except (TypeError, ValueError, ArithmeticError) as e:
+        return HttpResponseBadRequest(str(e))
+    return JsonResponse(data)
+
+
+def analytics_data(request):
+    params = request.GET.dict()
+    by = [dim for dim in params.pop('by', '').split(',') if dim]
+    try:
+        cube = analytics.get_cube(settings.ANALYTICS_REFRESH_SECONDS, settings.ANALYTICS_RELOAD_SECONDS)
+        if 'percentile' in params:
+            q, measure = float(params.pop('percentile')), params.pop('measure', 'pay')
+            data = cube.percentile(measure, q, by, **{dim: value.split(',') for dim, value in params.items()})
+        else:
+            data = cube.aggregate(by, **{dim: value.split(',') for dim, value in params.items()})
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return JsonResponse({column: values.tolist() for column, values in data.items()})
+
+
+def metrics(request):
+    if not settings.SQL_PROFILING:
+        raise Http404
+    return HttpResponse(prometheus_text(store.snapshot()), content_type='text/plain; version=0.0.4')
+
+
+# PostgreSQL SQLSTATE codes
+FOREIGN_KEY_VIOLATION = '23503'
+EXCLUSION_VIOLATION = '23P01'
+
+
+def _check_constraints():
+    # Django's foreign keys are DEFERRABLE INITIALLY DEFERRED; checking them
+    # here keeps a missing row from surfacing only at an outer COMMIT.
+    with connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+def _integrity_error(error):
+    if getattr(error.__cause__, 'pgcode', None) == FOREIGN_KEY_VIOLATION:
+        return 400, 'A referenced record does not exist.'
+    return 409, str(error).splitlines()[0]
+
+
+def _update(instance, fields):
+    # A bare UPDATE of these columns with no SELECT first; post_save still
+    # fires. A missing row is the plain DatabaseError save() raises.
+    try:
+        instance.save(update_fields=fields)
+    except DatabaseError as e:
+        if type(e) is not DatabaseError:
+            raise
+        raise Http404
+
+
+def _write(request, save, success, template, context):
+    """Run ``save()`` in one transaction and redirect, or re-render the form with the error."""
+    try:
+        with transaction.atomic():
+            save()
+            _check_constraints()
+    except IntegrityError as e:
+        status, error = _integrity_error(e)
+        return render(request, template, {**context, 'error': error}, status=status)
+    return redirect(success)
+
+
+# bulk action -> (title, list view it returns to)
+BULK_PAGES = {
+    'appointment-status': ('Change appointment status', 'appointment_list'),
+    'caregiver-rates': ('Change caregiver rates', 'caregiver_list'),
+    'job-delete': ('Delete jobs', 'job_list'),
+}
+
+
+def bulk_action(request, name):
+    # GET is the dry run for the list filters in the query string; POST applies it.
+    if name not in bulk.BULK_ACTIONS:
+        raise Http404
+    title, list_view = BULK_PAGES[name]
+    params = request.POST if request.method == 'POST' else request.GET
+    fields = [(key, value) for key, value in params.items() if key != 'csrfmiddlewaretoken']
+    filter_query = urlencode([(key, value) for key, value in fields if key in bulk.BULK_ACTIONS[name].filters])
+    back = reverse(list_view) + (f'?{filter_query}' if filter_query else '')
+    context = {'title': title, 'fields': fields, 'back': back}
+    try:
+        count = bulk.run(name, params, params, dry_run=request.method != 'POST')
+    except bulk.BulkActionError as e:
+        return render(request, 'app/bulk_confirm.html', {**context, 'error': str(e)}, status=400)
+    except IntegrityError as e:
+        return render(request, 'app/bulk_confirm.html', {**context, 'error': str(e).splitlines()[0]}, status=409)
+    if request.method == 'POST':
+        return redirect(back)
+    return render(request, 'app/bulk_confirm.html', {**context, 'count': count})
+
+
+@cache_list_page(User)
+async def user_list(request):
+    users = User.objects.only('user_id', 'email', 'given_name', 'surname', 'city', 'phone_number')
+    users = filters.apply_filters(request.GET, users, filters.USER_FILTERS)
+    users = await akeyset_paginate(request, users, filters.sort_keys(request.GET, filters.USER_SORTS))
     return render(request, 'app/user_list.html', {'users': users})
 
 
+def _user_from_post(request, **kwargs):
+    user = User(
+        email=request.POST['email'],
+        given_name=request.POST['given_name'],
+        surname=request.POST['surname'],
+        city=request.POST['city'],
+        phone_number=request.POST['phone_number'],
+        profile_description=request.POST.get('profile_description', ''),
+        **kwargs
+    )
+    # Hashed before the transaction opens, so no connection waits on the pool.
+    if request.POST.get('password'):
+        user.password = hash_password(request.POST['password'])
+    return user
+
+
+def _credentials_busy(error):
+    return HttpResponse(str(error), status=503, headers={'Retry-After': '1'})
+
+
+USER_FIELDS = ['email', 'given_name', 'surname', 'city', 'phone_number', 'profile_description']
+
+
 def user_create(request):
+    context = {'model_name': 'User', 'action': 'Create'}
     if request.method == 'POST':
-        User.objects.create(
-            email=request.POST['email'],
-            given_name=request.POST['given_name'],
-            surname=request.POST['surname'],
-            city=request.POST['city'],
-            phone_number=request.POST['phone_number'],
-            profile_description=request.POST.get('profile_description', ''),
-            password=request.POST['password']
-        )
-        return redirect('user_list')
-    return render(request, 'app/user_form.html', {'model_name': 'User', 'action': 'Create'})
+        try:
+            user = _user_from_post(request)
+        except CredentialsBusy as e:
+            return _credentials_busy(e)
+        if not user.password:
+            return render(request, 'app/user_form.html', {**context, 'user': user, 'error': 'A password is required.'},
+                          status=400)
+        return _write(request, lambda: user.save(force_insert=True), 'user_list', 'app/user_form.html',
+                      {**context, 'user': user})
+    return render(request, 'app/user_form.html', context)
 
 
 def user_update(request, pk):
-    user = get_object_or_404(User, pk=pk)
     if request.method == 'POST':
-        user.email = request.POST['email']
-        user.given_name = request.POST['given_name']
-        user.surname = request.POST['surname']
-        user.city = request.POST['city']
-        user.phone_number = request.POST['phone_number']
-        user.profile_description = request.POST.get('profile_description', '')
-        user.password = request.POST['password']
-        user.save()
-        return redirect('user_list')
+        try:
+            user = _user_from_post(request, user_id=pk)
+        except CredentialsBusy as e:
+            return _credentials_busy(e)
+        # A blank password field keeps the current one.
+        fields = USER_FIELDS + ['password'] if user.password else USER_FIELDS
+        return _write(request, lambda: _update(user, fields), 'user_list', 'app/user_form.html',
+                      {'model_name': 'User', 'action': 'Update', 'user': user})
+    user = get_object_or_404(User, pk=pk)
     return render(request, 'app/user_form.html', {'model_name': 'User', 'action': 'Update', 'user': user})
 
 
@@ -51,37 +248,44 @@ def user_delete(request, pk):
     return render(request, 'app/delete_confirm.html', {'object': user, 'model_name': 'User'})
 
 
-def caregiver_list(request):
-    caregivers = Caregiver.objects.all()
+@cache_list_page(Caregiver, User)
+async def caregiver_list(request):
+    caregivers = Caregiver.objects.select_related('caregiver_user').only(
+        'gender', 'caregiving_type', 'hourly_rate',
+        'caregiver_user__given_name', 'caregiver_user__surname',
+    )
+    caregivers = filters.apply_filters(request.GET, caregivers, filters.CAREGIVER_FILTERS)
+    caregivers = await akeyset_paginate(request, caregivers, filters.sort_keys(request.GET, filters.CAREGIVER_SORTS))
     return render(request, 'app/caregiver_list.html', {'caregivers': caregivers})
 
 
+def _caregiver_from_post(request, caregiver_user_id):
+    return Caregiver(
+        caregiver_user_id=caregiver_user_id,
+        photo=request.POST.get('photo', ''),
+        gender=request.POST['gender'],
+        caregiving_type=request.POST['caregiving_type'],
+        hourly_rate=request.POST['hourly_rate']
+    )
+
+
 def caregiver_create(request):
     if request.method == 'POST':
-        user = get_object_or_404(User, pk=request.POST['caregiver_user'])
-        Caregiver.objects.create(
-            caregiver_user=user,
-            photo=request.POST.get('photo', ''),
-            gender=request.POST['gender'],
-            caregiving_type=request.POST['caregiving_type'],
-            hourly_rate=request.POST['hourly_rate']
-        )
-        return redirect('caregiver_list')
-    users = User.objects.all()
-    return render(request, 'app/caregiver_form.html', {'model_name': 'Caregiver', 'action': 'Create', 'users': users})
+        caregiver = _caregiver_from_post(request, request.POST['caregiver_user'])
+        return _write(request, lambda: caregiver.save(force_insert=True), 'caregiver_list', 'app/caregiver_form.html',
+                      {'model_name': 'Caregiver', 'action': 'Create', 'caregiver': caregiver})
+    return render(request, 'app/caregiver_form.html', {'model_name': 'Caregiver', 'action': 'Create'})
 
 
 def caregiver_update(request, pk):
-    caregiver = get_object_or_404(Caregiver, pk=pk)
+    context = {'model_name': 'Caregiver', 'action': 'Update', 'locked': True}
     if request.method == 'POST':
-        caregiver.photo = request.POST.get('photo', '')
-        caregiver.gender = request.POST['gender']
-        caregiver.caregiving_type = request.POST['caregiving_type']
-        caregiver.hourly_rate = request.POST['hourly_rate']
-        caregiver.save()
-        return redirect('caregiver_list')
-    users = User.objects.all()
-    return render(request, 'app/caregiver_form.html', {'model_name': 'Caregiver', 'action': 'Update', 'caregiver': caregiver, 'users': users})
+        caregiver = _caregiver_from_post(request, pk)
+        fields = ['photo', 'gender', 'caregiving_type', 'hourly_rate']
+        return _write(request, lambda: _update(caregiver, fields), 'caregiver_list', 'app/caregiver_form.html',
+                      {**context, 'caregiver': caregiver})
+    caregiver = get_object_or_404(Caregiver, pk=pk)
+    return render(request, 'app/caregiver_form.html', {**context, 'caregiver': caregiver})
 
 
 def caregiver_delete(request, pk):
@@ -92,33 +296,42 @@ def caregiver_delete(request, pk):
     return render(request, 'app/delete_confirm.html', {'object': caregiver, 'model_name': 'Caregiver'})
 
 
-def member_list(request):
-    members = Member.objects.all()
+@cache_list_page(Member, User)
+async def member_list(request):
+    members = Member.objects.select_related('member_user').only(
+        'house_rules', 'dependent_description',
+        'member_user__given_name', 'member_user__surname',
+    )
+    members = filters.apply_filters(request.GET, members, filters.MEMBER_FILTERS)
+    members = await akeyset_paginate(request, members, filters.sort_keys(request.GET, filters.MEMBER_SORTS))
     return render(request, 'app/member_list.html', {'members': members})
 
 
+def _member_from_post(request, member_user_id):
+    return Member(
+        member_user_id=member_user_id,
+        house_rules=request.POST.get('house_rules', ''),
+        dependent_description=request.POST.get('dependent_description', '')
+    )
+
+
 def member_create(request):
     if request.method == 'POST':
-        user = get_object_or_404(User, pk=request.POST['member_user'])
-        Member.objects.create(
-            member_user=user,
-            house_rules=request.POST.get('house_rules', ''),
-            dependent_description=request.POST.get('dependent_description', '')
-        )
-        return redirect('member_list')
-    users = User.objects.all()
-    return render(request, 'app/member_form.html', {'model_name': 'Member', 'action': 'Create', 'users': users})
+        member = _member_from_post(request, request.POST['member_user'])
+        return _write(request, lambda: member.save(force_insert=True), 'member_list', 'app/member_form.html',
+                      {'model_name': 'Member', 'action': 'Create', 'member': member})
+    return render(request, 'app/member_form.html', {'model_name': 'Member', 'action': 'Create'})
 
 
 def member_update(request, pk):
-    member = get_object_or_404(Member, pk=pk)
+    context = {'model_name': 'Member', 'action': 'Update', 'locked': True}
     if request.method == 'POST':
-        member.house_rules = request.POST.get('house_rules', '')
-        member.dependent_description = request.POST.get('dependent_description', '')
-        member.save()
-        return redirect('member_list')
-    users = User.objects.all()
-    return render(request, 'app/member_form.html', {'model_name': 'Member', 'action': 'Update', 'member': member, 'users': users})
+        member = _member_from_post(request, pk)
+        fields = ['house_rules', 'dependent_description']
+        return _write(request, lambda: _update(member, fields), 'member_list', 'app/member_form.html',
+                      {**context, 'member': member})
+    member = get_object_or_404(Member, pk=pk)
+    return render(request, 'app/member_form.html', {**context, 'member': member})
 
 
 def member_delete(request, pk):
@@ -129,35 +342,43 @@ def member_delete(request, pk):
     return render(request, 'app/delete_confirm.html', {'object': member, 'model_name': 'Member'})
 
 
-def address_list(request):
-    addresses = Address.objects.all()
+@cache_list_page(Address, Member, User)
+async def address_list(request):
+    addresses = Address.objects.select_related('member_user__member_user').only(
+        'house_number', 'street', 'town',
+        'member_user__member_user__given_name', 'member_user__member_user__surname',
+    )
+    addresses = filters.apply_filters(request.GET, addresses, filters.ADDRESS_FILTERS)
+    addresses = await akeyset_paginate(request, addresses, filters.sort_keys(request.GET, filters.ADDRESS_SORTS))
     return render(request, 'app/address_list.html', {'addresses': addresses})
 
 
+def _address_from_post(request, member_user_id):
+    return Address(
+        member_user_id=member_user_id,
+        house_number=request.POST.get('house_number', ''),
+        street=request.POST.get('street', ''),
+        town=request.POST.get('town', '')
+    )
+
+
 def address_create(request):
     if request.method == 'POST':
-        member = get_object_or_404(Member, pk=request.POST['member_user'])
-        Address.objects.create(
-            member_user=member,
-            house_number=request.POST.get('house_number', ''),
-            street=request.POST.get('street', ''),
-            town=request.POST.get('town', '')
-        )
-        return redirect('address_list')
-    members = Member.objects.all()
-    return render(request, 'app/address_form.html', {'model_name': 'Address', 'action': 'Create', 'members': members})
+        address = _address_from_post(request, request.POST['member_user'])
+        return _write(request, lambda: address.save(force_insert=True), 'address_list', 'app/address_form.html',
+                      {'model_name': 'Address', 'action': 'Create', 'address': address})
+    return render(request, 'app/address_form.html', {'model_name': 'Address', 'action': 'Create'})
 
 
 def address_update(request, pk):
-    address = get_object_or_404(Address, pk=pk)
+    context = {'model_name': 'Address', 'action': 'Update', 'locked': True}
     if request.method == 'POST':
-        address.house_number = request.POST.get('house_number', '')
-        address.street = request.POST.get('street', '')
-        address.town = request.POST.get('town', '')
-        address.save()
-        return redirect('address_list')
-    members = Member.objects.all()
-    return render(request, 'app/address_form.html', {'model_name': 'Address', 'action': 'Update', 'address': address, 'members': members})
+        address = _address_from_post(request, pk)
+        fields = ['house_number', 'street', 'town']
+        return _write(request, lambda: _update(address, fields), 'address_list', 'app/address_form.html',
+                      {**context, 'address': address})
+    address = get_object_or_404(Address, pk=pk)
+    return render(request, 'app/address_form.html', {**context, 'address': address})
 
 
 def address_delete(request, pk):
@@ -168,35 +389,43 @@ def address_delete(request, pk):
     return render(request, 'app/delete_confirm.html', {'object': address, 'model_name': 'Address'})
 
 
-def job_list(request):
-    jobs = Job.objects.all()
+@cache_list_page(Job, Member, User)
+async def job_list(request):
+    jobs = Job.objects.select_related('member_user__member_user').only(
+        'required_caregiving_type', 'other_requirements', 'date_posted',
+        'member_user__member_user__given_name', 'member_user__member_user__surname',
+    )
+    jobs = filters.apply_filters(request.GET, jobs, filters.JOB_FILTERS)
+    jobs = await akeyset_paginate(request, jobs, filters.sort_keys(request.GET, filters.JOB_SORTS))
     return render(request, 'app/job_list.html', {'jobs': jobs})
 
 
 def job_create(request):
     if request.method == 'POST':
-        member = get_object_or_404(Member, pk=request.POST['member_user'])
-        Job.objects.create(
-            member_user=member,
+        job = Job(
+            member_user_id=request.POST['member_user'],
             required_caregiving_type=request.POST['required_caregiving_type'],
             other_requirements=request.POST.get('other_requirements', ''),
             date_posted=timezone.now()
         )
-        return redirect('job_list')
-    members = Member.objects.all()
-    return render(request, 'app/job_form.html', {'model_name': 'Job', 'action': 'Create', 'members': members})
+        return _write(request, lambda: job.save(force_insert=True), 'job_list', 'app/job_form.html',
+                      {'model_name': 'Job', 'action': 'Create', 'job': job})
+    return render(request, 'app/job_form.html', {'model_name': 'Job', 'action': 'Create'})
 
 
 def job_update(request, pk):
-    job = get_object_or_404(Job, pk=pk)
     if request.method == 'POST':
-        job.member_user = get_object_or_404(Member, pk=request.POST['member_user'])
-        job.required_caregiving_type = request.POST['required_caregiving_type']
-        job.other_requirements = request.POST.get('other_requirements', '')
-        job.save()
-        return redirect('job_list')
-    members = Member.objects.all()
-    return render(request, 'app/job_form.html', {'model_name': 'Job', 'action': 'Update', 'job': job, 'members': members})
+        job = Job(
+            job_id=pk,
+            member_user_id=request.POST['member_user'],
+            required_caregiving_type=request.POST['required_caregiving_type'],
+            other_requirements=request.POST.get('other_requirements', '')
+        )
+        fields = ['member_user', 'required_caregiving_type', 'other_requirements']
+        return _write(request, lambda: _update(job, fields), 'job_list', 'app/job_form.html',
+                      {'model_name': 'Job', 'action': 'Update', 'job': job})
+    job = get_object_or_404(Job, pk=pk)
+    return render(request, 'app/job_form.html', {'model_name': 'Job', 'action': 'Update', 'job': job})
 
 
 def job_delete(request, pk):
@@ -207,83 +436,163 @@ def job_delete(request, pk):
     return render(request, 'app/delete_confirm.html', {'object': job, 'model_name': 'Job'})
 
 
-def jobapplication_list(request):
-    applications = JobApplication.objects.all()
+@cache_list_page(JobApplication, Caregiver, Job, Member, User)
+async def jobapplication_list(request):
+    applications = JobApplication.objects.select_related('caregiver_user__caregiver_user', 'job').only(
+        'date_applied', 'job__required_caregiving_type',
+        'caregiver_user__caregiver_user__given_name', 'caregiver_user__caregiver_user__surname',
+    )
+    applications = filters.apply_filters(request.GET, applications, filters.JOBAPPLICATION_FILTERS)
+    applications = await akeyset_paginate(request, applications, filters.sort_keys(request.GET, filters.JOBAPPLICATION_SORTS))
     return render(request, 'app/jobapplication_list.html', {'applications': applications})
 
 
 def jobapplication_create(request):
     if request.method == 'POST':
-        caregiver = get_object_or_404(Caregiver, pk=request.POST['caregiver_user'])
-        job = get_object_or_404(Job, pk=request.POST['job'])
-        JobApplication.objects.create(
-            caregiver_user=caregiver,
-            job=job,
+        application = JobApplication(
+            caregiver_user_id=request.POST['caregiver_user'],
+            job_id=request.POST['job'],
             date_applied=timezone.now()
         )
-        return redirect('jobapplication_list')
-    caregivers = Caregiver.objects.all()
-    jobs = Job.objects.all()
-    return render(request, 'app/jobapplication_form.html', {'model_name': 'JobApplication', 'action': 'Create', 'caregivers': caregivers, 'jobs': jobs})
+        return _write(request, lambda: application.save(force_insert=True), 'jobapplication_list',
+                      'app/jobapplication_form.html',
+                      {'model_name': 'JobApplication', 'action': 'Create', 'application': application})
+    return render(request, 'app/jobapplication_form.html', {'model_name': 'JobApplication', 'action': 'Create'})
 
 
 def jobapplication_update(request, caregiver_id, job_id):
-    application = get_object_or_404(JobApplication, caregiver_user_id=caregiver_id, job_id=job_id)
     if request.method == 'POST':
-        application.caregiver_user = get_object_or_404(Caregiver, pk=request.POST['caregiver_user'])
-        application.job = get_object_or_404(Job, pk=request.POST['job'])
-        application.save()
-        return redirect('jobapplication_list')
-    caregivers = Caregiver.objects.all()
-    jobs = Job.objects.all()
-    return render(request, 'app/jobapplication_form.html', {'model_name': 'JobApplication', 'action': 'Update', 'application': application, 'caregivers': caregivers, 'jobs': jobs})
+        application = JobApplication(caregiver_user_id=request.POST['caregiver_user'], job_id=request.POST['job'])
+
+        def save():
+            # The form edits the primary key itself, so update the row found
+            # by its old key; save() would look for the new one.
+            rows = JobApplication.objects.filter(pk=(caregiver_id, job_id))
+            if not rows.update(caregiver_user_id=application.caregiver_user_id, job_id=application.job_id):
+                raise Http404
+            invalidate(JobApplication)
+
+        return _write(request, save, 'jobapplication_list', 'app/jobapplication_form.html',
+                      {'model_name': 'JobApplication', 'action': 'Update', 'application': application})
+    application = get_object_or_404(JobApplication, pk=(caregiver_id, job_id))
+    return render(request, 'app/jobapplication_form.html', {'model_name': 'JobApplication', 'action': 'Update', 'application': application})
 
 
 def jobapplication_delete(request, caregiver_id, job_id):
-    application = get_object_or_404(JobApplication, caregiver_user_id=caregiver_id, job_id=job_id)
+    application = get_object_or_404(JobApplication, pk=(caregiver_id, job_id))
     if request.method == 'POST':
         application.delete()
         return redirect('jobapplication_list')
     return render(request, 'app/delete_confirm.html', {'object': application, 'model_name': 'JobApplication'})
 
 
-def appointment_list(request):
-    appointments = Appointment.objects.all()
+@cache_list_page(Appointment, Caregiver, Member, User)
+async def appointment_list(request):
+    appointments = Appointment.objects.select_related(
+        'caregiver_user__caregiver_user', 'member_user__member_user',
+    ).only(
+        'appointment_date', 'appointment_time', 'work_hours', 'status',
+        'caregiver_user__caregiver_user__given_name', 'caregiver_user__caregiver_user__surname',
+        'member_user__member_user__given_name', 'member_user__member_user__surname',
+    )
+    appointments = filters.apply_filters(request.GET, appointments, filters.APPOINTMENT_FILTERS)
+    appointments = await akeyset_paginate(request, appointments, filters.sort_keys(request.GET, filters.APPOINTMENT_SORTS))
     return render(request, 'app/appointment_list.html', {'appointments': appointments})
 
 
-def appointment_create(request):
+def _appointment_from_post(request, **kwargs):
+    return Appointment(
+        caregiver_user_id=request.POST['caregiver_user'],
+        member_user_id=request.POST['member_user'],
+        appointment_date=request.POST['appointment_date'],
+        appointment_time=request.POST['appointment_time'],
+        work_hours=request.POST['work_hours'],
+        status=request.POST.get('status', 'pending'),
+        **kwargs
+    )
+
+
+APPOINTMENT_FIELDS = ['caregiver_user', 'member_user', 'appointment_date', 'appointment_time', 'work_hours', 'status']
+
+
+async def appointment_create(request):
     if request.method == 'POST':
-        caregiver = get_object_or_404(Caregiver, pk=request.POST['caregiver_user'])
-        member = get_object_or_404(Member, pk=request.POST['member_user'])
-        Appointment.objects.create(
-            caregiver_user=caregiver,
-            member_user=member,
-            appointment_date=request.POST['appointment_date'],
-            appointment_time=request.POST['appointment_time'],
-            work_hours=request.POST['work_hours'],
-            status=request.POST.get('status', 'pending')
+        appointment = _appointment_from_post(request)
+        return await sync_to_async(_save_appointment)(
+            request, appointment, 'Create', lambda: appointment.save(force_insert=True),
         )
-        return redirect('appointment_list')
-    caregivers = Caregiver.objects.all()
-    members = Member.objects.all()
-    return render(request, 'app/appointment_form.html', {'model_name': 'Appointment', 'action': 'Create', 'caregivers': caregivers, 'members': members})
+    return render(request, 'app/appointment_form.html', {'model_name': 'Appointment', 'action': 'Create'})
 
 
-def appointment_update(request, pk):
-    appointment = get_object_or_404(Appointment, pk=pk)
+async def appointment_update(request, pk):
     if request.method == 'POST':
-        appointment.caregiver_user = get_object_or_404(Caregiver, pk=request.POST['caregiver_user'])
-        appointment.member_user = get_object_or_404(Member, pk=request.POST['member_user'])
-        appointment.appointment_date = request.POST['appointment_date']
-        appointment.appointment_time = request.POST['appointment_time']
-        appointment.work_hours = request.POST['work_hours']
-        appointment.status = request.POST.get('status', 'pending')
-        appointment.save()
-        return redirect('appointment_list')
-    caregivers = Caregiver.objects.all()
-    members = Member.objects.all()
-    return render(request, 'app/appointment_form.html', {'model_name': 'Appointment', 'action': 'Update', 'appointment': appointment, 'caregivers': caregivers, 'members': members})
+        appointment = _appointment_from_post(request, appointment_id=pk)
+        return await sync_to_async(_save_appointment)(
+            request, appointment, 'Update', lambda: _update(appointment, APPOINTMENT_FIELDS),
+        )
+    appointment = await aget_object_or_404(Appointment, pk=pk)
+    return render(request, 'app/appointment_form.html', {'model_name': 'Appointment', 'action': 'Update', 'appointment': appointment})
+
+
+def _clean_appointment(appointment):
+    # POST values are strings; converting them here turns a malformed one into
+    # a form error instead of a ValueError from save(). The related rows
+    # themselves are checked by the foreign keys.
+    for field in (Appointment.caregiver_user.field, Appointment.member_user.field):
+        try:
+            setattr(appointment, field.attname, field.to_python(getattr(appointment, field.attname)))
+        except ValidationError as e:
+            raise ValidationError({field.name: e.messages})
+    appointment.full_clean(exclude=['caregiver_user', 'member_user'], validate_unique=False, validate_constraints=False)
+
+
+def _save_appointment(request, appointment, action, save):
+    context = {'model_name': 'Appointment', 'action': action, 'appointment': appointment}
+    try:
+        _clean_appointment(appointment)
+    except ValidationError as e:
+        error = ' '.join(f'{name}: {" ".join(messages)}' for name, messages in e.message_dict.items())
+        return render(request, 'app/appointment_form.html', {**context, 'error': error}, status=400)
+    try:
+        with transaction.atomic():
+            save()
+            _check_constraints()
+    except IntegrityError as e:
+        if getattr(e.__cause__, 'pgcode', None) != EXCLUSION_VIOLATION:
+            status, error = _integrity_error(e)
+            return render(request, 'app/appointment_form.html', {**context, 'error': error}, status=status)
+        conflicts = availability.appointment_conflicts(appointment)
+        return render(request, 'app/appointment_form.html', {
+            **context,
+            'error': 'The caregiver already has an appointment in this time slot.',
+            'conflicts': conflicts.order_by('appointment_date', 'appointment_time'),
+        }, status=409)
+    return redirect('appointment_list')
+
+
+def available_caregivers(request):
+    date = filters._date(request.GET.get('date', ''))
+    time = filters._time(request.GET.get('time', ''))
+    hours = filters._int(request.GET.get('hours', ''))
+    if date is None or time is None or not hours or hours < 1:
+        return HttpResponseBadRequest('date, time and hours are required')
+    caregivers = availability.free_caregivers(
+        date, time, hours,
+        caregiving_type=request.GET.get('caregiving_type'), city=request.GET.get('city'),
+    )
+    rows = caregivers.order_by('hourly_rate', 'caregiver_user_id').values(
+        'caregiver_user_id', 'caregiving_type', 'hourly_rate',
+        'caregiver_user__given_name', 'caregiver_user__surname',
+    )[:MAX_K]
+    return JsonResponse({'results': [
+        {
+            'id': row['caregiver_user_id'],
+            'label': f"{row['caregiver_user__given_name']} {row['caregiver_user__surname']}",
+            'caregiving_type': row['caregiving_type'],
+            'hourly_rate': row['hourly_rate'],
+        }
+        for row in rows
+    ]})
 
 
 def appointment_delete(request, pk):
@@ -0,0 +1,100 @@
+"""Dashboard slice latency from the in-memory appointment cube.
+
+    python -m benchmarks.analytics [--appointments 3000000] [--caregivers 100000] [--queries 500]
+
+Builds an AppointmentCube from synthetic caregivers and appointments (no
+database needed) and times aggregate() slices against the same group-by done
+with a bincount over the columns, plus grouped percentiles and an
+incremental append.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+import analytics
+
+CITIES = ['Astana', 'Almaty', 'Shymkent', 'Karaganda', 'Aktobe', 'Taraz', 'Pavlodar', 'Oskemen']
+
+
+def build(n_caregivers, n_appointments, rng):
+    cube = analytics.AppointmentCube()
+    ids = np.arange(1, n_caregivers + 1)
+    cube.set_caregivers(
+        ids, rng.choice(analytics.CAREGIVING_TYPES, n_caregivers), rng.choice(CITIES, n_caregivers),
+        rng.integers(500, 5000, n_caregivers) / 100,
+    )
+    start = time.perf_counter()
+    cube.append(*appointments(rng, 1, n_appointments, n_caregivers))
+    return cube, time.perf_counter() - start
+
+
+def appointments(rng, first_id, n, n_caregivers):
+    return (
+        np.arange(first_id, first_id + n), rng.integers(1, n_caregivers + 1, n),
+        analytics.month_code(2020, 1) + rng.integers(0, 72, n), rng.integers(0, len(analytics.STATUSES), n),
+        rng.integers(1, 9, n),
+    )
+
+
+def scan(cube, by, where):
+    """The same slice as a vectorized group-by over every row."""
+    columns = {dim: cube._column(dim).astype(np.intp) for dim in analytics.DIMENSIONS}
+    mask = np.ones(len(cube), bool)
+    for dim, values in where.items():
+        mask &= np.isin(columns[dim], cube._codes(dim, values) + (cube._month0 if dim == 'month' else 0))
+    shape = [columns[dim].max() + 1 for dim in by]
+    keys = np.ravel_multi_index([columns[dim][mask] for dim in by], shape) if by else np.zeros(mask.sum(), np.intp)
+    return np.bincount(keys), np.bincount(keys, cube._column('pay')[mask])
+
+
+def timings(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(*query)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.99) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--appointments', type=int, default=3000000)
+    parser.add_argument('--caregivers', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    cube, elapsed = build(args.caregivers, args.appointments, rng)
+    print(f'loaded {len(cube)} appointments in {elapsed:.2f}s')
+
+    shapes = [
+        ((), {}),
+        (('caregiving_type',), {'status': 'confirmed'}),
+        (('city', 'month'), {'status': 'confirmed'}),
+        (('caregiving_type', 'status'), {'city': ['Astana', 'Almaty']}),
+        (('month',), {'caregiving_type': 'babysitter', 'city': 'Taraz'}),
+    ]
+    queries = [shapes[i % len(shapes)] for i in range(args.queries)]
+    print(f'{"":<12} {"p50 ms":>9} {"p99 ms":>9}')
+    for label, fn in [('cube', lambda by, where: cube.aggregate(by, **where)), ('scan', lambda by, where: scan(cube, by, where))]:
+        p50, p99 = timings(fn, queries if label == 'cube' else queries[:max(1, args.queries // 20)])
+        print(f'{label:<12} {p50:9.3f} {p99:9.3f}')
+    p50, p99 = timings(lambda by, where: cube.percentile('pay', 90, by, **where), queries[:max(1, args.queries // 20)])
+    print(f'{"percentile":<12} {p50:9.3f} {p99:9.3f}')
+
+    # The first append after a load grows the columns; later ones fill the spare capacity.
+    batches = [appointments(rng, args.appointments + 1 + i * 1000, 1000, args.caregivers) for i in range(20)]
+    p50, p99 = timings(cube.append, batches)
+    print(f'{"append 1000":<12} {p50:9.3f} {p99:9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Requests/sec with and without connection reuse.
+
+    python -m benchmarks.connection_pooling [--requests 500] [--path /users/]
+
+Django: the same view is fetched through the test client with
+CONN_MAX_AGE=0 (connect per request) and with persistent connections, with
+the page cache disabled (CACHE_BACKEND=dummy) so every fetch queries the database.
+SQLAlchemy: ``SELECT 1`` checkouts through NullPool versus the tuned
+QueuePool from ``schema.POOL_OPTIONS``.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'caregiver.settings')
+# Every list view is page-cached; a cache hit would not touch a connection.
+os.environ['CACHE_BACKEND'] = 'dummy'
+
+
+def rate(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - start)
+
+
+def bench_django(n, path):
+    import django
+    django.setup()
+    from django.db import close_old_connections, connections
+    from django.test import Client
+
+    client = Client(HTTP_HOST='localhost')
+
+    # The test client skips the request_finished hook that closes expired
+    # connections, so run it by hand the way the real handlers do.
+    def fetch():
+        client.get(path)
+        close_old_connections()
+
+    results = {}
+    for label, max_age in (('connect per request', 0), ('persistent', 300)):
+        connections.close_all()
+        for conn in connections.all():
+            conn.settings_dict['CONN_MAX_AGE'] = max_age
+        fetch()
+        results[label] = rate(fetch, n)
+    connections.close_all()
+    return results
+
+
+def bench_sqlalchemy(n):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import NullPool
+
+    import schema
+
+    def select_one(engine):
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+
+    results = {}
+    for label, kwargs in (('NullPool', {'poolclass': NullPool}), ('QueuePool', schema.POOL_OPTIONS)):
+        engine = create_engine(schema.DATABASE_URL, **kwargs)
+        select_one(engine)
+        results[label] = rate(lambda: select_one(engine), n)
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--path', default='/users/')
+    args = parser.parse_args()
+
+    for title, results in (
+        (f'Django GET {args.path}', bench_django(args.requests, args.path)),
+        ('SQLAlchemy SELECT 1', bench_sqlalchemy(args.requests)),
+    ):
+        print(title)
+        baseline = next(iter(results.values()))
+        for label, value in results.items():
+            print(f'  {label:<22} {value:8.0f} req/s  ({value / baseline:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Password hashing throughput through app.credentials, and what a signup burst does to other work.
+
+    python -m benchmarks.credentials [--hashes 200] [--concurrency 64] [--workers 4] [--max-pending 16]
+
+Hashes with the configured PASSWORD_HASHERS (no database needed): first
+serially on one thread, then from --concurrency request threads through the
+bounded pool. During the burst a probe thread times a small fixed piece of
+work every 10 ms, standing in for the requests that are not signing up.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'caregiver.settings')
+
+
+def probe_work():
+    return sum(i * i for i in range(20000))
+
+
+def probe(stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        probe_work()
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[max(0, int(len(samples) * 0.99) - 1)] * 1000
+
+
+def burst(hashes, concurrency, credentials):
+    done, busy = [0], [0]
+    lock = threading.Lock()
+
+    def signup(_):
+        try:
+            credentials.hash_password('correct horse battery staple')
+            with lock:
+                done[0] += 1
+        except credentials.CredentialsBusy:
+            with lock:
+                busy[0] += 1
+
+    with ThreadPoolExecutor(concurrency) as requests:
+        list(requests.map(signup, range(hashes)))
+    return done[0], busy[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hashes', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=64, help='simultaneous signup requests')
+    parser.add_argument('--workers', type=int, help='CREDENTIAL_WORKERS (default from settings)')
+    parser.add_argument('--max-pending', type=int, help='CREDENTIAL_MAX_PENDING (default from settings)')
+    parser.add_argument('--wait', type=float, help='CREDENTIAL_WAIT_SECONDS (default from settings)')
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hasher, make_password
+
+    from app import credentials
+
+    for name, value in [('CREDENTIAL_WORKERS', args.workers), ('CREDENTIAL_MAX_PENDING', args.max_pending),
+                        ('CREDENTIAL_WAIT_SECONDS', args.wait)]:
+        if value is not None:
+            setattr(settings, name, value)
+    hasher = get_hasher()
+    print(f'hasher {hasher.algorithm}, {settings.CREDENTIAL_WORKERS} workers, '
+          f'{settings.CREDENTIAL_MAX_PENDING} pending, {settings.CREDENTIAL_WAIT_SECONDS:g}s wait')
+
+    idle = []
+    for _ in range(50):
+        start = time.perf_counter()
+        probe_work()
+        idle.append(time.perf_counter() - start)
+
+    serial = max(1, args.hashes // 10)
+    start = time.perf_counter()
+    for _ in range(serial):
+        make_password('correct horse battery staple')
+    elapsed = time.perf_counter() - start
+    print(f'  {"serial":<8} {serial / elapsed:8.1f} hashes/s  ({elapsed / serial * 1000:.1f} ms each)')
+
+    stop, samples = threading.Event(), []
+    prober = threading.Thread(target=probe, args=(stop, samples))
+    prober.start()
+    start = time.perf_counter()
+    done, busy = burst(args.hashes, args.concurrency, credentials)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    print(f'  {"pool":<8} {done / elapsed:8.1f} hashes/s  ({done} hashed, {busy} turned away as busy)')
+
+    for label, values in [('idle', idle), ('burst', samples)]:
+        p50, p99 = percentiles(values)
+        print(f'  other work while {label:<5} p50 {p50:6.2f} ms  p99 {p99:6.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
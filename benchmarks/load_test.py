@@ -0,0 +1,171 @@
+"""Throughput of the sync (WSGI) and async (ASGI) deployments under many connections.
+
+    python -m benchmarks.load_test [--server wsgi asgi] [--concurrency 1000] [--duration 20] [--path /caregivers/] [--cached]
+    python -m benchmarks.load_test --url http://127.0.0.1:8000/api/v1/caregivers/
+
+With --server each deployment is started from --wsgi-cmd / --asgi-cmd (by
+default gunicorn with threads and uvicorn; install them in the benchmark
+environment), warmed up, measured and stopped. With --url an already running
+server is measured. The list pages are cached, so the servers started here
+run with CACHE_BACKEND=dummy and every request reaches the views and the
+database; --cached keeps the configured cache instead. The client is plain asyncio with keep-alive connections,
+so it adds no dependencies of its own.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import shlex
+import socket
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVERS = {
+    'wsgi': 'gunicorn caregiver.wsgi:application --bind 127.0.0.1:{port} --workers {workers} --threads 32',
+    'asgi': 'uvicorn caregiver.asgi:application --host 127.0.0.1 --port {port} --workers {workers} --no-access-log',
+}
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            close = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def _worker(host, port, request, deadline, latencies, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(request)
+            status, close = await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors['http'] += 1
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            errors['connection'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, concurrency, duration):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.encode()
+    latencies, errors = [], {'http': 0, 'connection': 0}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _worker(host, port, request, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+        **errors,
+    }
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'server did not start listening on port {port}')
+
+
+def measure_server(name, command, args):
+    command = command.format(port=args.port, workers=args.workers)
+    env = os.environ if args.cached else {**os.environ, 'CACHE_BACKEND': 'dummy'}
+    process = subprocess.Popen(
+        shlex.split(command), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(args.port)
+        url = f'http://127.0.0.1:{args.port}{args.path}'
+        asyncio.run(run_load(url, min(args.concurrency, 50), 2))
+        return asyncio.run(run_load(url, args.concurrency, args.duration))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def _raise_fd_limit(concurrency):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, concurrency * 2 + 256))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url')
+    parser.add_argument('--server', nargs='+', choices=sorted(SERVERS), default=['wsgi', 'asgi'])
+    parser.add_argument('--wsgi-cmd', default=SERVERS['wsgi'])
+    parser.add_argument('--asgi-cmd', default=SERVERS['asgi'])
+    parser.add_argument('--path', default='/caregivers/')
+    parser.add_argument('--cached', action='store_true', help='keep the page cache on for started servers')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    _raise_fd_limit(args.concurrency)
+    if args.url:
+        results = {args.url: asyncio.run(run_load(args.url, args.concurrency, args.duration))}
+    else:
+        commands = {'wsgi': args.wsgi_cmd, 'asgi': args.asgi_cmd}
+        results = {name: measure_server(name, commands[name], args) for name in args.server}
+
+    print(f'{args.concurrency} connections, {args.duration:g}s')
+    for name, r in results.items():
+        print(
+            f'  {name:<6} {r["rps"]:8.0f} req/s  p50 {r["p50_ms"]:7.1f} ms  p99 {r["p99_ms"]:7.1f} ms'
+            f'  ({r["requests"]} ok, {r["http"]} http errors, {r["connection"]} connection errors)'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Top-k caregiver match latency from the in-memory index.
+
+    python -m benchmarks.matching [--caregivers 100000] [--queries 2000] [--k 10]
+
+Builds a MatchIndex from synthetic caregivers and member histories (no
+database needed) and times match() against a linear scan over the same data.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'caregiver.settings')
+
+TYPES = ['babysitter', 'elderly_caregiver', 'playmate']
+CITIES = ['Astana', 'Almaty', 'Shymkent', 'Karaganda', 'Aktobe', 'Taraz', 'Pavlodar', 'Oskemen']
+
+
+def build(n, members, rng):
+    import django
+    django.setup()
+    from app.matching import MatchIndex
+
+    caregivers = [
+        (i, rng.choice(TYPES), rng.choice(CITIES), Decimal(rng.randrange(500, 5000)) / 100)
+        for i in range(1, n + 1)
+    ]
+    start = time.perf_counter()
+    index = MatchIndex()
+    for row in caregivers:
+        index.put_caregiver(*row)
+    for member_id in range(members):
+        index.set_history(member_id, {rng.randrange(1, n + 1): rng.randrange(1, 5) for _ in range(rng.randrange(4))})
+    return index, caregivers, time.perf_counter() - start
+
+
+def linear_match(caregivers, index, caregiving_type, city, member_id, min_rate, max_rate, k):
+    history = index._history.get(member_id, {})
+    candidates = [
+        (caregiver_id, rate, history.get(caregiver_id, 0))
+        for caregiver_id, t, c, rate in caregivers
+        if t == caregiving_type and c == city and min_rate <= rate <= max_rate
+    ]
+    candidates.sort(key=lambda r: (-r[2], r[1], r[0]))
+    return candidates[:k]
+
+
+def timings(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(*query)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--caregivers', type=int, default=100000)
+    parser.add_argument('--members', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    index, caregivers, build_seconds = build(args.caregivers, args.members, rng)
+    print(f'built index over {len(index)} caregivers in {build_seconds:.2f}s')
+
+    queries = []
+    for _ in range(args.queries):
+        low = Decimal(rng.randrange(500, 3000)) / 100
+        queries.append((
+            rng.choice(TYPES), rng.choice(CITIES), rng.randrange(args.members), low, low + 15, args.k,
+        ))
+    for query in queries[:50]:
+        assert index.match(*query[:3], min_rate=query[3], max_rate=query[4], k=query[5]) == \
+            linear_match(caregivers, index, *query)
+
+    p50, p99 = timings(lambda t, c, m, lo, hi, k: index.match(t, c, m, min_rate=lo, max_rate=hi, k=k), queries)
+    print(f'  {"index":<14} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms')
+    p50, p99 = timings(lambda *q: linear_match(caregivers, index, *q), queries[:max(1, args.queries // 20)])
+    print(f'  {"linear scan":<14} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
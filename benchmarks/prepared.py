@@ -0,0 +1,94 @@
+"""Per-call overhead of the reports.py statement cache and server-side PREPARE.
+
+    python -m benchmarks.prepared [--calls 50] [--only PATTERN]
+
+For each report (with the parameters the suite uses), against DATABASE_URL:
+
+* build: constructing the select() the old way, on every call;
+* compile: compiling it with no compiled cache;
+* plan: server planning time from EXPLAIN (SUMMARY), for the statement as
+  sent per call and for EXECUTE of the prepared one (the same for reports
+  registered with prepare=False);
+
+then the p50 of a whole rows() call built per call, through the cached
+statement, and through the cached statement with prepared=True.
+"""
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy.orm import Session
+
+import reports
+from benchmarks.suite import REPORT_PARAMS
+from schema import engine
+
+
+def p50_ms(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def planning_ms(connection, sql, params=None):
+    plan = connection.exec_driver_sql(f"EXPLAIN (SUMMARY) {sql}", params).scalars().all()
+    return float(re.search(r"Planning Time: ([\d.]+)", "\n".join(plan)).group(1))
+
+
+def built_rows(session, name, params):
+    build, row_type = reports.REPORTS[name]
+    return [row_type._make(row) for row in session.execute(build(**params))]
+
+
+def measure(session, name, params, calls):
+    build = reports.REPORTS[name][0]
+    cached, values = reports.statement(name, params)
+    compiled = cached.stmt.compile(dialect=engine.dialect)
+    connection = session.connection()
+
+    result = {
+        "build": p50_ms(lambda: build(**params), calls),
+        "compile": p50_ms(lambda: build(**params).compile(dialect=engine.dialect), calls),
+        "plan": planning_ms(connection, compiled.string, compiled.construct_params(values)),
+    }
+    result["compile"] -= result["build"]
+    result["plan prepared"] = result["plan"]
+    if name not in reports.UNPREPARED:
+        for _ in range(6):
+            # PostgreSQL settles on a generic plan after five custom ones.
+            reports.rows(session, name, prepared=True, **params)
+        args = [{**cached.literals, **values}[key] for key in cached.positions]
+        execute = f"EXECUTE {cached.prepared_name}" + (f"({', '.join(['%s'] * len(args))})" if args else "")
+        result["plan prepared"] = planning_ms(connection, execute, tuple(args) or None)
+    result["built"] = p50_ms(lambda: built_rows(session, name, params), calls)
+    result["cached"] = p50_ms(lambda: reports.rows(session, name, **params), calls)
+    result["prepared"] = p50_ms(lambda: reports.rows(session, name, prepared=True, **params), calls)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--only", help="regular expression matched against report names")
+    args = parser.parse_args()
+
+    columns = ["build", "compile", "plan", "plan prepared", "built", "cached", "prepared"]
+    print(f"{'ms per call':<36}" + "".join(f"{c:>14}" for c in columns))
+    with Session(engine) as session:
+        for name in reports.REPORTS:
+            if args.only and not re.search(args.only, name):
+                continue
+            result = measure(session, name, REPORT_PARAMS.get(name, {}), args.calls)
+            print(f"{name:<36}" + "".join(f"{result[c]:14.3f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
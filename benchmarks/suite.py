@@ -0,0 +1,353 @@
+"""Latency and query counts for every URL in app/urls.py and every task in queries.py.
+
+    python manage.py generate_data --scale small
+    python -m benchmarks.suite [--iterations 20] [--only PATTERN] [--output results.json]
+                               [--baseline PATH] [--save-baseline PATH]
+
+Each case is run once to warm up and then --iterations times, recording
+p50/p95/p99 latency and the number of SQL statements. Views go through the
+Django test client (the cache is cleared before every request unless
+--warm-cache); the queries.py tasks run through SQLAlchemy on DATABASE_URL.
+Anything that writes runs inside a transaction that is rolled back, so the
+data set stays fixed between runs.
+
+With --baseline, a case fails when its p95 exceeds the baseline's by more
+than --tolerance (plus --noise-ms), when it issues more queries, or when it
+errors where the baseline did not; the exit status is 1 if any case fails.
+Latencies depend on the machine, so no baseline is kept in the repository:
+record one where it will be compared, on the data set it will be compared
+against, for example
+
+    python manage.py generate_data --scale small
+    python -m benchmarks.suite --save-baseline benchmarks/baselines/small.json
+    python -m benchmarks.suite --baseline benchmarks/baselines/small.json
+
+The suite needs PostgreSQL: the schema uses tsvector columns, GiST
+exclusion constraints and triggers, which SQLite cannot host.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'caregiver.settings')
+
+# Parameters for reports that need them: the literals queries.py uses.
+REPORT_PARAMS = {
+    'appointment_names': {'status': 'confirmed'},
+    'jobs_with_requirement': {'phrase': 'soft-spoken'},
+    'search_jobs': {'query': 'soft-spoken'},
+    'appointment_hours_for_type': {'caregiving_type': 'babysitter'},
+    'members_seeking_care': {'caregiving_type': 'elderly_caregiver', 'city': 'Astana', 'house_rule': 'No pets.'},
+}
+
+
+def percentile(ordered, p):
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, queries, status=None):
+    ordered = sorted(latencies)
+    result = {
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'queries': queries,
+    }
+    if status is not None:
+        result['status'] = status
+    return result
+
+
+def sample():
+    """Ids of existing rows to put into URLs."""
+    from django.db import DatabaseError
+
+    from app.models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+
+    def first(model, *fields):
+        return model.objects.order_by('pk').values_list(*fields).first()
+
+    user = first(User, 'pk', 'surname')
+    if user is None:
+        raise SystemExit('The database is empty; fill it with `manage.py generate_data` first.')
+    appointment = first(Appointment, 'pk', 'appointment_date')
+    try:
+        application = JobApplication.objects.order_by('job_id').values_list('caregiver_user_id', 'job_id').first()
+    except DatabaseError:
+        application = None
+    return {
+        'user': user[0],
+        'surname': user[1],
+        'caregiver': first(Caregiver, 'pk')[0],
+        'member': first(Member, 'pk')[0],
+        'address': first(Address, 'pk')[0],
+        'job': first(Job, 'pk')[0],
+        'appointment': appointment[0],
+        'date': appointment[1].isoformat(),
+        'application': application,
+    }
+
+
+def view_cases(ids):
+    """Return ``[(url name, kwargs, query, post body or None)]`` covering every app URL."""
+    import reports
+    from app.api import RESOURCES
+    from app.exporting import EXPORTS
+    from app.lookups import LOOKUPS
+    from app.search import SEARCHES
+
+    cases = [('index', {}, {}, None), ('metrics', {}, {}, None), ('search', {}, {}, None)]
+    cases += [('lookup', {'kind': kind}, {'q': ids['surname'][:3]}, None) for kind in LOOKUPS]
+    cases += [('search', {}, {'q': 'patient calm', 'kind': kind}, None) for kind in SEARCHES]
+    export_filters = {
+        'users': {'city': 'Atyrau'}, 'caregivers': {'city': 'Atyrau'}, 'members': {'city': 'Atyrau'},
+        'addresses': {'town': 'Atyrau'}, 'jobs': {'member_user': ids['member']},
+        'job_applications': {'job': ids['job']}, 'appointments': {'caregiver_user': ids['caregiver']},
+    }
+    cases += [('export', {'kind': kind}, {'format': 'csv', **export_filters[kind]}, None) for kind in EXPORTS]
+    cases += [('report_data', {'name': name}, REPORT_PARAMS.get(name, {}), None) for name in reports.REPORTS]
+    cases.append(('analytics_data', {}, {'by': 'caregiving_type,month', 'status': 'confirmed'}, None))
+    cases.append(('analytics_data', {}, {'by': 'city', 'percentile': 90}, None))
+
+    keys = {
+        'users': ids['user'], 'caregivers': ids['caregiver'], 'members': ids['member'],
+        'addresses': ids['address'], 'jobs': ids['job'], 'appointments': ids['appointment'],
+        'job-applications': '-'.join(map(str, ids['application'])) if ids['application'] else None,
+    }
+    for resource, spec in RESOURCES.items():
+        cases.append(('api_collection', {'resource': resource}, {}, None))
+        if spec.relations:
+            cases.append(('api_collection', {'resource': resource}, {'include': ','.join(spec.relations)}, None))
+        if keys[resource] is not None:
+            cases.append(('api_item', {'resource': resource, 'key': keys[resource]}, {}, None))
+    cases.append(('api_batch', {}, {}, {'operations': [
+        {'op': 'update', 'resource': 'caregivers', 'key': str(ids['caregiver']), 'data': {'hourly_rate': '11.00'}},
+        {'op': 'update', 'resource': 'jobs', 'key': str(ids['job']), 'data': {'other_requirements': 'benchmark'}},
+    ]}))
+
+    cases.append(('bulk_action', {'name': 'caregiver-rates'}, {'city': 'Atyrau', 'rate_percent': 5}, None))
+    cases.append(('api_changes', {}, {}, None))
+    cases.append(('api_changes', {}, {'after': '0-0', 'limit': 500}, None))
+    cases.append(('api_bulk', {'action': 'appointment-status'}, {}, {
+        'filters': {'caregiver_user': ids['caregiver']}, 'changes': {'new_status': 'confirmed'},
+    }))
+
+    pks = {
+        'user': ids['user'], 'caregiver': ids['caregiver'], 'member': ids['member'], 'address': ids['address'],
+        'job': ids['job'], 'appointment': ids['appointment'],
+    }
+    for prefix, pk in pks.items():
+        cases.append((f'{prefix}_list', {}, {}, None))
+        cases.append((f'{prefix}_create', {}, {}, None))
+        cases.append((f'{prefix}_update', {'pk': pk}, {}, None))
+        cases.append((f'{prefix}_delete', {'pk': pk}, {}, None))
+    cases.append(('job_list', {}, {'required_caregiving_type': 'babysitter', 'sort': '-date_posted'}, None))
+    cases.append(('appointment_list', {}, {'status': 'confirmed', 'sort': '-date'}, None))
+    cases.append(('jobapplication_list', {}, {}, None))
+    cases.append(('jobapplication_create', {}, {}, None))
+    if ids['application']:
+        caregiver_id, job_id = ids['application']
+        for name in ('jobapplication_update', 'jobapplication_delete'):
+            cases.append((name, {'caregiver_id': caregiver_id, 'job_id': job_id}, {}, None))
+    cases.append(('job_matches', {'pk': ids['job']}, {}, None))
+    cases.append(('available_caregivers', {}, {'date': ids['date'], 'time': '10:00', 'hours': 2}, None))
+    return cases
+
+
+def check_coverage(cases, ids):
+    from app import urls
+
+    covered = {name for name, _, _, _ in cases}
+    missing = {p.name for p in urls.urlpatterns} - covered
+    if not ids['application']:
+        missing -= {'jobapplication_update', 'jobapplication_delete'}
+    if missing:
+        raise SystemExit(f'No benchmark case for: {", ".join(sorted(missing))}')
+
+
+def run_view(client, path, body, iterations, warm_cache):
+    from django.core.cache import cache
+    from django.db import connection, transaction
+
+    count = [0]
+
+    def counter(execute, sql, params, many, context):
+        count[0] += 1
+        return execute(sql, params, many, context)
+
+    latencies = []
+    for i in range(iterations + 1):
+        if not warm_cache:
+            cache.clear()
+        count[0] = 0
+        with connection.execute_wrapper(counter), transaction.atomic():
+            start = time.perf_counter()
+            if body is None:
+                response = client.get(path)
+            else:
+                response = client.post(path, body, content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        if i:
+            latencies.append(elapsed)
+    return summarize(latencies, count[0], response.status_code)
+
+
+def run_task(fn, iterations):
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    import schema
+
+    count = [0]
+
+    def counter(*args):
+        count[0] += 1
+
+    latencies = []
+    event.listen(schema.engine, 'before_cursor_execute', counter)
+    try:
+        for i in range(iterations + 1):
+            count[0] = 0
+            with schema.engine.connect() as conn:
+                outer = conn.begin()
+                session = Session(bind=conn, join_transaction_mode='create_savepoint')
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        start = time.perf_counter()
+                        fn(session)
+                        elapsed = time.perf_counter() - start
+                finally:
+                    session.close()
+                    outer.rollback()
+            if i:
+                latencies.append(elapsed)
+    finally:
+        event.remove(schema.engine, 'before_cursor_execute', counter)
+    return summarize(latencies, count[0])
+
+
+def table_sizes():
+    from app.models import User, Caregiver, Member, Address, Job, Appointment
+
+    return {model._meta.db_table: model.objects.count() for model in (User, Caregiver, Member, Address, Job, Appointment)}
+
+
+def compare(results, baseline, tolerance, noise_ms):
+    failures = []
+    for label, base in baseline['results'].items():
+        current = results.get(label)
+        if current is None:
+            continue
+        if 'error' in current:
+            if 'error' not in base:
+                failures.append(f'{label}: now fails ({current["error"]})')
+            continue
+        if 'error' in base:
+            continue
+        if current['queries'] > base['queries']:
+            failures.append(f'{label}: {current["queries"]} queries, baseline {base["queries"]}')
+        limit = base['p95_ms'] * (1 + tolerance) + noise_ms
+        if current['p95_ms'] > limit:
+            failures.append(f'{label}: p95 {current["p95_ms"]:.1f} ms, baseline {base["p95_ms"]:.1f} ms')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--only', help='regular expression matched against case labels')
+    parser.add_argument('--warm-cache', action='store_true', help='keep the cache between requests')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file and fail on regressions')
+    parser.add_argument('--save-baseline', help='write results to this JSON file as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95 increase')
+    parser.add_argument('--noise-ms', type=float, default=1.0, help='allowed absolute p95 increase')
+    args = parser.parse_args()
+    only = re.compile(args.only) if args.only else None
+
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+
+    import queries
+
+    ids = sample()
+    cases = view_cases(ids)
+    check_coverage(cases, ids)
+
+    # Failing requests are reported per case; keep their tracebacks off the console.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    client = Client(HTTP_HOST='localhost')
+    results = {}
+    for name, kwargs, query, body in cases:
+        path = reverse(name, kwargs=kwargs) + (f'?{urlencode(query)}' if query else '')
+        label = f'{"POST" if body else "GET"} {path}'
+        if only and not only.search(label):
+            continue
+        try:
+            results[label] = run_view(client, path, body, args.iterations, args.warm_cache)
+        except Exception as e:
+            results[label] = {'error': f'{type(e).__name__}: {str(e).strip().splitlines()[0] if str(e).strip() else ""}'}
+        print(f'{label:<70} {_describe(results[label])}')
+
+    for name, task in queries.TASKS.items():
+        label = f'queries.{name}'
+        if only and not only.search(label):
+            continue
+        try:
+            results[label] = run_task(task.fn, args.iterations)
+        except Exception as e:
+            results[label] = {'error': f'{type(e).__name__}: {str(e).strip().splitlines()[0]}'}
+        print(f'{label:<70} {_describe(results[label])}')
+
+    report = {
+        'meta': {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'iterations': args.iterations,
+            'warm_cache': args.warm_cache,
+            'database': f'{connection.vendor} {connection.pg_version}',
+            'rows': table_sizes(),
+        },
+        'results': results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline['meta']['rows'] != report['meta']['rows']:
+            print('warning: the baseline was recorded against a different data set', file=sys.stderr)
+        failures = compare(results, baseline, args.tolerance, args.noise_ms)
+        for failure in failures:
+            print(f'REGRESSION {failure}', file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        print(f'No regressions against {args.baseline}')
+
+
+def _describe(result):
+    if 'error' in result:
+        return f'ERROR {result["error"]}'
+    return (f'p50 {result["p50_ms"]:8.2f}  p95 {result["p95_ms"]:8.2f}  p99 {result["p99_ms"]:8.2f} ms'
+            f'  {result["queries"]:3d} queries  {result.get("status", "")}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,5 +3,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'caregiver.settings')
+# Under ASGI each request's sync code may run on a different thread, each with
+# its own connection, so persistent connections pile up instead of being
+# reused; connect per request unless DB_CONN_MAX_AGE says otherwise.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -15,6 +16,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'app',
 ]
 
@@ -28,6 +30,43 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+SQL_PROFILING = os.environ.get('SQL_PROFILING') == '1'
+SQL_PROFILING_SLOW_STATEMENTS = 5
+SQL_PROFILING_DUPLICATE_THRESHOLD = 3
+SQL_PROFILING_FLUSH_EVERY = 50
+SQL_PROFILING_DIR = BASE_DIR / 'profiles'
+
+if SQL_PROFILING:
+    MIDDLEWARE.insert(0, 'app.profiling.QueryProfileMiddleware')
+
+# The in-memory caregiver match index is rebuilt this often to pick up writes
+# made outside this process.
+MATCHING_REFRESH_SECONDS = int(os.environ.get('MATCHING_REFRESH_SECONDS', 300))
+
+# The analytics cube (analytics.py) appends new appointments after
+# ANALYTICS_REFRESH_SECONDS and reloads everything after ANALYTICS_RELOAD_SECONDS.
+ANALYTICS_REFRESH_SECONDS = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', 5))
+ANALYTICS_RELOAD_SECONDS = int(os.environ.get('ANALYTICS_RELOAD_SECONDS', 900))
+
+# Change feed (app/feed.py): each process keeps the last CHANGE_FEED_BUFFER
+# changes in memory and re-reads change_log on NOTIFY or every
+# CHANGE_FEED_POLL_SECONDS. Long polls and SSE keepalives wait at most
+# CHANGE_FEED_MAX_WAIT seconds; an SSE stream (ASGI only) ends after
+# CHANGE_FEED_STREAM_SECONDS and the client reconnects with Last-Event-ID.
+# prune_changes keeps CHANGE_FEED_RETENTION_DAYS.
+CHANGE_FEED_BUFFER = int(os.environ.get('CHANGE_FEED_BUFFER', 10000))
+CHANGE_FEED_POLL_SECONDS = float(os.environ.get('CHANGE_FEED_POLL_SECONDS', 1))
+CHANGE_FEED_MAX_WAIT = float(os.environ.get('CHANGE_FEED_MAX_WAIT', 30))
+CHANGE_FEED_STREAM_SECONDS = float(os.environ.get('CHANGE_FEED_STREAM_SECONDS', 300))
+CHANGE_FEED_RETENTION_DAYS = float(os.environ.get('CHANGE_FEED_RETENTION_DAYS', 7))
+
+# Password hashing (app/credentials.py) runs on CREDENTIAL_WORKERS threads with
+# at most CREDENTIAL_MAX_PENDING hashes queued or running; callers wait up to
+# CREDENTIAL_WAIT_SECONDS for a slot and then get a 503.
+CREDENTIAL_WORKERS = int(os.environ.get('CREDENTIAL_WORKERS', os.cpu_count() or 1))
+CREDENTIAL_MAX_PENDING = int(os.environ.get('CREDENTIAL_MAX_PENDING', CREDENTIAL_WORKERS * 4))
+CREDENTIAL_WAIT_SECONDS = float(os.environ.get('CREDENTIAL_WAIT_SECONDS', 2))
+
 ROOT_URLCONF = 'caregiver.urls'
 
 TEMPLATES = [
@@ -55,9 +94,45 @@ DATABASES = {
         'PASSWORD': '123',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Keep connections open between requests instead of reconnecting for
+        # every one; health checks discard connections the server dropped.
+        # caregiver/asgi.py defaults this to 0: the persistent connections were
+        # only measured under WSGI (benchmarks/connection_pooling.py).
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 300)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# CACHE_BACKEND selects where cached list pages and lookup results live:
+# 'locmem' (per-process LRU, the default and the local stand-in), 'file' or
+# 'redis' (shared between workers; needs the redis package), or 'dummy' (no
+# caching; the benchmarks use it to measure the views themselves).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 5000))
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+            'TIMEOUT': CACHE_TTL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': {
+                'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+                'file': 'django.core.cache.backends.filebased.FileBasedCache',
+                'dummy': 'django.core.cache.backends.dummy.DummyCache',
+            }[CACHE_BACKEND],
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache') if CACHE_BACKEND == 'file' else ''),
+            'TIMEOUT': CACHE_TTL,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
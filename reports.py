@@ -0,0 +1,547 @@
+"""Parameterized reports over the caregiver schema.
+
+Read reports are registered by name and can be consumed three ways:
+
+* ``rows(session, name, **params)`` - a list of typed rows;
+* ``stream(session, name, **params)`` - typed rows fetched ``yield_per``
+  rows at a time from a server-side cursor;
+* ``columns(session, name, **params)`` - one list (or NumPy array) per column.
+
+Each report is built once per shape with its parameters as bind parameters,
+and the statement is reused for every call, so SQLAlchemy's compiled cache
+is hit without rebuilding the construct. ``shape`` names the parameters that
+change the query itself (``status="confirmed"`` reads caregiver_earnings);
+those are rendered into the statement and each value gets its own entry.
+With ``prepared=True``, ``rows`` and ``columns`` also skip the server's
+parse and plan: the statement is PREPAREd once per pooled connection and
+run with EXECUTE. After five runs PostgreSQL may switch a prepared statement
+to a generic plan; reports whose plan depends on the values (a full-text
+ranking with a LIMIT) are registered with ``prepare=False`` and keep being
+planned per call.
+
+Write operations are plain functions returning the affected row count.
+"""
+import argparse
+import csv
+import functools
+import hashlib
+import inspect
+import sys
+from decimal import Decimal
+from typing import NamedTuple
+
+from sqlalchemy import update, delete, select, case, func, text, and_, or_, bindparam, cast, Text
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+from sqlalchemy.orm import Session, aliased
+
+from schema import (
+    User, Caregiver, Member, Address, Job, JobApplication, Appointment, CaregiverEarnings, engine,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STREAM_BATCH_SIZE = 1000
+STATEMENT_CACHE_SIZE = 256
+
+REPORTS = {}
+SHAPES = {}
+UNPREPARED = set()
+
+
+def report(row_type, shape=(), prepare=True):
+    def register(build):
+        REPORTS[build.__name__] = (build, row_type)
+        SHAPES[build.__name__] = tuple(shape)
+        if not prepare:
+            UNPREPARED.add(build.__name__)
+        return build
+    return register
+
+
+# Row types
+
+class AppointmentNames(NamedTuple):
+    appointment_id: int
+    caregiver_name: str
+    caregiver_surname: str
+    member_name: str
+    member_surname: str
+
+
+class JobId(NamedTuple):
+    job_id: int
+
+
+class JobMatch(NamedTuple):
+    job_id: int
+    rank: float
+
+
+class AppointmentHours(NamedTuple):
+    appointment_id: int
+    work_hours: int
+
+
+class PersonName(NamedTuple):
+    given_name: str
+    surname: str
+
+
+class JobApplicantCount(NamedTuple):
+    job_id: int
+    num_applicants: int
+
+
+class CaregiverHours(NamedTuple):
+    given_name: str
+    surname: str
+    total_hours: int
+
+
+class CaregiverAveragePay(NamedTuple):
+    given_name: str
+    surname: str
+    avg_pay: Decimal
+
+
+class CaregiverTotalPay(NamedTuple):
+    given_name: str
+    surname: str
+    total_pay: Decimal
+
+
+class CaregiverTotalCost(NamedTuple):
+    given_name: str
+    surname: str
+    total_cost: Decimal
+
+
+class JobApplicationView(NamedTuple):
+    job_id: int
+    other_requirements: str
+    caregiver_user_id: int
+    caregiver_name: str
+    caregiver_surname: str
+
+
+# Writes
+
+def update_user_phone(session: Session, given_name: str, surname: str, phone_number: str) -> int:
+    stmt = (
+        update(User)
+        .where(User.given_name == given_name, User.surname == surname)
+        .values(phone_number=phone_number)
+    )
+    result = session.execute(stmt)
+    session.commit()
+    return result.rowcount
+
+
+def adjust_caregiver_rates(session: Session, threshold: Decimal = Decimal("10"),
+                           flat_increase: Decimal = Decimal("0.3"),
+                           multiplier: Decimal = Decimal("1.1")) -> int:
+    stmt = (
+        update(Caregiver)
+        .values(
+            hourly_rate=case(
+                (Caregiver.hourly_rate < threshold, Caregiver.hourly_rate + flat_increase),
+                else_=Caregiver.hourly_rate * multiplier,
+            )
+        )
+    )
+    result = session.execute(stmt)
+    session.commit()
+    return result.rowcount
+
+
+def delete_jobs_by_member(session: Session, given_name: str, surname: str) -> int:
+    subq_member_ids = (
+        select(Member.member_user_id)
+        .join(User, Member.member_user_id == User.user_id)
+        .where(User.given_name == given_name, User.surname == surname)
+    )
+
+    stmt = delete(Job).where(Job.member_user_id.in_(subq_member_ids))
+    result = session.execute(stmt)
+    session.commit()
+    return result.rowcount
+
+
+def delete_members_on_street(session: Session, street: str) -> int:
+    subq_member_ids = (
+        select(Address.member_user_id)
+        .where(Address.street == street)
+    )
+
+    stmt = delete(Member).where(Member.member_user_id.in_(subq_member_ids))
+    result = session.execute(stmt)
+    session.commit()
+    return result.rowcount
+
+
+# Reads
+
+@report(AppointmentNames)
+def appointment_names(status: str = "confirmed"):
+    caregiver_user = aliased(User, name="caregiver_user")
+    member_user = aliased(User, name="member_user")
+
+    return (
+        select(
+            Appointment.appointment_id,
+            caregiver_user.given_name.label("caregiver_name"),
+            caregiver_user.surname.label("caregiver_surname"),
+            member_user.given_name.label("member_name"),
+            member_user.surname.label("member_surname"),
+        )
+        .join(Caregiver, Appointment.caregiver_user_id == Caregiver.caregiver_user_id)
+        .join(caregiver_user, caregiver_user.user_id == Caregiver.caregiver_user_id)
+        .join(Member, Appointment.member_user_id == Member.member_user_id)
+        .join(member_user, member_user.user_id == Member.member_user_id)
+        .where(Appointment.status == status)
+    )
+
+
+def _text_match(column, search_vector, phrase):
+    # The tsvector match narrows candidates through the GIN index; ILIKE then
+    # rechecks the exact substring on those rows only. A phrase made entirely
+    # of stop words yields an empty tsquery, which would match nothing, so the
+    # index condition is skipped for it.
+    query = func.phraseto_tsquery("english", phrase)
+    return and_(
+        or_(func.numnode(query) == 0, search_vector.op("@@")(query)),
+        column.ilike("%" + cast(phrase, Text) + "%"),
+    )
+
+
+@report(JobId)
+def jobs_with_requirement(phrase: str):
+    return select(Job.job_id).where(_text_match(Job.other_requirements, Job.search_vector, phrase))
+
+
+@report(JobMatch, prepare=False)
+def search_jobs(query: str, limit: int = 50):
+    tsquery = func.websearch_to_tsquery("english", query)
+    rank = func.ts_rank(Job.search_vector, tsquery)
+    return (
+        select(Job.job_id, rank.label("rank"))
+        .where(Job.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc())
+        .limit(limit)
+    )
+
+
+@report(AppointmentHours)
+def appointment_hours_for_type(caregiving_type: str):
+    return (
+        select(Appointment.appointment_id, Appointment.work_hours)
+        .join(Caregiver, Appointment.caregiver_user_id == Caregiver.caregiver_user_id)
+        .where(Caregiver.caregiving_type == caregiving_type)
+    )
+
+
+@report(PersonName)
+def members_seeking_care(caregiving_type: str, city: str, house_rule: str):
+    return (
+        select(User.given_name, User.surname)
+        .select_from(Member)
+        .join(User, Member.member_user_id == User.user_id)
+        .join(Job, Job.member_user_id == Member.member_user_id)
+        .where(
+            Job.required_caregiving_type == caregiving_type,
+            User.city == city,
+            _text_match(Member.house_rules, Member.search_vector, house_rule),
+        )
+        .distinct()
+    )
+
+
+@report(JobApplicantCount)
+def applicants_per_job():
+    return (
+        select(
+            Job.job_id,
+            func.count(JobApplication.caregiver_user_id).label("num_applicants"),
+        )
+        .outerjoin(JobApplication, Job.job_id == JobApplication.job_id)
+        .group_by(Job.job_id)
+        .order_by(Job.job_id)
+    )
+
+
+def _earnings():
+    """Join caregiver_earnings to the caregiver's rate and name: O(caregivers)."""
+    return (
+        select()
+        .select_from(CaregiverEarnings)
+        .join(Caregiver, Caregiver.caregiver_user_id == CaregiverEarnings.caregiver_user_id)
+        .join(User, User.user_id == CaregiverEarnings.caregiver_user_id)
+        .where(CaregiverEarnings.appointment_count > 0)
+    )
+
+
+def _earned_pay():
+    return Caregiver.hourly_rate * CaregiverEarnings.total_hours
+
+
+@report(CaregiverHours, shape=["status"])
+def total_hours_per_caregiver(status: str = "confirmed"):
+    if status == "confirmed":
+        return (
+            _earnings()
+            .add_columns(User.given_name, User.surname, CaregiverEarnings.total_hours)
+            .order_by(User.surname, User.given_name)
+        )
+    return (
+        select(
+            User.given_name,
+            User.surname,
+            func.sum(Appointment.work_hours).label("total_hours"),
+        )
+        .select_from(Caregiver)
+        .join(User, User.user_id == Caregiver.caregiver_user_id)
+        .join(Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id)
+        .where(Appointment.status == status)
+        .group_by(User.given_name, User.surname)
+        .order_by(User.surname, User.given_name)
+    )
+
+
+@report(CaregiverAveragePay, shape=["status"])
+def average_pay_per_caregiver(status: str = "confirmed"):
+    if status == "confirmed":
+        return (
+            _earnings()
+            .add_columns(
+                User.given_name,
+                User.surname,
+                (_earned_pay() / CaregiverEarnings.appointment_count).label("avg_pay"),
+            )
+            .order_by(User.surname, User.given_name)
+        )
+
+    avg_pay_expr = func.avg(Caregiver.hourly_rate * Appointment.work_hours)
+
+    return (
+        select(
+            User.given_name,
+            User.surname,
+            avg_pay_expr.label("avg_pay"),
+        )
+        .select_from(Caregiver)
+        .join(User, User.user_id == Caregiver.caregiver_user_id)
+        .join(Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id)
+        .where(Appointment.status == status)
+        .group_by(User.given_name, User.surname)
+        .order_by(User.surname, User.given_name)
+    )
+
+
+@report(CaregiverTotalPay, shape=["status"])
+def caregivers_above_average_earnings(status: str = "confirmed"):
+    if status == "confirmed":
+        earned = _earnings().add_columns(
+            User.given_name, User.surname, _earned_pay().label("total_pay"),
+        ).subquery()
+        return (
+            select(earned.c.given_name, earned.c.surname, earned.c.total_pay)
+            .where(earned.c.total_pay > select(func.avg(earned.c.total_pay)).scalar_subquery())
+            .order_by(earned.c.total_pay.desc())
+        )
+
+    caregiver_pay_subq = (
+        select(
+            Caregiver.caregiver_user_id.label("cid"),
+            func.sum(Caregiver.hourly_rate * Appointment.work_hours).label("total_pay"),
+        )
+        .join(Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id)
+        .where(Appointment.status == status)
+        .group_by(Caregiver.caregiver_user_id)
+        .subquery()
+    )
+
+    overall_avg = select(func.avg(caregiver_pay_subq.c.total_pay))
+
+    return (
+        select(
+            User.given_name,
+            User.surname,
+            caregiver_pay_subq.c.total_pay,
+        )
+        .join(Caregiver, Caregiver.caregiver_user_id == caregiver_pay_subq.c.cid)
+        .join(User, User.user_id == Caregiver.caregiver_user_id)
+        .where(
+            caregiver_pay_subq.c.total_pay > overall_avg.scalar_subquery()
+        )
+        .order_by(caregiver_pay_subq.c.total_pay.desc())
+    )
+
+
+@report(CaregiverTotalCost, shape=["status"])
+def total_cost_per_caregiver(status: str = "confirmed"):
+    if status == "confirmed":
+        return (
+            _earnings()
+            .add_columns(User.given_name, User.surname, _earned_pay().label("total_cost"))
+            .order_by(User.surname, User.given_name)
+        )
+    return (
+        select(
+            User.given_name,
+            User.surname,
+            func.sum(Caregiver.hourly_rate * Appointment.work_hours).label("total_cost"),
+        )
+        .select_from(Caregiver)
+        .join(User, User.user_id == Caregiver.caregiver_user_id)
+        .join(Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id)
+        .where(Appointment.status == status)
+        .group_by(User.given_name, User.surname)
+        .order_by(User.surname, User.given_name)
+    )
+
+
+JOB_APPLICATIONS_VIEW_SQL = """
+    CREATE OR REPLACE VIEW job_applications_view AS
+    SELECT
+        ja.job_id,
+        j.other_requirements,
+        ja.caregiver_user_id,
+        u.given_name AS caregiver_name,
+        u.surname    AS caregiver_surname
+    FROM job_application ja
+    JOIN job j
+      ON j.job_id = ja.job_id
+    JOIN caregiver c
+      ON c.caregiver_user_id = ja.caregiver_user_id
+    JOIN "user" u
+      ON u.user_id = c.caregiver_user_id;
+"""
+
+
+def create_job_applications_view(session: Session):
+    session.execute(text(JOB_APPLICATIONS_VIEW_SQL))
+    session.commit()
+
+
+@report(JobApplicationView)
+def job_applications_view():
+    return text("SELECT * FROM job_applications_view ORDER BY job_id, caregiver_user_id")
+
+
+# Statements
+
+_PREPARE_DIALECT = PGDialect_psycopg2(paramstyle="numeric_dollar")
+
+
+class Statement(NamedTuple):
+    stmt: object
+    sql: str
+    prepared_name: str
+    positions: tuple
+    literals: dict
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _statement(name: str, shape: tuple) -> Statement:
+    build = REPORTS[name][0]
+    binds = {key: bindparam(key) for key in inspect.signature(build).parameters if key not in SHAPES[name]}
+    stmt = build(**binds, **dict(shape))
+    compiled = stmt.compile(dialect=_PREPARE_DIALECT)
+    sql = compiled.string
+    positions = tuple(compiled.positiontup or ())
+    literals = {key: bind.effective_value for key, bind in compiled.binds.items() if key not in binds}
+    prepared_name = "report_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    return Statement(stmt, sql, prepared_name, positions, literals)
+
+
+def statement(name: str, params: dict) -> tuple:
+    """Return the cached Statement for a report and its full parameters, defaults applied."""
+    bound = inspect.signature(REPORTS[name][0]).bind(**params)
+    bound.apply_defaults()
+    shape = tuple((key, bound.arguments[key]) for key in SHAPES[name])
+    values = {key: value for key, value in bound.arguments.items() if key not in SHAPES[name]}
+    return _statement(name, shape), values
+
+
+def _execute(session: Session, name: str, params: dict, prepared: bool = False, **options):
+    cached, values = statement(name, params)
+    if not prepared or name in UNPREPARED:
+        return session.execute(cached.stmt, values, execution_options=options)
+    connection = session.connection()
+    names = connection.info.setdefault("prepared_reports", set())
+    if cached.prepared_name not in names:
+        connection.exec_driver_sql(f"PREPARE {cached.prepared_name} AS {cached.sql}")
+        names.add(cached.prepared_name)
+    args = [{**cached.literals, **values}[key] for key in cached.positions]
+    if not args:
+        return connection.exec_driver_sql(f"EXECUTE {cached.prepared_name}")
+    placeholders = ", ".join(["%s"] * len(args))
+    return connection.exec_driver_sql(f"EXECUTE {cached.prepared_name}({placeholders})", tuple(args))
+
+
+# Consumers
+
+def rows(session: Session, name: str, prepared: bool = False, **params) -> list:
+    row_type = REPORTS[name][1]
+    return [row_type._make(row) for row in _execute(session, name, params, prepared)]
+
+
+def stream(session: Session, name: str, batch_size: int = STREAM_BATCH_SIZE, **params):
+    row_type = REPORTS[name][1]
+    result = _execute(session, name, params, yield_per=batch_size)
+    for partition in result.partitions():
+        for row in partition:
+            yield row_type._make(row)
+
+
+def _to_array(values):
+    if values and all(isinstance(v, Decimal) for v in values):
+        return np.array(values, dtype=float)
+    return np.array(values)
+
+
+def columns(session: Session, name: str, as_numpy: bool = False, prepared: bool = False, **params) -> dict:
+    """Return ``{column: values}``; with ``as_numpy`` each column is an ndarray."""
+    row_type = REPORTS[name][1]
+    if as_numpy and np is None:
+        raise RuntimeError("columns(as_numpy=True) requires numpy")
+    result = _execute(session, name, params, prepared)
+    data = {field: list(values) for field, values in zip(row_type._fields, zip(*result))}
+    if not data:
+        data = {field: [] for field in row_type._fields}
+    if as_numpy:
+        data = {field: _to_array(values) for field, values in data.items()}
+    return data
+
+
+def coerce_params(name: str, raw: dict) -> dict:
+    """Convert string parameters (query string, CLI) using the report's annotations."""
+    signature = inspect.signature(REPORTS[name][0])
+    params = {}
+    for key, value in raw.items():
+        if key not in signature.parameters:
+            raise TypeError(f"{name}() got an unexpected parameter {key!r}")
+        annotation = signature.parameters[key].annotation
+        params[key] = annotation(value) if annotation in (int, Decimal) else value
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a named report")
+    parser.add_argument("name", choices=sorted(REPORTS))
+    parser.add_argument("params", nargs="*", metavar="KEY=VALUE")
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    params = coerce_params(args.name, dict(p.split("=", 1) for p in args.params))
+    writer = csv.writer(sys.stdout)
+    writer.writerow(REPORTS[args.name][1]._fields)
+    with Session(engine) as session:
+        writer.writerows(stream(session, args.name, batch_size=args.batch_size, **params))
+
+
+if __name__ == "__main__":
+    main()